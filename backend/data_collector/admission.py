@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Admission control for the ingestion API.
+
+Requests are turned away early, with a Retry-After hint, instead of piling up
+behind a slow broker:
+
+  - 503 when the pollution data queue is deeper than QUEUE_DEPTH_LIMIT, the
+    broker has flow-controlled (blocked) our connections, the broker cannot
+    be reached, or MAX_IN_FLIGHT_PUBLISHES requests are already publishing
+  - 429 when a single sensor exceeds its token bucket, so one misbehaving
+    device cannot starve the rest of the fleet
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import config
+import metrics
+import startup
+
+logger = logging.getLogger(__name__)
+
+
+class Rejection:
+    """Why a request was refused and how the client should back off."""
+
+    def __init__(self, status_code, reason, message, retry_after):
+        self.status_code = status_code
+        self.reason = reason
+        self.message = message
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now, tokens=1):
+        """
+        Take tokens if available.
+
+        Returns:
+            float: 0 if granted, otherwise seconds until enough tokens accrue.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def refund(self, tokens=1):
+        """Return tokens taken for work that was not done."""
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class SensorRateLimiter:
+    """Per-sensor token buckets, bounded with LRU eviction."""
+
+    def __init__(self, rate, burst, max_sensors):
+        self.rate = rate
+        self.burst = burst
+        self.max_sensors = max_sensors
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, sensor_key):
+        """Return 0 if the sensor may send now, else the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(sensor_key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[sensor_key] = bucket
+                if len(self._buckets) > self.max_sensors:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(sensor_key)
+            return bucket.try_acquire(now)
+
+    def refund(self, sensor_key):
+        """Give back the token of a reading that was not accepted after all."""
+        with self._lock:
+            bucket = self._buckets.get(sensor_key)
+            if bucket is not None:
+                bucket.refund()
+
+
+class QueueDepthMonitor:
+    """
+    Polls the depth of the routine queues in the background.
+
+    Uses a passive queue_declare per queue on a dedicated connection every
+    QUEUE_DEPTH_CHECK_INTERVAL seconds, so request handlers only read a
+    cached value: the depth of the deepest queue.
+    """
+
+    def __init__(self, interval, queues):
+        self.interval = interval
+        self.queues = queues
+        self.depth = None
+        self.available = True
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='queue-depth-monitor', daemon=True)
+                self._thread.start()
+
+    def _connect(self):
+        import pika
+        credentials = pika.PlainCredentials(config.RABBITMQ_USER, config.RABBITMQ_PASS)
+        return pika.BlockingConnection(
+            pika.ConnectionParameters(
+                host=config.RABBITMQ_HOST,
+                port=config.RABBITMQ_PORT,
+                credentials=credentials,
+                socket_timeout=config.RABBITMQ_SOCKET_TIMEOUT
+            )
+        )
+
+    def _run(self):
+        import pika
+        # Reconnects back off, but no further than the Retry-After given to rejected clients
+        backoff = startup.Backoff(self.interval, max(self.interval, config.OVERLOAD_RETRY_AFTER))
+        connection = None
+        while True:
+            try:
+                if connection is None or connection.is_closed:
+                    connection = self._connect()
+                    channel = connection.channel()
+                depths = []
+                for queue in self.queues:
+                    try:
+                        result = channel.queue_declare(queue=queue, passive=True)
+                        depths.append(result.method.message_count)
+                    except pika.exceptions.ChannelClosedByBroker:
+                        # Queue not declared yet: nothing is waiting
+                        channel = connection.channel()
+                self.depth = max(depths, default=0)
+                self.available = True
+                metrics.QUEUE_DEPTH.set(self.depth)
+                backoff.reset()
+            except Exception as e:
+                if self.available:
+                    logger.warning(f"Queue depth check failed: {e}")
+                self.available = False
+                connection = None
+                backoff.wait()
+                continue
+            time.sleep(self.interval)
+
+
+class AdmissionController:
+    """Combines queue depth, broker flow control, in-flight and per-sensor limits."""
+
+    def __init__(self):
+        self.enabled = config.ADMISSION_CONTROL_ENABLED
+        self.monitor = QueueDepthMonitor(
+            config.QUEUE_DEPTH_CHECK_INTERVAL,
+            [config.POLLUTION_DATA_QUEUE, *(q.strip() for q in config.QUEUE_DEPTH_QUEUES.split(',') if q.strip())]
+        )
+        self.sensors = SensorRateLimiter(
+            config.SENSOR_RATE_PER_SECOND,
+            config.SENSOR_BURST,
+            config.MAX_TRACKED_SENSORS
+        )
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._blocked_until = 0.0
+
+    def broker_blocked(self, connection, method):
+        """pika callback: the broker raised a resource alarm and blocked publishing."""
+        logger.warning("RabbitMQ blocked publishing (resource alarm)")
+        self._blocked_until = time.monotonic() + config.OVERLOAD_RETRY_AFTER
+
+    def broker_unblocked(self, connection, method):
+        logger.info("RabbitMQ unblocked publishing")
+        self._blocked_until = 0.0
+
+    def _reject(self, status_code, reason, message, retry_after):
+        metrics.ADMISSION_REJECTIONS.labels(reason=reason).inc()
+        return Rejection(status_code, reason, message, retry_after)
+
+    def check_overload(self, urgent=False):
+        """
+        Check global signals before accepting any work.
+
+        Args:
+            urgent (bool): The work goes to the urgent lane, which the
+                routine queue depth does not apply to.
+
+        Returns:
+            Rejection or None.
+        """
+        if not self.enabled:
+            return None
+        self.monitor.ensure_started()
+
+        if time.monotonic() < self._blocked_until:
+            return self._reject(503, 'broker_blocked', "Message broker is applying flow control",
+                                self._blocked_until - time.monotonic())
+        if not self.monitor.available:
+            return self._reject(503, 'broker_unavailable', "Message broker is unavailable",
+                                config.OVERLOAD_RETRY_AFTER)
+        depth = self.monitor.depth
+        if not urgent and depth is not None and depth >= config.QUEUE_DEPTH_LIMIT:
+            return self._reject(503, 'queue_full', f"Processing backlog is full ({depth} messages queued)",
+                                config.OVERLOAD_RETRY_AFTER)
+        return None
+
+    def try_enter(self):
+        """
+        Reserve an in-flight publish slot.
+
+        Returns:
+            Rejection or None. On None the caller must call leave().
+        """
+        if not self.enabled:
+            return None
+        with self._in_flight_lock:
+            if self._in_flight >= config.MAX_IN_FLIGHT_PUBLISHES:
+                return self._reject(503, 'too_many_in_flight', "Too many requests in progress", 1)
+            self._in_flight += 1
+            metrics.IN_FLIGHT_PUBLISHES.set(self._in_flight)
+        return None
+
+    def wait_enter(self, timeout):
+        """
+        Reserve an in-flight publish slot, waiting up to `timeout` seconds
+        for one (bulk imports, which publish chunk after chunk).
+
+        Returns:
+            Rejection or None. On None the caller must call leave().
+        """
+        if not self.enabled:
+            return None
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._in_flight_lock:
+                if self._in_flight < config.MAX_IN_FLIGHT_PUBLISHES:
+                    self._in_flight += 1
+                    metrics.IN_FLIGHT_PUBLISHES.set(self._in_flight)
+                    return None
+            if time.monotonic() >= deadline:
+                return self._reject(503, 'too_many_in_flight', "Too many requests in progress", 1)
+            time.sleep(0.01)
+
+    def leave(self):
+        if not self.enabled:
+            return
+        with self._in_flight_lock:
+            self._in_flight -= 1
+            metrics.IN_FLIGHT_PUBLISHES.set(self._in_flight)
+
+    def check_sensor(self, data):
+        """
+        Apply the per-sensor token bucket to one reading.
+
+        Returns:
+            Rejection or None.
+        """
+        if not self.enabled:
+            return None
+        wait = self.sensors.check(sensor_key(data))
+        if wait > 0:
+            return self._reject(429, 'sensor_rate_limited', "Sensor is sending too fast", wait)
+        return None
+
+    def refund_sensor(self, data):
+        """
+        Undo check_sensor for a reading that was then refused or failed to
+        publish, so clients retrying under overload are not charged twice.
+        """
+        if not self.enabled:
+            return
+        self.sensors.refund(sensor_key(data))
+
+
+def sensor_key(data):
+    """
+    Identify the sending device.
+
+    Uses an explicit sensor_id when present, otherwise the location rounded
+    to the same 0.01° box the processor uses to match a station's history.
+    """
+    if data.get('sensor_id'):
+        return str(data['sensor_id'])
+    try:
+        return f"{round(float(data['latitude']), 2)}:{round(float(data['longitude']), 2)}"
+    except (KeyError, TypeError, ValueError):
+        return 'unknown'
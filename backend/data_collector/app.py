@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from flask import Flask, request, jsonify
+# First, so startup timing covers every other import
+import startup
+
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-import pika
 import json
 import os
+import threading
+import time
 import logging
 from datetime import datetime
 import config
+import metrics
+import wire_format
+import admission
+import routing
+import tracing
+
+# pika, pymongo and bulk_import (pandas, NumPy) are imported where they are
+# first used, so the HTTP server is up before they load
 
 # Configure Flask app
 app = Flask(__name__)
@@ -21,9 +33,88 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Admission control (queue depth, broker flow control, in-flight and per-sensor limits)
+admission_controller = admission.AdmissionController()
+
+# Traces start here; their context follows the reading in the AMQP headers
+tracer = tracing.Tracer(
+    service='data-collector',
+    path=config.TRACE_FILE,
+    sample_rate=config.TRACE_SAMPLE_RATE,
+    flush_interval=config.TRACE_FLUSH_INTERVAL
+)
+
+# Station registry cache, created on first use. Ingestion does not wait for
+# MongoDB: while the registry cannot be loaded (or another request is loading
+# it) readings are tagged with their station's id without registering the
+# station, and loading is retried after REGISTRY_RETRY_INTERVAL.
+_station_registry = None
+_station_registry_failed_at = None
+_station_registry_lock = threading.Lock()
+
+def _registry_backing_off():
+    return (_station_registry_failed_at is not None
+            and time.monotonic() - _station_registry_failed_at < config.REGISTRY_RETRY_INTERVAL)
+
+def registry_failed(e):
+    global _station_registry_failed_at
+    _station_registry_failed_at = time.monotonic()
+    logger.error(f"Station registry unavailable, retrying in {config.REGISTRY_RETRY_INTERVAL:.0f}s: {e}")
+
+def get_station_registry():
+    """The registry, or None while MongoDB is unavailable."""
+    global _station_registry
+    if _registry_backing_off():
+        return None
+    if _station_registry is not None:
+        return _station_registry
+    if not _station_registry_lock.acquire(blocking=False):
+        return None
+    try:
+        if _station_registry is None:
+            import pymongo
+            from station_registry import StationRegistry, STATIONS_COLLECTION
+            timeout_ms = int(config.REGISTRY_TIMEOUT * 1000)
+            client = pymongo.MongoClient(
+                host=config.MONGODB_HOST,
+                port=config.MONGODB_PORT,
+                username=config.MONGODB_USER,
+                password=config.MONGODB_PASS,
+                serverSelectionTimeoutMS=timeout_ms,
+                connectTimeoutMS=timeout_ms,
+                socketTimeoutMS=timeout_ms
+            )
+            try:
+                registry = StationRegistry(client[config.MONGODB_DB][STATIONS_COLLECTION])
+                registry.sync()
+            except Exception as e:
+                client.close()
+                registry_failed(e)
+                return None
+            _station_registry = registry
+        return _station_registry
+    finally:
+        _station_registry_lock.release()
+
+# Tag a validated reading with its station id
+def assign_station(data):
+    from station_registry import station_id
+    # The id is derived from the coordinates, so it is the same whether or not
+    # the station can be registered now; an unregistered station is picked up
+    # with a later reading, and the processor matches it by coordinates meanwhile
+    data['station_id'] = station_id(data['latitude'], data['longitude'])
+    registry = get_station_registry()
+    if registry is None or data['station_id'] in registry.stations:
+        return
+    try:
+        registry.resolve(data['latitude'], data['longitude'])
+    except Exception as e:
+        registry_failed(e)
+
 # Create a RabbitMQ connection
 def get_rabbitmq_connection():
     try:
+        import pika
         credentials = pika.PlainCredentials(
             config.RABBITMQ_USER,
             config.RABBITMQ_PASS
@@ -32,43 +123,123 @@ def get_rabbitmq_connection():
             pika.ConnectionParameters(
                 host=config.RABBITMQ_HOST,
                 port=config.RABBITMQ_PORT,
-                credentials=credentials
+                credentials=credentials,
+                socket_timeout=config.RABBITMQ_SOCKET_TIMEOUT,
+                blocked_connection_timeout=config.RABBITMQ_BLOCKED_TIMEOUT
             )
         )
+        # Let admission control see broker flow control
+        connection.add_on_connection_blocked_callback(admission_controller.broker_blocked)
+        connection.add_on_connection_unblocked_callback(admission_controller.broker_unblocked)
         return connection
     except Exception as e:
         logger.error(f"RabbitMQ connection error: {e}")
         return None
 
-# Publish a message to the queue
-def publish_to_queue(data):
+# Set once the readings exchange has been declared by this process
+_exchange_declared = False
+
+# Publish a reading to the readings exchange, routed by region and lane
+def publish_to_queue(data, trace=None):
+    import pika
+    global _exchange_declared
+    started = time.perf_counter()
+    lane = routing.reading_lane(data, config.DANGEROUS_THRESHOLDS)
+    span = tracer.start_span('collector.publish', trace, lane=lane)
     try:
         connection = get_rabbitmq_connection()
         if connection:
             channel = connection.channel()
-            channel.queue_declare(queue=config.POLLUTION_DATA_QUEUE, durable=True)
+            if not _exchange_declared:
+                routing.declare_exchange(channel, config.POLLUTION_DATA_EXCHANGE, config.POLLUTION_DATA_QUEUE)
+                _exchange_declared = True
 
-            # Convert data to JSON
-            message = json.dumps(data)
+            # Encode in the configured wire format
+            message, content_type = wire_format.encode_reading(data, config.WIRE_FORMAT)
 
-            # Publish to the queue
+            # Publish to the exchange
             channel.basic_publish(
-                exchange='',
-                routing_key=config.POLLUTION_DATA_QUEUE,
+                exchange=config.POLLUTION_DATA_EXCHANGE,
+                routing_key=routing.routing_key(routing.READINGS, data, lane),
                 body=message,
                 properties=pika.BasicProperties(
                     delivery_mode=2,  # make message persistent
-                    content_type='application/json'
+                    content_type=content_type,
+                    # Lets the processor measure queue lag; sampled readings carry their trace
+                    headers=tracer.inject(span.context, {'published_at': int(time.time() * 1000)}, 'collector')
                 )
             )
 
             connection.close()
+            metrics.PUBLISH_LATENCY.observe(time.perf_counter() - started)
+            metrics.PUBLISHED_MESSAGES.labels(status='success').inc()
+            metrics.PUBLISHED_BYTES.labels(content_type=content_type).inc(len(message))
+            metrics.PUBLISHED_LANE.labels(lane=lane).inc()
+            span.end(status='success')
             return True
+        metrics.PUBLISHED_MESSAGES.labels(status='error').inc()
+        span.end(status='error')
         return False
     except Exception as e:
         logger.error(f"Error publishing message: {e}")
+        metrics.PUBLISHED_MESSAGES.labels(status='error').inc()
+        span.end(status='error')
         return False
 
+# Dependency status for /ready: both brokers are probed (the collector holds no long-lived connections)
+_readiness_client = None
+
+def probe_rabbitmq():
+    import pika
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(
+            host=config.RABBITMQ_HOST,
+            port=config.RABBITMQ_PORT,
+            credentials=pika.PlainCredentials(config.RABBITMQ_USER, config.RABBITMQ_PASS),
+            socket_timeout=config.READY_PROBE_TIMEOUT,
+            connection_attempts=1
+        )
+    )
+    connection.close()
+
+def probe_mongodb():
+    global _readiness_client
+    if _readiness_client is None:
+        import pymongo
+        _readiness_client = pymongo.MongoClient(
+            host=config.MONGODB_HOST,
+            port=config.MONGODB_PORT,
+            username=config.MONGODB_USER,
+            password=config.MONGODB_PASS,
+            serverSelectionTimeoutMS=int(config.READY_PROBE_TIMEOUT * 1000),
+            connectTimeoutMS=int(config.READY_PROBE_TIMEOUT * 1000)
+        )
+    _readiness_client.admin.command('ping')
+
+def on_dependency_change(name, up):
+    metrics.DEPENDENCY_UP.labels(dependency=name).set(1 if up else 0)
+    if up:
+        logger.info(f"Dependency up: {name}")
+    else:
+        logger.warning(f"Dependency down: {name}")
+
+def on_ready(seconds):
+    metrics.STARTUP_SECONDS.labels(phase='ready').set(seconds)
+    logger.info(f"Ready {seconds:.2f}s after start")
+
+readiness = startup.Readiness(
+    probes={'rabbitmq': probe_rabbitmq, 'mongodb': probe_mongodb},
+    probe_ttl=config.READY_PROBE_TTL,
+    on_change=on_dependency_change,
+    on_ready=on_ready
+)
+
+# Build an error response for a request refused by admission control
+def rejection_response(rejection):
+    response = jsonify({"status": "error", "message": rejection.message})
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response, rejection.status_code
+
 # Validate incoming pollution data
 def validate_pollution_data(data):
     required_fields = ['latitude', 'longitude', 'timestamp', 'parameters']
@@ -112,12 +283,37 @@ def health_check():
     """Service health check"""
     return jsonify({"status": "ok", "service": "data-collector"}), 200
 
+# Readiness endpoint
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Returns 200 once RabbitMQ and MongoDB are reachable, 503 otherwise"""
+    ready, dependencies = readiness.check()
+    return jsonify({
+        "status": "ready" if ready else "not_ready",
+        "service": "data-collector",
+        "dependencies": dependencies,
+        "startup": {
+            "imports_seconds": round(imports_seconds, 3),
+            "ready_seconds": round(readiness.ready_after, 3) if readiness.ready_after is not None else None
+        }
+    }), 200 if ready else 503
+
+# Prometheus metrics endpoint
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose Prometheus metrics"""
+    payload, content_type = metrics.render_metrics()
+    return Response(payload, mimetype=content_type)
+
 # Single-entry pollution data endpoint
 @app.route('/api/v1/pollution/data', methods=['POST'])
 def submit_pollution_data():
     """Endpoint to receive a single pollution data reading"""
+    started = time.perf_counter()
+    span = tracer.start_span('collector.request', tracer.start_trace(), endpoint='data')
     try:
         data = request.json
+        metrics.READINGS_RECEIVED.labels(endpoint='data').inc()
 
         # Add timestamp if missing
         if 'timestamp' not in data:
@@ -126,15 +322,36 @@ def submit_pollution_data():
         # Validate data
         is_valid, message = validate_pollution_data(data)
         if not is_valid:
+            metrics.VALIDATION_FAILURES.labels(endpoint='data').inc()
             return jsonify({"status": "error", "message": message}), 400
 
+        # Admission control: shed load before touching the broker. Urgent
+        # readings have their own queue, so the routine backlog does not hold them back
+        urgent = routing.reading_lane(data, config.DANGEROUS_THRESHOLDS) == routing.URGENT
+        rejection = admission_controller.check_overload(urgent=urgent) or admission_controller.try_enter()
+        if rejection:
+            return rejection_response(rejection)
+        # The sensor's token is only spent once the reading holds a publish slot
+        rejection = admission_controller.check_sensor(data)
+        if rejection:
+            admission_controller.leave()
+            return rejection_response(rejection)
+
+        assign_station(data)
+
         # Publish to queue
-        success = publish_to_queue(data)
+        try:
+            success = publish_to_queue(data, span.context)
+        finally:
+            admission_controller.leave()
+        if not success:
+            admission_controller.refund_sensor(data)
         if success:
             return jsonify({
                 "status": "success",
                 "message": "Data received and queued successfully",
-                "data_id": data.get("id", "unknown")
+                "data_id": data.get("id", "unknown"),
+                "station_id": data.get("station_id")
             }), 202
         else:
             return jsonify({
@@ -145,11 +362,16 @@ def submit_pollution_data():
     except Exception as e:
         logger.error(f"Error processing data: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        metrics.REQUEST_LATENCY.labels(endpoint='data').observe(time.perf_counter() - started)
+        span.end()
 
 # Batch-entry pollution data endpoint
 @app.route('/api/v1/pollution/batch', methods=['POST'])
 def submit_batch_data():
     """Endpoint to receive a batch of pollution data readings"""
+    started = time.perf_counter()
+    span = tracer.start_span('collector.request', tracer.start_trace(), endpoint='batch')
     try:
         data_batch = request.json
 
@@ -159,34 +381,120 @@ def submit_batch_data():
                 "message": "Batch data must be provided as a list"
             }), 400
 
+        metrics.READINGS_RECEIVED.labels(endpoint='batch').inc(len(data_batch))
+
+        # Admission control for the batch as a whole
+        rejection = admission_controller.check_overload() or admission_controller.try_enter()
+        if rejection:
+            return rejection_response(rejection)
+
         results = []
-        for data in data_batch:
-            # Add timestamp if missing
-            if 'timestamp' not in data:
-                data['timestamp'] = datetime.utcnow().isoformat()
+        retry_after = 0
+        try:
+            for data in data_batch:
+                # Add timestamp if missing
+                if 'timestamp' not in data:
+                    data['timestamp'] = datetime.utcnow().isoformat()
 
-            is_valid, message = validate_pollution_data(data)
-            result = {
-                "data_id": data.get("id", "unknown"),
-                "status": "success" if is_valid else "error",
-                "message": message
-            }
+                is_valid, message = validate_pollution_data(data)
+                result = {
+                    "data_id": data.get("id", "unknown"),
+                    "status": "success" if is_valid else "error",
+                    "message": message
+                }
 
-            if is_valid:
-                if not publish_to_queue(data):
-                    result["status"] = "error"
-                    result["message"] = "Failed to queue data"
+                if is_valid:
+                    # Per-sensor limit applies to each reading
+                    rejection = admission_controller.check_sensor(data)
+                    if rejection:
+                        result["status"] = "error"
+                        result["message"] = rejection.message
+                        retry_after = max(retry_after, rejection.retry_after)
+                    else:
+                        assign_station(data)
+                        if not publish_to_queue(data, span.context):
+                            admission_controller.refund_sensor(data)
+                            result["status"] = "error"
+                            result["message"] = "Failed to queue data"
+                else:
+                    metrics.VALIDATION_FAILURES.labels(endpoint='batch').inc()
 
-            results.append(result)
+                results.append(result)
+        finally:
+            admission_controller.leave()
 
-        return jsonify({"status": "completed", "results": results}), 207
+        response = jsonify({"status": "completed", "results": results})
+        if retry_after:
+            response.headers['Retry-After'] = str(retry_after)
+        return response, 207
 
     except Exception as e:
         logger.error(f"Batch data processing error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        metrics.REQUEST_LATENCY.labels(endpoint='batch').observe(time.perf_counter() - started)
+        span.end()
+
+# Bulk CSV/Parquet import endpoint
+@app.route('/api/v1/pollution/import', methods=['POST'])
+def import_pollution_file():
+    """Endpoint to bulk import a CSV or Parquet file (multipart upload or local path)"""
+    import bulk_import
+    try:
+        mode = request.args.get('mode', 'queue')
+        fmt = request.args.get('format')
+
+        if 'file' in request.files:
+            upload = request.files['file']
+            fmt = bulk_import.detect_format(upload.filename, fmt)
+            source = upload.stream
+        else:
+            body = request.get_json(silent=True) or {}
+            if not body.get('path'):
+                return jsonify({
+                    "status": "error",
+                    "message": "Provide a 'file' upload or a JSON body with 'path'"
+                }), 400
+            source = bulk_import.resolve_local_path(body['path'])
+            fmt = bulk_import.detect_format(source, fmt or body.get('format'))
+            mode = body.get('mode', mode)
+
+        # Queue mode adds to the backlog, so it obeys the same overload checks,
+        # before it starts and for every chunk, and publishes within the in-flight limit
+        if mode == 'queue':
+            rejection = admission_controller.check_overload()
+            if rejection:
+                return rejection_response(rejection)
+
+        registry = get_station_registry()
+
+        summary = bulk_import.run_import(source, fmt, mode, registry=registry, admission=admission_controller)
+        metrics.READINGS_RECEIVED.labels(endpoint='import').inc(summary['rows_read'])
+        metrics.VALIDATION_FAILURES.labels(endpoint='import').inc(summary['rows_rejected'])
+        return jsonify({"status": "completed", "summary": summary}), 200
+
+    except bulk_import.BulkImportError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except bulk_import.BulkImportRejected as e:
+        # Stopped part way: report what was published so the client can resume
+        response = jsonify({"status": "error", "message": e.rejection.message, "summary": e.summary})
+        response.headers['Retry-After'] = str(e.rejection.retry_after)
+        return response, e.rejection.status_code
+    except Exception as e:
+        logger.error(f"Bulk import error: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+imports_seconds = startup.elapsed()
+metrics.STARTUP_SECONDS.labels(phase='imports').set(imports_seconds)
 
 # Main entry point
 if __name__ == '__main__':
+    logger.info(f"Modules loaded in {imports_seconds:.2f}s")
+
+    # Report time-to-ready once RabbitMQ and MongoDB are reachable
+    readiness.start_waiting(config.RETRY_INITIAL_DELAY, config.RETRY_MAX_DELAY)
+    tracer.start()
+
     app.run(
         host=config.HOST,
         port=config.PORT,
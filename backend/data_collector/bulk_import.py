@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Columnar bulk import of historical pollution readings.
+
+Reads CSV or Parquet files in chunks, validates each chunk with vectorized
+pandas checks and then either:
+
+  - queue mode: publishes the readings to the pollution data exchange, by
+    region and lane, in large packed batch messages, so they go through
+    normal processing and alerting
+  - backfill mode: writes them straight to MongoDB (no real-time alerting)
+    and recomputes the daily rollups for the affected days in one aggregation
+
+Expected columns: latitude, longitude, timestamp and one or more of
+PM2.5, PM10, NO2, SO2, O3 (empty cells mean "not measured"). An optional
+id column is carried through.
+
+Can also be run from the command line:
+
+    python bulk_import.py /data/import/2024.parquet --mode backfill
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pika
+import pymongo
+
+import config
+import routing
+import wire_format
+from station_registry import StationRegistry, STATIONS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+POLLUTANTS = ['PM2.5', 'PM10', 'NO2', 'SO2', 'O3']
+REQUIRED_COLUMNS = ['latitude', 'longitude', 'timestamp']
+SUPPORTED_FORMATS = ('csv', 'parquet')
+IMPORT_MODES = ('queue', 'backfill')
+
+# Field-safe names for pollutants in rollup documents ('.' is not allowed in $group keys)
+ROLLUP_KEYS = {'PM2.5': 'pm25', 'PM10': 'pm10', 'NO2': 'no2', 'SO2': 'so2', 'O3': 'o3'}
+
+
+class BulkImportError(Exception):
+    """Raised when a file cannot be imported at all (bad format, missing columns)."""
+
+
+class BulkImportRejected(Exception):
+    """Raised when admission control stops a queue-mode import part way through."""
+
+    def __init__(self, rejection, summary):
+        super().__init__(rejection.message)
+        self.rejection = rejection
+        self.summary = summary
+
+
+def detect_format(filename, explicit=None):
+    """Pick the file format from an explicit value or the file extension."""
+    fmt = (explicit or os.path.splitext(filename or '')[1].lstrip('.')).lower()
+    if fmt not in SUPPORTED_FORMATS:
+        raise BulkImportError(f"Unsupported format: {fmt or 'unknown'}. Valid: {', '.join(SUPPORTED_FORMATS)}")
+    return fmt
+
+
+def resolve_local_path(path):
+    """
+    Resolve a user-supplied path, refusing anything outside BULK_IMPORT_DIR.
+
+    Raises:
+        BulkImportError: If the path escapes the import directory or does not exist.
+    """
+    base = os.path.realpath(config.BULK_IMPORT_DIR)
+    full = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, full]) != base:
+        raise BulkImportError(f"Path must be inside {config.BULK_IMPORT_DIR}")
+    if not os.path.isfile(full):
+        raise BulkImportError(f"File not found: {path}")
+    return full
+
+
+def read_chunks(source, fmt, chunk_rows):
+    """
+    Yield DataFrames of at most chunk_rows rows from a path or file object.
+
+    Raises:
+        BulkImportError: If Parquet support is not installed.
+    """
+    if fmt == 'csv':
+        # Pollutant columns get read_csv's inferred dtypes (object where a cell is not
+        # numeric); validate_chunk coerces and checks them either way
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype={'id': str})
+        return
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise BulkImportError("Parquet import requires pyarrow")
+    parquet_file = pq.ParquetFile(source)
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def check_columns(columns):
+    """
+    Ensure the file has the required columns and at least one pollutant.
+
+    Raises:
+        BulkImportError: Listing what is missing.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise BulkImportError(f"Missing columns: {', '.join(missing)}")
+    if not any(p in columns for p in POLLUTANTS):
+        raise BulkImportError(f"At least one pollutant column required: {', '.join(POLLUTANTS)}")
+
+
+def validate_chunk(df):
+    """
+    Validate a chunk with column-wise checks, mirroring validate_pollution_data().
+
+    Args:
+        df (DataFrame): Raw chunk.
+
+    Returns:
+        tuple: (clean DataFrame with numeric columns and ISO timestamps,
+                dict of rejection reason -> row count)
+    """
+    check_columns(df.columns)
+    pollutants = [p for p in POLLUTANTS if p in df.columns]
+
+    lat = pd.to_numeric(df['latitude'], errors='coerce')
+    lon = pd.to_numeric(df['longitude'], errors='coerce')
+    ts = pd.to_datetime(df['timestamp'], errors='coerce', utc=True, format='ISO8601')
+    values = df[pollutants].apply(pd.to_numeric, errors='coerce')
+
+    # A non-empty cell that failed numeric conversion is an error, an empty one is "not measured"
+    non_numeric = (values.isna() & df[pollutants].notna()).any(axis=1)
+
+    checks = {
+        'invalid latitude': ~lat.between(-90, 90),
+        'invalid longitude': ~lon.between(-180, 180),
+        'invalid timestamp': ts.isna(),
+        'non-numeric parameter value': non_numeric,
+        'negative parameter value': (values < 0).any(axis=1),
+        'no parameter values': values.isna().all(axis=1),
+    }
+
+    rejected = pd.Series(False, index=df.index)
+    reasons = {}
+    for reason, mask in checks.items():
+        # Attribute each bad row to the first failed check only
+        new = mask & ~rejected
+        count = int(new.sum())
+        if count:
+            reasons[reason] = count
+        rejected |= mask
+
+    keep = ~rejected
+    clean = pd.DataFrame({
+        'latitude': lat[keep],
+        'longitude': lon[keep],
+        'timestamp': ts[keep].dt.tz_convert(None).dt.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+    for p in pollutants:
+        clean[p] = values.loc[keep, p]
+    if 'id' in df.columns:
+        clean['id'] = df.loc[keep, 'id']
+    return clean, reasons
+
+
+def iter_readings(clean):
+    """Yield reading dicts from a validated chunk, dropping unmeasured pollutants."""
+    pollutants = [p for p in POLLUTANTS if p in clean.columns]
+    has_id = 'id' in clean.columns
+    values = clean[pollutants].to_numpy(dtype=np.float64)
+    present = ~np.isnan(values)
+    lats = clean['latitude'].to_numpy()
+    lons = clean['longitude'].to_numpy()
+    timestamps = clean['timestamp'].to_numpy()
+    ids = clean['id'].to_numpy() if has_id else None
+
+    for i in range(len(clean)):
+        reading = {
+            'latitude': float(lats[i]),
+            'longitude': float(lons[i]),
+            'timestamp': timestamps[i],
+            'parameters': {
+                p: float(values[i, j]) for j, p in enumerate(pollutants) if present[i, j]
+            }
+        }
+        if has_id and pd.notna(ids[i]):
+            reading['id'] = str(ids[i])
+        yield reading
+
+
+def publish_chunk(channel, readings, message_size):
+    """
+    Publish readings to the pollution data exchange in packed batch messages.
+
+    Readings are grouped by routing key first, so each message goes to the
+    lane queue of the processors serving its region, like a single reading.
+    """
+    by_key = {}
+    for reading in readings:
+        lane = routing.reading_lane(reading, config.DANGEROUS_THRESHOLDS)
+        by_key.setdefault(routing.routing_key(routing.READINGS, reading, lane), []).append(reading)
+
+    published = 0
+    for key, group in by_key.items():
+        for start in range(0, len(group), message_size):
+            batch = group[start:start + message_size]
+            body, content_type = wire_format.encode_reading_batch(batch, config.WIRE_FORMAT)
+            channel.basic_publish(
+                exchange=config.POLLUTION_DATA_EXCHANGE,
+                routing_key=key,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,
+                    content_type=content_type,
+                    headers={'published_at': int(time.time() * 1000)}
+                )
+            )
+            published += 1
+    return published
+
+
+def build_rollup_pipeline(start, end):
+    """
+    Aggregation that recomputes daily per-location rollups for [start, end].
+
+    Each rollup holds count/mean/max per pollutant and the pollutants whose
+    daily mean exceeds the WHO guideline ('warning') or twice it ('danger').
+    Results are merged into ROLLUP_COLLECTION keyed by location and day.
+    """
+    day_start = start[:10]
+    day_end = end[:10] + 'T23:59:59.999999'
+    group = {
+        '_id': {
+            'latitude': '$latitude',
+            'longitude': '$longitude',
+            'day': {'$substrBytes': ['$timestamp', 0, 10]}
+        },
+        'count': {'$sum': 1}
+    }
+    for pollutant, key in ROLLUP_KEYS.items():
+        field = {'$getField': {'field': pollutant, 'input': '$parameters'}}
+        group[f'{key}_mean'] = {'$avg': field}
+        group[f'{key}_max'] = {'$max': field}
+        group[f'{key}_count'] = {'$sum': {'$cond': [{'$ne': [{'$type': field}, 'missing']}, 1, 0]}}
+
+    candidates = []
+    for pollutant, threshold in config.WHO_THRESHOLDS.items():
+        mean = f'${ROLLUP_KEYS[pollutant]}_mean'
+        candidates.append({
+            'parameter': pollutant,
+            'mean': mean,
+            'threshold': threshold,
+            'severity': {'$cond': [{'$gt': [mean, threshold * 2]}, 'danger', 'warning']}
+        })
+
+    project = {
+        '_id': 1,
+        'latitude': '$_id.latitude',
+        'longitude': '$_id.longitude',
+        'day': '$_id.day',
+        'count': 1,
+        'pollutants': {
+            key: {'mean': f'${key}_mean', 'max': f'${key}_max', 'count': f'${key}_count'}
+            for key in ROLLUP_KEYS.values()
+        },
+        'exceedances': {
+            '$filter': {
+                'input': candidates,
+                'cond': {'$and': [
+                    {'$ne': ['$$this.mean', None]},
+                    {'$gt': ['$$this.mean', '$$this.threshold']}
+                ]}
+            }
+        },
+        'updated_at': '$$NOW'
+    }
+
+    return [
+        {'$match': {'timestamp': {'$gte': day_start, '$lte': day_end}}},
+        {'$group': group},
+        {'$project': project},
+        {'$merge': {'into': config.ROLLUP_COLLECTION, 'on': '_id', 'whenMatched': 'replace'}}
+    ]
+
+
+def get_mongodb_client():
+    return pymongo.MongoClient(
+        host=config.MONGODB_HOST,
+        port=config.MONGODB_PORT,
+        username=config.MONGODB_USER,
+        password=config.MONGODB_PASS
+    )
+
+
+def get_rabbitmq_connection():
+    credentials = pika.PlainCredentials(config.RABBITMQ_USER, config.RABBITMQ_PASS)
+    return pika.BlockingConnection(
+        pika.ConnectionParameters(
+            host=config.RABBITMQ_HOST,
+            port=config.RABBITMQ_PORT,
+            credentials=credentials
+        )
+    )
+
+
+def run_import(source, fmt, mode='queue', chunk_rows=None, message_size=None, registry=None, admission=None):
+    """
+    Import a CSV/Parquet file.
+
+    Args:
+        source: Local path or binary file object.
+        fmt (str): 'csv' or 'parquet'.
+        mode (str): 'queue' to publish for normal processing, 'backfill' to
+            write directly to MongoDB and recompute rollups.
+        chunk_rows (int): Rows per validation chunk.
+        message_size (int): Readings per queue message (queue mode).
+        registry (StationRegistry): Tags readings with their station id, if given.
+        admission (AdmissionController): In queue mode, each chunk passes the
+            overload checks and holds an in-flight publish slot, if given.
+
+    Returns:
+        dict: Import summary (row counts, rejection reasons, throughput).
+
+    Raises:
+        BulkImportError: On unsupported input.
+        BulkImportRejected: When admission control refuses a chunk; the
+            chunks before it are published.
+    """
+    if mode not in IMPORT_MODES:
+        raise BulkImportError(f"Invalid mode: {mode}. Valid: {', '.join(IMPORT_MODES)}")
+    chunk_rows = chunk_rows or config.BULK_IMPORT_CHUNK_ROWS
+    message_size = message_size or config.BULK_IMPORT_MESSAGE_SIZE
+
+    started = time.perf_counter()
+    summary = {
+        'mode': mode,
+        'rows_read': 0,
+        'rows_valid': 0,
+        'rows_rejected': 0,
+        'rejections': {},
+        'messages_published': 0,
+        'documents_inserted': 0,
+        'rollup_days': None
+    }
+    min_ts, max_ts = None, None
+
+    connection, client = None, None
+    try:
+        if mode == 'queue':
+            connection = get_rabbitmq_connection()
+            channel = connection.channel()
+            routing.declare_exchange(channel, config.POLLUTION_DATA_EXCHANGE, config.POLLUTION_DATA_QUEUE)
+        else:
+            client = get_mongodb_client()
+            collection = client[config.MONGODB_DB].pollution_data
+
+        for chunk in read_chunks(source, fmt, chunk_rows):
+            clean, reasons = validate_chunk(chunk)
+            summary['rows_read'] += len(chunk)
+            summary['rows_valid'] += len(clean)
+            summary['rows_rejected'] += len(chunk) - len(clean)
+            for reason, count in reasons.items():
+                summary['rejections'][reason] = summary['rejections'].get(reason, 0) + count
+            if clean.empty:
+                continue
+
+            readings = list(iter_readings(clean))
+            if registry is not None:
+                for reading in readings:
+                    reading['station_id'] = registry.resolve(reading['latitude'], reading['longitude'])
+            if mode == 'queue':
+                if admission is not None:
+                    rejection = (admission.check_overload()
+                                 or admission.wait_enter(config.BULK_IMPORT_SLOT_WAIT))
+                    if rejection:
+                        raise BulkImportRejected(rejection, summary)
+                try:
+                    summary['messages_published'] += publish_chunk(channel, readings, message_size)
+                finally:
+                    if admission is not None:
+                        admission.leave()
+            else:
+                result = collection.insert_many(readings, ordered=False)
+                summary['documents_inserted'] += len(result.inserted_ids)
+                chunk_min, chunk_max = clean['timestamp'].min(), clean['timestamp'].max()
+                min_ts = chunk_min if min_ts is None else min(min_ts, chunk_min)
+                max_ts = chunk_max if max_ts is None else max(max_ts, chunk_max)
+
+            logger.info(f"Bulk import progress: {summary['rows_read']} rows read, {summary['rows_valid']} valid")
+
+        if mode == 'backfill' and min_ts is not None:
+            # Recompute every touched day in one server-side pass
+            collection.aggregate(build_rollup_pipeline(min_ts, max_ts))
+            summary['rollup_days'] = {'start': min_ts[:10], 'end': max_ts[:10]}
+    finally:
+        if connection:
+            connection.close()
+        if client:
+            client.close()
+
+    elapsed = time.perf_counter() - started
+    summary['elapsed_seconds'] = round(elapsed, 2)
+    summary['rows_per_second'] = round(summary['rows_read'] / elapsed, 1) if elapsed else None
+    return summary
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Bulk import CSV/Parquet pollution data")
+    parser.add_argument('path', help='CSV or Parquet file')
+    parser.add_argument('--format', choices=SUPPORTED_FORMATS, help='Defaults to the file extension')
+    parser.add_argument('--mode', choices=IMPORT_MODES, default='queue')
+    parser.add_argument('--chunk-rows', type=int, default=config.BULK_IMPORT_CHUNK_ROWS)
+    parser.add_argument('--message-size', type=int, default=config.BULK_IMPORT_MESSAGE_SIZE)
+    args = parser.parse_args()
+
+    fmt = detect_format(args.path, args.format)
+    client = get_mongodb_client()
+    try:
+        registry = StationRegistry(client[config.MONGODB_DB][STATIONS_COLLECTION])
+        registry.sync()
+        summary = run_import(args.path, fmt, args.mode, args.chunk_rows, args.message_size, registry)
+    finally:
+        client.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,82 @@ RABBITMQ_HOST = os.environ.get('RABBITMQ_HOST', 'rabbitmq')
 RABBITMQ_PORT = int(os.environ.get('RABBITMQ_PORT', 5672))
 RABBITMQ_USER = os.environ.get('RABBITMQ_USER', 'guest')
 RABBITMQ_PASS = os.environ.get('RABBITMQ_PASS', 'guest')
+# Fail publishes instead of hanging when the broker is slow or blocked (seconds)
+RABBITMQ_SOCKET_TIMEOUT = float(os.environ.get('RABBITMQ_SOCKET_TIMEOUT', 5))
+RABBITMQ_BLOCKED_TIMEOUT = float(os.environ.get('RABBITMQ_BLOCKED_TIMEOUT', 10))
 
-# Queue name
-POLLUTION_DATA_QUEUE = 'pollution_data_queue'
\ No newline at end of file
+# Queue message encoding for published messages: 'json' or 'msgpack'.
+# Consumers accept both, so switch producers only after consumers are upgraded.
+WIRE_FORMAT = os.environ.get('WIRE_FORMAT', 'json').lower()
+
+# Queue names
+# Fallback queue of POLLUTION_DATA_EXCHANGE, drained by the processor
+POLLUTION_DATA_QUEUE = 'pollution_data_queue'
+# Readings are published to this topic exchange by region and lane (see routing.py);
+# the processor binds the queues
+POLLUTION_DATA_EXCHANGE = os.environ.get('POLLUTION_DATA_EXCHANGE', 'pollution_data_exchange')
+POLLUTION_DATA_PRIORITY_QUEUE = os.environ.get('POLLUTION_DATA_PRIORITY_QUEUE', 'pollution_data_priority_queue')
+
+# Admission control
+ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', 'True').lower() == 'true'
+# Reject new readings with 503 once this many messages are waiting in the fallback
+# queue or any of the processors' routine lane queues in QUEUE_DEPTH_QUEUES
+# (comma-separated, <POLLUTION_DATA_QUEUE>.<queue group>, see routing.py)
+QUEUE_DEPTH_LIMIT = int(os.environ.get('QUEUE_DEPTH_LIMIT', 10000))
+QUEUE_DEPTH_QUEUES = os.environ.get('QUEUE_DEPTH_QUEUES', f'{POLLUTION_DATA_QUEUE}.all')
+QUEUE_DEPTH_CHECK_INTERVAL = float(os.environ.get('QUEUE_DEPTH_CHECK_INTERVAL', 1.0))
+# Requests allowed to publish at the same time
+MAX_IN_FLIGHT_PUBLISHES = int(os.environ.get('MAX_IN_FLIGHT_PUBLISHES', 64))
+# Per-sensor token bucket: sustained readings per second and burst size
+SENSOR_RATE_PER_SECOND = float(os.environ.get('SENSOR_RATE_PER_SECOND', 1.0))
+SENSOR_BURST = int(os.environ.get('SENSOR_BURST', 10))
+MAX_TRACKED_SENSORS = int(os.environ.get('MAX_TRACKED_SENSORS', 100000))
+# Retry-After (seconds) sent with overload responses
+OVERLOAD_RETRY_AFTER = int(os.environ.get('OVERLOAD_RETRY_AFTER', 5))
+
+# MongoDB configuration (station registry and bulk import backfill mode)
+MONGODB_HOST = os.environ.get('MONGODB_HOST', 'mongodb')
+MONGODB_PORT = int(os.environ.get('MONGODB_PORT', 27017))
+MONGODB_USER = os.environ.get('MONGODB_USER', '')
+MONGODB_PASS = os.environ.get('MONGODB_PASS', '')
+MONGODB_DB = os.environ.get('MONGODB_DB', 'air_pollution')
+# Station registry: MongoDB timeout (seconds) on the request path, and how long
+# to tag readings without registering them after a failure
+REGISTRY_TIMEOUT = float(os.environ.get('REGISTRY_TIMEOUT', 1))
+REGISTRY_RETRY_INTERVAL = float(os.environ.get('REGISTRY_RETRY_INTERVAL', 30))
+
+# Bulk import configuration
+# Files referenced by local path must live under this directory
+BULK_IMPORT_DIR = os.environ.get('BULK_IMPORT_DIR', '/data/import')
+BULK_IMPORT_CHUNK_ROWS = int(os.environ.get('BULK_IMPORT_CHUNK_ROWS', 50000))
+# Readings per queue message in queue mode
+BULK_IMPORT_MESSAGE_SIZE = int(os.environ.get('BULK_IMPORT_MESSAGE_SIZE', 1000))
+# Seconds a queue-mode import chunk waits for an in-flight publish slot before the import stops
+BULK_IMPORT_SLOT_WAIT = float(os.environ.get('BULK_IMPORT_SLOT_WAIT', 5))
+ROLLUP_COLLECTION = 'pollution_daily_rollups'
+
+# WHO guideline thresholds (µg/m³) for the daily rollups.
+# Keep in sync with data_processor/anomaly_detection.py.
+WHO_THRESHOLDS = {
+    'PM2.5': 15.0,
+    'PM10': 45.0,
+    'NO2': 25.0,
+    'SO2': 40.0,
+    'O3': 100.0
+}
+# Readings above these values take the urgent lane and are admitted even when
+# the routine backlog is full. Keep in sync with data_processor/anomaly_detection.py.
+DANGEROUS_THRESHOLDS = {pollutant: threshold * 2 for pollutant, threshold in WHO_THRESHOLDS.items()}
+
+# Reconnect backoff (seconds): jittered, doubling from the initial delay up to the maximum
+RETRY_INITIAL_DELAY = float(os.environ.get('RETRY_INITIAL_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 30))
+# Readiness probes: seconds a result is reused, and the connect timeout of a probe
+READY_PROBE_TTL = float(os.environ.get('READY_PROBE_TTL', 5))
+READY_PROBE_TIMEOUT = float(os.environ.get('READY_PROBE_TIMEOUT', 2))
+
+# Tracing (see tracing.py): spans are appended to TRACE_FILE (empty disables
+# tracing); TRACE_SAMPLE_RATE of the incoming requests start a trace
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))
+TRACE_FLUSH_INTERVAL = float(os.environ.get('TRACE_FLUSH_INTERVAL', 1.0))
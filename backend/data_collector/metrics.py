@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Latency buckets (seconds) tuned for broker round trips
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Readings received, labelled by the endpoint they came through
+READINGS_RECEIVED = Counter(
+    'collector_readings_received_total',
+    'Pollution readings received by the collector',
+    ['endpoint']
+)
+
+# Readings rejected by validate_pollution_data()
+VALIDATION_FAILURES = Counter(
+    'collector_validation_failures_total',
+    'Pollution readings rejected by validation',
+    ['endpoint']
+)
+
+# Outcome of publish_to_queue()
+PUBLISHED_MESSAGES = Counter(
+    'collector_published_messages_total',
+    'Messages published to RabbitMQ',
+    ['status']
+)
+
+# Published readings per priority lane (see routing.py)
+PUBLISHED_LANE = Counter(
+    'collector_published_lane_total',
+    'Readings published per lane',
+    ['lane']
+)
+
+# Encoded message sizes, to compare wire formats
+PUBLISHED_BYTES = Counter(
+    'collector_published_bytes_total',
+    'Bytes published to RabbitMQ',
+    ['content_type']
+)
+
+# Time spent connecting and publishing one reading to RabbitMQ
+PUBLISH_LATENCY = Histogram(
+    'collector_publish_latency_seconds',
+    'Time to publish a reading to RabbitMQ',
+    buckets=LATENCY_BUCKETS
+)
+
+# HTTP request latency per endpoint
+REQUEST_LATENCY = Histogram(
+    'collector_request_latency_seconds',
+    'HTTP request handling time',
+    ['endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+
+# Requests refused by admission control, by reason
+ADMISSION_REJECTIONS = Counter(
+    'collector_admission_rejections_total',
+    'Requests or readings rejected by admission control',
+    ['reason']
+)
+
+# Last observed depth of the deepest routine queue
+QUEUE_DEPTH = Gauge(
+    'collector_queue_depth',
+    'Messages waiting in the deepest routine pollution data queue'
+)
+
+# Requests currently publishing to RabbitMQ
+IN_FLIGHT_PUBLISHES = Gauge(
+    'collector_in_flight_publishes',
+    'Requests currently publishing to RabbitMQ'
+)
+
+# Startup phases ('imports', 'ready'), in seconds since the service started loading
+STARTUP_SECONDS = Gauge(
+    'collector_startup_seconds',
+    'Time from the start of loading to each startup phase',
+    ['phase']
+)
+
+# Dependency reachability as last seen by readiness checks (1 up, 0 down)
+DEPENDENCY_UP = Gauge(
+    'collector_dependency_up',
+    'Whether a dependency is reachable',
+    ['dependency']
+)
+
+def render_metrics():
+    """
+    Render all registered metrics in the Prometheus text exposition format.
+
+    Returns:
+        tuple: (payload bytes, content type header value)
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
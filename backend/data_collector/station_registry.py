@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Station registry shared by data_collector and data_processor. This file is
+# kept identical in both services.
+#
+# A station is the 0.01° box a reading falls in, the same box services used
+# to match "the same station" by coordinates. Its id is derived from the box,
+# so every instance assigns the same id without coordination:
+#
+#   stn:39.93:32.87
+#
+# Stations are stored in the `stations` collection:
+#
+#   {_id: station_id, latitude, longitude, registered_at}
+#
+# Each process keeps the stations in memory together with the neighbour
+# graph (stations within NEIGHBOUR_RADIUS_KM). The graph is computed once
+# when the registry loads, through a coarse grid so only nearby cells are
+# compared, and extended incrementally as new stations appear.
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pymongo
+
+logger = logging.getLogger(__name__)
+
+STATIONS_COLLECTION = 'stations'
+NEIGHBOUR_RADIUS_KM = 25.0
+
+# Grid cell size for the neighbour search, in degrees
+_GRID_DEGREES = 0.25
+_KM_PER_DEGREE = 111.32
+# Overlap between syncs, to tolerate clock skew between instances
+_SYNC_OVERLAP = timedelta(seconds=60)
+# Minimum seconds between syncs triggered by station ids the cache does not know
+MISS_SYNC_INTERVAL = 30.0
+
+
+def station_id(latitude, longitude):
+    """Stable id of the station whose 0.01° box contains the coordinates."""
+    return f"stn:{round(float(latitude), 2):.2f}:{round(float(longitude), 2):.2f}"
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers."""
+    R = 6371.0
+    φ1, φ2 = math.radians(lat1), math.radians(lat2)
+    Δφ = math.radians(lat2 - lat1)
+    Δλ = math.radians(lon2 - lon1)
+    a = math.sin(Δφ/2)**2 + math.cos(φ1) * math.cos(φ2) * math.sin(Δλ/2)**2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _cell(latitude, longitude):
+    return (math.floor(latitude / _GRID_DEGREES), math.floor(longitude / _GRID_DEGREES))
+
+
+class StationRegistry:
+    """
+    In-memory cache of the station registry and its neighbour graph.
+
+    Args:
+        collection: pymongo collection holding the stations.
+        radius_km (float): Neighbour radius.
+        miss_sync_interval (float): Minimum seconds between syncs triggered
+            by get_neighbours for unknown station ids.
+    """
+
+    def __init__(self, collection, radius_km=NEIGHBOUR_RADIUS_KM, miss_sync_interval=MISS_SYNC_INTERVAL):
+        self.collection = collection
+        self.radius_km = radius_km
+        self.miss_sync_interval = miss_sync_interval
+        self.stations = {}      # station_id -> (latitude, longitude)
+        self.neighbours = {}    # station_id -> set of station_ids
+        self._grid = {}         # grid cell -> set of station_ids
+        self._synced_at = None
+        self._miss_synced_at = None     # monotonic time of the last sync get_neighbours triggered
+        self._lock = threading.RLock()
+
+    def sync(self):
+        """Load stations registered since the last sync (all of them the first time)."""
+        query = {}
+        if self._synced_at is not None:
+            query['registered_at'] = {'$gte': self._synced_at - _SYNC_OVERLAP}
+        started = datetime.utcnow()
+        docs = list(self.collection.find(query, {'latitude': 1, 'longitude': 1}))
+        with self._lock:
+            for doc in docs:
+                self._add(doc['_id'], doc['latitude'], doc['longitude'])
+            self._synced_at = started
+        return len(docs)
+
+    def resolve(self, latitude, longitude):
+        """
+        Return the station id for a reading's coordinates, registering the
+        station on first sight.
+        """
+        latitude, longitude = round(float(latitude), 2), round(float(longitude), 2)
+        sid = station_id(latitude, longitude)
+        if sid in self.stations:
+            return sid
+
+        # Upsert: another instance may be registering the same station
+        self.collection.update_one(
+            {'_id': sid},
+            {'$setOnInsert': {
+                'latitude': latitude,
+                'longitude': longitude,
+                'registered_at': datetime.utcnow()
+            }},
+            upsert=True
+        )
+        # Also picks up stations other instances registered meanwhile
+        self.sync()
+        with self._lock:
+            self._add(sid, latitude, longitude)
+        logger.info(f"Registered station {sid}")
+        return sid
+
+    def add_local(self, latitude, longitude):
+        """Add a station to this cache only, without registering it (offline tools)."""
+        latitude, longitude = round(float(latitude), 2), round(float(longitude), 2)
+        sid = station_id(latitude, longitude)
+        with self._lock:
+            self._add(sid, latitude, longitude)
+        return sid
+
+    def get_neighbours(self, sid):
+        """
+        Ids of the stations within radius_km of `sid`, excluding itself.
+
+        An id the cache does not know (registered by a collector after our
+        last sync) triggers a sync, at most once per miss_sync_interval; until
+        then the station is treated as not registered.
+
+        Returns:
+            frozenset (a copy: syncs on other threads extend the graph), or
+            None if the station is not registered.
+        """
+        with self._lock:
+            neighbours = self.neighbours.get(sid)
+            if neighbours is not None:
+                return frozenset(neighbours)
+            now = time.monotonic()
+            if self._miss_synced_at is not None and now - self._miss_synced_at < self.miss_sync_interval:
+                return None
+            self._miss_synced_at = now
+        self.sync()
+        with self._lock:
+            neighbours = self.neighbours.get(sid)
+            return frozenset(neighbours) if neighbours is not None else None
+
+    def _add(self, sid, latitude, longitude):
+        if sid in self.stations:
+            return
+        lat_cells = math.ceil(self.radius_km / _KM_PER_DEGREE / _GRID_DEGREES)
+        cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+        lon_cells = math.ceil(self.radius_km / (_KM_PER_DEGREE * cos_lat) / _GRID_DEGREES)
+
+        row, col = _cell(latitude, longitude)
+        found = set()
+        for r in range(row - lat_cells, row + lat_cells + 1):
+            for c in range(col - lon_cells, col + lon_cells + 1):
+                for other in self._grid.get((r, c), ()):
+                    other_lat, other_lon = self.stations[other]
+                    if haversine_distance(latitude, longitude, other_lat, other_lon) <= self.radius_km:
+                        found.add(other)
+
+        self.stations[sid] = (latitude, longitude)
+        self.neighbours[sid] = found
+        for other in found:
+            self.neighbours[other].add(sid)
+        self._grid.setdefault((row, col), set()).add(sid)
+
+
+def ensure_indexes(db):
+    """
+    Indexes of the processor's pollution data reads: station-keyed history,
+    and time windows (statistics day counts, reprocessing runs).
+    """
+    db.pollution_data.create_index([('station_id', pymongo.ASCENDING), ('timestamp', pymongo.ASCENDING)])
+    db.pollution_data.create_index('timestamp')
+    db[STATIONS_COLLECTION].create_index('registered_at')
+
+
+def backfill(db):
+    """
+    Register the stations of readings stored without a station_id and tag them.
+
+    Returns:
+        int: Number of readings updated.
+    """
+    registry = StationRegistry(db[STATIONS_COLLECTION])
+    registry.sync()
+    boxes = db.pollution_data.aggregate([
+        {'$match': {'station_id': {'$exists': False}}},
+        {'$group': {'_id': {
+            'latitude': {'$round': [{'$toDouble': '$latitude'}, 2]},
+            'longitude': {'$round': [{'$toDouble': '$longitude'}, 2]}
+        }}}
+    ])
+    updated = 0
+    for box in boxes:
+        lat, lon = box['_id']['latitude'], box['_id']['longitude']
+        sid = registry.resolve(lat, lon)
+        result = db.pollution_data.update_many(
+            {
+                'station_id': {'$exists': False},
+                'latitude': {'$gte': lat - 0.005, '$lt': lat + 0.005},
+                'longitude': {'$gte': lon - 0.005, '$lt': lon + 0.005}
+            },
+            {'$set': {'station_id': sid}}
+        )
+        updated += result.modified_count
+    return updated
+
+
+if __name__ == '__main__':
+    import argparse
+    import config
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Station registry maintenance")
+    parser.add_argument('command', choices=['backfill', 'stats'])
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(
+        host=config.MONGODB_HOST,
+        port=config.MONGODB_PORT,
+        username=config.MONGODB_USER,
+        password=config.MONGODB_PASS
+    )
+    db = client[config.MONGODB_DB]
+    ensure_indexes(db)
+    if args.command == 'backfill':
+        print(f"Tagged {backfill(db)} readings with a station_id")
+    else:
+        registry = StationRegistry(db[STATIONS_COLLECTION])
+        registry.sync()
+        degrees = [len(n) for n in registry.neighbours.values()]
+        print(f"{len(registry.stations)} stations, "
+              f"{sum(degrees) / len(degrees) if degrees else 0:.1f} neighbours on average")
+    client.close()
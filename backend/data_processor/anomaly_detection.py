@@ -22,18 +22,38 @@ WHO_THRESHOLDS = {
     'O3': 100.0     # 8-hour mean
 }
 
+# Averaging window each WHO value applies to (see exposure.py)
+AVERAGING_WINDOWS = {
+    'PM2.5': '24h',
+    'PM10': '24h',
+    'NO2': '24h',
+    'SO2': '24h',
+    'O3': '8h'
+}
+
+# Regional comparison: neighbours' readings from this many hours before the reading
+REGIONAL_WINDOW_HOURS = 6
+
 # Dangerous thresholds defined as twice the WHO values
 DANGEROUS_THRESHOLDS = {
     pollutant: threshold * 2
     for pollutant, threshold in WHO_THRESHOLDS.items()
 }
 
-def is_who_threshold_exceeded(data):
+def is_who_threshold_exceeded(data, exposures=None):
     """
     Check which pollutant parameters exceed WHO guideline or dangerous thresholds.
 
     Args:
         data (dict): A single pollution reading, containing a 'parameters' dict.
+        exposures (dict, optional): pollutant -> {window: rolling mean or None}
+            from the exposure engine. When given, each pollutant is judged on
+            the mean over its AVERAGING_WINDOWS period instead of the single
+            reading. While that mean is not available yet (the window is
+            below EXPOSURE_MIN_COVERAGE after a restart or for a new
+            station), the single reading is judged as without exposures.
+            Pollutants missing from exposures (readings more than 24 hours
+            behind the station's newest) are skipped.
 
     Returns:
         list of dict: A list of threshold-exceeded anomaly records.
@@ -50,11 +70,24 @@ def is_who_threshold_exceeded(data):
         except (TypeError, ValueError):
             continue
 
+        window = None
+        label = pollutant
+        if exposures is not None:
+            if pollutant not in exposures:
+                # Too old to fall in any window
+                continue
+            mean = exposures[pollutant].get(AVERAGING_WINDOWS[pollutant])
+            # Until the window has enough coverage the single reading is judged
+            if mean is not None:
+                window = AVERAGING_WINDOWS[pollutant]
+                reading_value, value = value, mean
+                label = f"{pollutant} {window} mean"
+
         # Check against WHO guideline
         if value > WHO_THRESHOLDS[pollutant]:
             severity = "warning"
             message = (
-                f"{pollutant} exceeded WHO threshold "
+                f"{label} exceeded WHO threshold "
                 f"({value:.2f} > {WHO_THRESHOLDS[pollutant]:.2f})"
             )
 
@@ -62,11 +95,11 @@ def is_who_threshold_exceeded(data):
             if value > DANGEROUS_THRESHOLDS[pollutant]:
                 severity = "danger"
                 message = (
-                    f"{pollutant} exceeded dangerous threshold "
+                    f"{label} exceeded dangerous threshold "
                     f"({value:.2f} > {DANGEROUS_THRESHOLDS[pollutant]:.2f})"
                 )
 
-            anomalies.append({
+            anomaly = {
                 'type': 'threshold_exceeded',
                 'parameter': pollutant,
                 'value': value,
@@ -74,7 +107,11 @@ def is_who_threshold_exceeded(data):
                 'dangerous_threshold': DANGEROUS_THRESHOLDS[pollutant],
                 'severity': severity,
                 'message': message
-            })
+            }
+            if window:
+                anomaly['averaging_window'] = window
+                anomaly['reading_value'] = reading_value
+            anomalies.append(anomaly)
 
     return anomalies
 
@@ -99,7 +136,50 @@ def calculate_z_score(value, series):
 
     return (value - mean) / std
 
-def detect_anomalies(current_data, historical_data):
+def detect_forecast_anomalies(current_data, forecasts):
+    """
+    Score a reading against per-station seasonal forecasts (see baseline.py).
+
+    Triggers if the residual is more than 3 standard deviations of the
+    slot's usual spread. A large percent difference alone does not trigger,
+    since the forecast already follows the daily cycle.
+
+    Args:
+        current_data (dict): The latest pollution reading.
+        forecasts (dict): pollutant -> Forecast for warmed-up slots.
+
+    Returns:
+        list of dict: Statistical anomalies, in the same shape as detect_anomalies.
+    """
+    anomalies = []
+    for pollutant, raw_value in current_data.get('parameters', {}).items():
+        forecast = forecasts.get(pollutant)
+        if forecast is None:
+            continue
+        try:
+            curr_value = float(raw_value)
+        except (TypeError, ValueError):
+            continue
+
+        z = (curr_value - forecast.expected) / forecast.std
+        if abs(z) <= 3:
+            continue
+        pct_change = ((curr_value - forecast.expected) / forecast.expected * 100) if forecast.expected > 0 else 0
+        direction = "above" if z > 0 else "below"
+        anomalies.append({
+            'type': 'statistical_anomaly',
+            'parameter': pollutant,
+            'value': curr_value,
+            'average': forecast.expected,
+            'expected': forecast.expected,
+            'z_score': z,
+            'percent_change': pct_change,
+            'severity': "danger" if abs(z) > 5 else "warning",
+            'message': f"{pollutant} {abs(pct_change):.1f}% {direction} seasonal baseline (Z-score: {z:.2f})"
+        })
+    return anomalies
+
+def detect_anomalies(current_data, historical_data, neighbours=None, forecasts=None):
     """
     Compare current reading against historical data to find statistical anomalies.
 
@@ -107,19 +187,46 @@ def detect_anomalies(current_data, historical_data):
       - |Z-score| > 3
       - Percent change > 50%
 
-    Also delegates to regional anomaly detection.
+    Pollutants with a seasonal forecast are scored on the forecast residual
+    instead (see detect_forecast_anomalies). Also delegates to regional
+    anomaly detection.
 
     Args:
         current_data (dict): The latest pollution reading.
         historical_data (list of dict): Past readings.
+        neighbours (set of str, optional): Ids of the stations within 25km of
+            the reading's station, from the station registry. When given,
+            historical_data holds readings of the station and its neighbours,
+            told apart by 'station_id'.
+        forecasts (dict, optional): pollutant -> Forecast from the station's
+            seasonal baseline.
 
     Returns:
         list of dict: Statistical and regional anomalies detected.
     """
     anomalies = []
 
+    regional_data = historical_data
+    if neighbours is not None:
+        station_id = current_data.get('station_id')
+        regional_data = [rec for rec in historical_data if rec.get('station_id') in neighbours]
+        historical_data = [rec for rec in historical_data if rec.get('station_id') == station_id]
+
+    forecasts = forecasts or {}
+    regional_current = current_data
+    if forecasts:
+        anomalies.extend(detect_forecast_anomalies(current_data, forecasts))
+        if neighbours is None:
+            # Without registry neighbours the "region" is this station's own
+            # recent history, which the seasonal forecast already covers
+            regional_current = dict(current_data, parameters={
+                p: v for p, v in current_data.get('parameters', {}).items() if p not in forecasts
+            })
+
     # Need at least 5 past points
     if len(historical_data) < 5:
+        if forecasts:
+            detect_regional_anomalies(regional_current, regional_data, anomalies, neighbours)
         return anomalies
 
     curr_params = current_data.get('parameters', {})
@@ -141,8 +248,10 @@ def detect_anomalies(current_data, historical_data):
         for p, vals in history_by_param.items() if vals
     }
 
-    # Check each current pollutant
+    # Check each current pollutant without a forecast against the flat 24h history
     for pollutant, raw_value in curr_params.items():
+        if pollutant in forecasts:
+            continue
         try:
             curr_value = float(raw_value)
         except (TypeError, ValueError):
@@ -178,7 +287,7 @@ def detect_anomalies(current_data, historical_data):
                 })
 
     # Append any regional anomalies
-    detect_regional_anomalies(current_data, historical_data, anomalies)
+    detect_regional_anomalies(regional_current, regional_data, anomalies, neighbours)
     return anomalies
 
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -200,7 +309,7 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
-def detect_regional_anomalies(current_data, historical_data, anomalies):
+def detect_regional_anomalies(current_data, historical_data, anomalies, neighbours=None):
     """
     Identify anomalies when a reading drastically differs from nearby stations.
 
@@ -210,12 +319,14 @@ def detect_regional_anomalies(current_data, historical_data, anomalies):
         current_data (dict): The latest reading.
         historical_data (list of dict): Past readings.
         anomalies (list): List to append any regional anomalies to.
+        neighbours (set of str, optional): Station ids within 25km. Records
+            are then matched by id instead of by distance.
     """
     try:
         lat = float(current_data.get('latitude', 0))
         lon = float(current_data.get('longitude', 0))
         timestamp = datetime.fromisoformat(current_data['timestamp'].replace('Z', ''))
-        window_start = timestamp - timedelta(hours=6)
+        window_start = timestamp - timedelta(hours=REGIONAL_WINDOW_HOURS)
 
         # Gather nearby records in time window
         nearby = []
@@ -223,6 +334,10 @@ def detect_regional_anomalies(current_data, historical_data, anomalies):
             try:
                 rec_time = datetime.fromisoformat(rec['timestamp'].replace('Z', ''))
                 if window_start <= rec_time <= timestamp:
+                    if neighbours is not None:
+                        if rec.get('station_id') in neighbours:
+                            nearby.append(rec)
+                        continue
                     rec_lat = float(rec.get('latitude', 0))
                     rec_lon = float(rec.get('longitude', 0))
                     if haversine_distance(lat, lon, rec_lat, rec_lon) <= 25.0:
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Storage format of the anomalies collection. This file is kept identical in
+notification_service, which stores live anomalies, and data_processor,
+whose reprocess.py writes versioned runs in the same format.
+
+An anomaly used to be stored as it arrived from the processor: a full copy
+of the reading it was detected on plus the human-readable message, which
+made the collection grow faster than pollution_data during incidents. It is
+now stored as a reference to the reading and the numeric fields only:
+
+    {
+      "reading_id": ObjectId,        # _id of the reading in pollution_data
+      "anomaly_info": {type, parameter, value, severity, ...},
+      "timestamp": "<ISO8601>"
+    }
+
+Fields that can be derived from the others are left out and restored on
+read (render_message and expand):
+
+  * message, when it is the text anomaly_detection would have written for
+    the numeric fields (a message that differs is kept as is),
+  * average of seasonal statistical anomalies, when equal to expected.
+
+expand() restores the API shape of a page of documents, fetching their
+readings with one $in query. Readings without an _id are embedded as
+before, and old documents are returned unchanged until migrated:
+
+    python anomaly_store.py migrate [--batch-size N] [--compact]
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def render_message(info):
+    """
+    Message of an anomaly, as written by the processor's anomaly_detection.
+
+    Returns:
+        str, or None for an anomaly type it does not know.
+    """
+    pollutant = info.get('parameter')
+    kind = info.get('type')
+    try:
+        if kind == 'threshold_exceeded':
+            label = pollutant
+            if info.get('averaging_window'):
+                label = f"{pollutant} {info['averaging_window']} mean"
+            if info['severity'] == 'danger':
+                return (f"{label} exceeded dangerous threshold "
+                        f"({info['value']:.2f} > {info['dangerous_threshold']:.2f})")
+            return f"{label} exceeded WHO threshold ({info['value']:.2f} > {info['threshold']:.2f})"
+
+        if kind == 'statistical_anomaly':
+            z, pct = info['z_score'], info['percent_change']
+            if 'expected' in info:
+                direction = "above" if z > 0 else "below"
+                return f"{pollutant} {abs(pct):.1f}% {direction} seasonal baseline (Z-score: {z:.2f})"
+            if abs(pct) > 50:
+                direction = "increase" if pct > 0 else "decrease"
+                return f"{pollutant} {abs(pct):.1f}% {direction}"
+            if abs(z) > 3:
+                return f"{pollutant} abnormal change (Z-score: {z:.2f})"
+            return ""
+
+        if kind == 'regional_anomaly':
+            pct = info['percent_diff']
+            direction = "higher" if pct > 0 else "lower"
+            return f"{pollutant} is {abs(pct):.1f}% {direction} than regional average"
+    except (KeyError, TypeError, ValueError):
+        pass
+    return None
+
+
+def _reading_id(reading):
+    """ObjectId of a reading's _id (sent as a hex string), or None."""
+    from bson.objectid import ObjectId
+    rid = reading.get('_id') if isinstance(reading, dict) else None
+    if isinstance(rid, ObjectId):
+        return rid
+    if isinstance(rid, str) and ObjectId.is_valid(rid):
+        return ObjectId(rid)
+    return None
+
+
+def compact_info(info):
+    """anomaly_info without the fields render_info can restore."""
+    info = dict(info)
+    if 'message' in info and info['message'] == render_message(info):
+        del info['message']
+    if info.get('type') == 'statistical_anomaly' and 'expected' in info \
+            and info.get('average') == info['expected']:
+        del info['average']
+    return info
+
+
+def render_info(info):
+    """Restore the fields compact_info left out."""
+    info = dict(info)
+    if info.get('type') == 'statistical_anomaly' and 'expected' in info and 'average' not in info:
+        info['average'] = info['expected']
+    if 'message' not in info:
+        info['message'] = render_message(info)
+    return info
+
+
+def compact(anomaly_data):
+    """
+    Document to store for an anomaly notification ({'pollution_data', 'anomaly_info', 'timestamp'}).
+    """
+    doc = {
+        'anomaly_info': compact_info(anomaly_data['anomaly_info']),
+        'timestamp': anomaly_data.get('timestamp')
+    }
+    reading = anomaly_data.get('pollution_data')
+    rid = _reading_id(reading)
+    if rid is not None:
+        doc['reading_id'] = rid
+    else:
+        doc['pollution_data'] = reading
+    return doc
+
+
+def expand(docs, readings):
+    """
+    Restore stored anomalies to the shape the processor published.
+
+    Args:
+        docs (list of dict): Documents from the anomalies collection.
+        readings: pymongo collection of the readings (pollution_data).
+
+    Returns:
+        list of dict: The documents, with pollution_data and message filled in.
+    """
+    ids = list({doc['reading_id'] for doc in docs if 'reading_id' in doc})
+    found = {r['_id']: r for r in readings.find({'_id': {'$in': ids}})} if ids else {}
+
+    expanded = []
+    for doc in docs:
+        doc = dict(doc)
+        rid = doc.pop('reading_id', None)
+        if rid is not None:
+            reading = found.get(rid)
+            if reading is not None:
+                # The processor sends the reading's _id as a string
+                reading = dict(reading, _id=str(rid))
+            else:
+                logger.warning(f"Reading {rid} of anomaly {doc.get('_id')} not found")
+            doc['pollution_data'] = reading
+        doc['anomaly_info'] = render_info(doc.get('anomaly_info') or {})
+        expanded.append(doc)
+    return expanded
+
+
+def migrate(db, batch_size=500):
+    """
+    Rewrite documents that embed their reading to the compact format.
+
+    Only readings still present in pollution_data are replaced by a
+    reference; the others stay embedded.
+
+    Returns:
+        tuple: (documents rewritten, documents left embedded)
+    """
+    from pymongo import UpdateOne
+
+    rewritten = kept = 0
+    last_id = None
+    while True:
+        query = {'pollution_data': {'$exists': True}, 'reading_id': {'$exists': False}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(db.anomalies.find(query).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+
+        ids = {doc['_id']: _reading_id(doc['pollution_data']) for doc in batch}
+        wanted = [rid for rid in ids.values() if rid is not None]
+        present = {r['_id'] for r in db.pollution_data.find({'_id': {'$in': wanted}}, {'_id': 1})} if wanted else set()
+
+        updates = []
+        for doc in batch:
+            rid = ids[doc['_id']]
+            update = {'$set': {'anomaly_info': compact_info(doc.get('anomaly_info') or {})}}
+            if rid in present:
+                update['$set']['reading_id'] = rid
+                update['$unset'] = {'pollution_data': ''}
+                rewritten += 1
+            else:
+                kept += 1
+            updates.append(UpdateOne({'_id': doc['_id']}, update))
+        db.anomalies.bulk_write(updates, ordered=False)
+        logger.info(f"Migrated {rewritten} anomalies ({kept} left embedded)")
+    return rewritten, kept
+
+
+def _storage(db):
+    stats = db.command('collStats', 'anomalies')
+    return (f"{stats.get('count', 0)} documents, {stats.get('size', 0) / 1e6:.1f} MB data, "
+            f"{stats.get('storageSize', 0) / 1e6:.1f} MB on disk, "
+            f"{stats.get('totalIndexSize', 0) / 1e6:.1f} MB indexes")
+
+
+if __name__ == '__main__':
+    import argparse
+    import pymongo
+    import config
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Anomalies collection maintenance")
+    parser.add_argument('command', choices=['migrate', 'stats'])
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--compact', action='store_true',
+                        help="run MongoDB's compact afterwards to return the freed space to the OS")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(
+        host=config.MONGODB_HOST,
+        port=config.MONGODB_PORT,
+        username=config.MONGODB_USER,
+        password=config.MONGODB_PASS
+    )
+    db = client[config.MONGODB_DB]
+    if args.command == 'stats':
+        print(_storage(db))
+    else:
+        print(f"Before: {_storage(db)}")
+        rewritten, kept = migrate(db, args.batch_size)
+        print(f"Rewrote {rewritten} anomalies to reference their reading, {kept} kept embedded")
+        if args.compact:
+            db.command('compact', 'anomalies')
+        print(f"After: {_storage(db)}")
+    client.close()
@@ -1,20 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from flask import Flask, jsonify, request
+# First, so startup timing covers every other import
+import startup
+
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
-import pika
 import json
 import threading
 import time
 import os
 import logging
 from datetime import datetime, timedelta
-import pymongo
-from bson.json_util import dumps
-from anomaly_detection import detect_anomalies, is_who_threshold_exceeded
 
 import config
+import metrics
+import routing
+import shutdown
+import tracing
+import wire_format
+
+# pika, pymongo, bson and the detection modules (NumPy) are imported where
+# they are first used, so the HTTP server is up before they load
 
 # Configure Flask app
 app = Flask(__name__)
@@ -27,9 +34,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Thread pool for the statistics API's per-pollutant sub-aggregations, created on first use
+_statistics_executor = None
+_statistics_executor_lock = threading.Lock()
+
+def get_statistics_executor():
+    global _statistics_executor
+    with _statistics_executor_lock:
+        if _statistics_executor is None:
+            import stats_engine
+            _statistics_executor = stats_engine.create_executor(config.STATISTICS_WORKERS)
+        return _statistics_executor
+
 # Create a MongoDB client
 def get_mongodb_client():
     try:
+        import pymongo
         client = pymongo.MongoClient(
             host=config.MONGODB_HOST,
             port=config.MONGODB_PORT,
@@ -41,9 +61,159 @@ def get_mongodb_client():
         logger.error(f"MongoDB connection error: {e}")
         return None
 
+# Long-lived client of the station registry and the checkpointed stores. Its
+# short server selection timeout makes them fail fast while MongoDB is down
+_shared_mongodb_client = None
+_shared_mongodb_client_lock = threading.Lock()
+
+def get_shared_mongodb_client():
+    global _shared_mongodb_client
+    with _shared_mongodb_client_lock:
+        if _shared_mongodb_client is None:
+            import pymongo
+            _shared_mongodb_client = pymongo.MongoClient(
+                host=config.MONGODB_HOST,
+                port=config.MONGODB_PORT,
+                username=config.MONGODB_USER,
+                password=config.MONGODB_PASS,
+                serverSelectionTimeoutMS=int(config.MONGODB_TIMEOUT * 1000),
+                connectTimeoutMS=int(config.MONGODB_TIMEOUT * 1000)
+            )
+        return _shared_mongodb_client
+
+# Station registry cache, shared by consumer threads
+_station_registry = None
+_station_registry_lock = threading.Lock()
+
+def get_station_registry():
+    global _station_registry
+    with _station_registry_lock:
+        if _station_registry is None:
+            from station_registry import StationRegistry, STATIONS_COLLECTION, ensure_indexes
+            db = get_shared_mongodb_client()[config.MONGODB_DB]
+            ensure_indexes(db)
+            registry = StationRegistry(db[STATIONS_COLLECTION], miss_sync_interval=config.REGISTRY_SYNC_INTERVAL)
+            registry.sync()
+            _station_registry = registry
+            logger.info(f"Station registry loaded: {len(registry.stations)} stations")
+        return _station_registry
+
+# Seasonal baseline models, checkpointed in the background
+_baseline_store = None
+_baseline_store_lock = threading.Lock()
+
+def get_baseline_store():
+    global _baseline_store
+    with _baseline_store_lock:
+        if _baseline_store is None:
+            from baseline import BaselineStore, BASELINES_COLLECTION
+            store = BaselineStore(
+                get_shared_mongodb_client()[config.MONGODB_DB][BASELINES_COLLECTION],
+                alpha=config.BASELINE_ALPHA,
+                min_samples=config.BASELINE_MIN_SAMPLES,
+                min_std=config.BASELINE_MIN_STD,
+                max_stations=config.BASELINE_MAX_STATIONS
+            )
+            store.start_checkpointing(config.BASELINE_CHECKPOINT_INTERVAL)
+            _baseline_store = store
+        return _baseline_store
+
+# Rolling exposure accumulators, checkpointed in the background
+_exposure_store = None
+_exposure_store_lock = threading.Lock()
+
+def get_exposure_store():
+    global _exposure_store
+    with _exposure_store_lock:
+        if _exposure_store is None:
+            from exposure import ExposureStore, EXPOSURE_COLLECTION
+            store = ExposureStore(
+                get_shared_mongodb_client()[config.MONGODB_DB][EXPOSURE_COLLECTION],
+                bucket_seconds=config.EXPOSURE_BUCKET_SECONDS,
+                min_coverage=config.EXPOSURE_MIN_COVERAGE,
+                max_stations=config.EXPOSURE_MAX_STATIONS
+            )
+            store.start_checkpointing(config.EXPOSURE_CHECKPOINT_INTERVAL)
+            _exposure_store = store
+        return _exposure_store
+
+# Dependency status for /ready: the consumer reports the queue, MongoDB is probed
+_readiness_client = None
+
+def probe_mongodb():
+    global _readiness_client
+    if _readiness_client is None:
+        import pymongo
+        _readiness_client = pymongo.MongoClient(
+            host=config.MONGODB_HOST,
+            port=config.MONGODB_PORT,
+            username=config.MONGODB_USER,
+            password=config.MONGODB_PASS,
+            serverSelectionTimeoutMS=int(config.READY_PROBE_TIMEOUT * 1000),
+            connectTimeoutMS=int(config.READY_PROBE_TIMEOUT * 1000)
+        )
+    _readiness_client.admin.command('ping')
+
+def on_dependency_change(name, up):
+    metrics.DEPENDENCY_UP.labels(dependency=name).set(1 if up else 0)
+    if up:
+        logger.info(f"Dependency up: {name}")
+    else:
+        logger.warning(f"Dependency down: {name}")
+
+def on_ready(seconds):
+    metrics.STARTUP_SECONDS.labels(phase='ready').set(seconds)
+    logger.info(f"Ready {seconds:.2f}s after start")
+
+readiness = startup.Readiness(
+    probes={'mongodb': probe_mongodb},
+    reported=('pollution_queue',),
+    probe_ttl=config.READY_PROBE_TTL,
+    on_change=on_dependency_change,
+    on_ready=on_ready
+)
+
+# Signal-aware drain of the consumer (see shutdown.py)
+graceful_shutdown = shutdown.GracefulShutdown(config.SHUTDOWN_TIMEOUT)
+graceful_shutdown.on_request(lambda: readiness.report('pollution_queue', False, 'shutting down'))
+
+def checkpoint_stores():
+    """Write per-station state changed since the last periodic checkpoint."""
+    for store in (_baseline_store, _exposure_store):
+        if store is not None:
+            written = store.checkpoint()
+            logger.info(f"Final checkpoint of {store.NAME}: {written} stations")
+
+graceful_shutdown.add_hook('checkpoint_stores', checkpoint_stores)
+
+# Spans of traced readings (context from the collector's AMQP headers)
+tracer = tracing.Tracer(
+    service='data-processor',
+    path=config.TRACE_FILE,
+    flush_interval=config.TRACE_FLUSH_INTERVAL
+)
+graceful_shutdown.add_hook('trace_flush', tracer.flush)
+
+# Import the detection modules and load per-station state before consuming,
+# so the first message does not pay for it
+def warm_up():
+    started = time.perf_counter()
+    import anomaly_detection
+    try:
+        get_station_registry()
+        if config.BASELINE_ENABLED:
+            get_baseline_store()
+        if config.EXPOSURE_ENABLED:
+            get_exposure_store()
+    except Exception as e:
+        # Each is retried on first use
+        logger.error(f"Warm-up error: {e}")
+    logger.info(f"Detector warm-up took {time.perf_counter() - started:.2f}s")
+
 # Create a RabbitMQ connection
 def get_rabbitmq_connection():
     try:
+        import pika
         credentials = pika.PlainCredentials(
             config.RABBITMQ_USER,
             config.RABBITMQ_PASS
@@ -60,125 +230,300 @@ def get_rabbitmq_connection():
         logger.error(f"RabbitMQ connection error: {e}")
         return None
 
-# Publish an anomaly notification to RabbitMQ
-def publish_anomaly(anomaly_data):
+# Set once the anomaly exchange has been declared by this process
+_anomaly_exchange_declared = False
+
+# Publish an anomaly notification to RabbitMQ, 'danger' ones on the urgent lane
+def publish_anomaly(anomaly_data, trace=None):
+    import pika
+    global _anomaly_exchange_declared
+    started = time.perf_counter()
+    lane = routing.anomaly_lane(anomaly_data['anomaly_info'])
+    span = tracer.start_span('processor.publish_anomaly', trace, lane=lane)
     try:
         connection = get_rabbitmq_connection()
         if connection:
             channel = connection.channel()
-            channel.queue_declare(queue=config.ANOMALY_QUEUE, durable=True)
+            if not _anomaly_exchange_declared:
+                routing.declare_exchange(channel, config.ANOMALY_EXCHANGE, config.ANOMALY_QUEUE)
+                _anomaly_exchange_declared = True
 
-            # Convert anomaly data to JSON
-            message = json.dumps(anomaly_data)
+            # Encode in the configured wire format
+            message, content_type = wire_format.encode_anomaly(anomaly_data, config.WIRE_FORMAT)
 
             # Publish message
             channel.basic_publish(
-                exchange='',
-                routing_key=config.ANOMALY_QUEUE,
+                exchange=config.ANOMALY_EXCHANGE,
+                routing_key=routing.routing_key(routing.ANOMALIES, anomaly_data['pollution_data'], lane),
                 body=message,
                 properties=pika.BasicProperties(
                     delivery_mode=2,  # persistent
-                    content_type='application/json'
+                    content_type=content_type,
+                    headers=tracer.inject(span.context, {'published_at': int(time.time() * 1000)}, 'processor')
                 )
             )
 
             connection.close()
+            metrics.PUBLISH_LATENCY.observe(time.perf_counter() - started)
+            metrics.ANOMALIES_PUBLISHED.labels(status='success').inc()
+            metrics.PUBLISHED_BYTES.labels(content_type=content_type).inc(len(message))
+            span.end(status='success')
             return True
+        metrics.ANOMALIES_PUBLISHED.labels(status='error').inc()
+        span.end(status='error')
         return False
     except Exception as e:
         logger.error(f"Error publishing anomaly: {e}")
+        metrics.ANOMALIES_PUBLISHED.labels(status='error').inc()
+        span.end(status='error')
         return False
 
+# Forward stored readings to the live feed exchange, on the consumer's channel
+def publish_processed_readings(channel, readings):
+    import pika
+    try:
+        body, content_type = wire_format.encode_reading_batch(readings, config.WIRE_FORMAT)
+        channel.basic_publish(
+            exchange=config.PROCESSED_READINGS_EXCHANGE,
+            routing_key='',
+            body=body,
+            properties=pika.BasicProperties(
+                content_type=content_type,
+                headers={'published_at': int(time.time() * 1000)}
+            )
+        )
+    except Exception as e:
+        # The live feed is best effort; the readings are already stored
+        logger.error(f"Error publishing processed readings: {e}")
+
 # Process incoming pollution data, detect anomalies, store and forward them
-def process_pollution_data(data):
+def process_pollution_data(data, trace=None):
+    import pymongo
+    from anomaly_detection import detect_anomalies, is_who_threshold_exceeded, REGIONAL_WINDOW_HOURS
+    from station_registry import station_id
+    span = tracer.start_span('processor.reading', trace)
     try:
         client = get_mongodb_client()
         if not client:
             logger.error("Unable to connect to MongoDB")
+            span.end(error='mongodb_unavailable')
             return False
 
         db = client[config.MONGODB_DB]
         collection = db.pollution_data
 
         anomalies = []
+        station_key = data.get('station_id') or station_id(data['latitude'], data['longitude'])
+
+        # 1. Statistical anomaly detection
+        # Seasonal forecast for this station's time slot
+        forecasts = None
+        if config.BASELINE_ENABLED:
+            try:
+                with metrics.timed(metrics.STAGE_LATENCY, stage='baseline_forecast'):
+                    forecasts = get_baseline_store().forecast(station_key, data)
+            except Exception as e:
+                logger.error(f"Baseline forecast error: {e}")
 
-        # 1. WHO threshold check
-        threshold_anomalies = is_who_threshold_exceeded(data)
-        if threshold_anomalies:
-            anomalies.extend(threshold_anomalies)
-
-        # 2. Statistical anomaly detection
         # Pull past 24h of data
         end_time = datetime.fromisoformat(data['timestamp'].replace('Z', ''))
         start_time = end_time - timedelta(hours=24)
 
-        historical_data = list(collection.find({
-            'latitude': {'$gte': float(data['latitude']) - 0.01, '$lte': float(data['latitude']) + 0.01},
-            'longitude': {'$gte': float(data['longitude']) - 0.01, '$lte': float(data['longitude']) + 0.01},
-            'timestamp': {'$gte': start_time.isoformat(), '$lte': end_time.isoformat()}
-        }).sort('timestamp', pymongo.ASCENDING))
+        # Readings tagged by the collector fetch the station and its neighbours by id
+        neighbours = None
+        if data.get('station_id'):
+            try:
+                neighbours = get_station_registry().get_neighbours(data['station_id'])
+            except Exception as e:
+                logger.error(f"Station registry unavailable: {e}")
+
+        if neighbours is not None:
+            # The station's own 24h, and only the window of neighbour readings
+            # the regional check compares against; each branch uses the
+            # (station_id, timestamp) index
+            regional_start = end_time - timedelta(hours=REGIONAL_WINDOW_HOURS)
+            history_query = {'$or': [
+                {
+                    'station_id': data['station_id'],
+                    'timestamp': {'$gte': start_time.isoformat(), '$lte': end_time.isoformat()}
+                },
+                {
+                    'station_id': {'$in': list(neighbours)},
+                    'timestamp': {'$gte': regional_start.isoformat(), '$lte': end_time.isoformat()}
+                }
+            ]}
+        else:
+            history_query = {
+                'latitude': {'$gte': float(data['latitude']) - 0.01, '$lte': float(data['latitude']) + 0.01},
+                'longitude': {'$gte': float(data['longitude']) - 0.01, '$lte': float(data['longitude']) + 0.01},
+                'timestamp': {'$gte': start_time.isoformat(), '$lte': end_time.isoformat()}
+            }
+
+        with metrics.timed(metrics.STAGE_LATENCY, stage='history_fetch'), \
+                metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='history_find'):
+            historical_data = list(collection.find(history_query).sort('timestamp', pymongo.ASCENDING))
 
-        if historical_data:
-            statistical_anomalies = detect_anomalies(data, historical_data)
+        if historical_data or forecasts:
+            with metrics.timed(metrics.STAGE_LATENCY, stage='detect_anomalies'):
+                statistical_anomalies = detect_anomalies(data, historical_data, neighbours, forecasts)
             if statistical_anomalies:
                 anomalies.extend(statistical_anomalies)
 
-        # 3. Insert the new reading
-        collection.insert_one(data)
+        # 2. Insert the new reading
+        with metrics.timed(metrics.STAGE_LATENCY, stage='insert'), \
+                metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='insert_one'):
+            collection.insert_one(data)
+
+        # Learn the stored reading, after the insert so a retried message is not counted twice
+        if config.BASELINE_ENABLED:
+            try:
+                get_baseline_store().update(station_key, data)
+            except Exception as e:
+                logger.error(f"Baseline update error: {e}")
+
+        # 3. WHO threshold check on the rolling mean of each pollutant's averaging window
+        exposures = None
+        if config.EXPOSURE_ENABLED:
+            try:
+                with metrics.timed(metrics.STAGE_LATENCY, stage='exposure_update'):
+                    exposures = get_exposure_store().observe(station_key, data)
+            except Exception as e:
+                logger.error(f"Exposure update error: {e}")
+
+        with metrics.timed(metrics.STAGE_LATENCY, stage='threshold_check'):
+            threshold_anomalies = is_who_threshold_exceeded(data, exposures)
+        if threshold_anomalies:
+            anomalies[:0] = threshold_anomalies
 
         # 4. If anomalies found, publish notifications
         if anomalies:
-            for anomaly in anomalies:
-                anomaly_data = {
-                    'pollution_data': data,
-                    'anomaly_info': anomaly,
-                    'timestamp': datetime.utcnow().isoformat()
-                }
-                publish_anomaly(anomaly_data)
-                logger.info(f"Detected anomaly and published: {anomaly['type']}")
+            with metrics.timed(metrics.STAGE_LATENCY, stage='publish'):
+                for anomaly in anomalies:
+                    anomaly_data = {
+                        'pollution_data': data,
+                        'anomaly_info': anomaly,
+                        'timestamp': datetime.utcnow().isoformat()
+                    }
+                    publish_anomaly(anomaly_data, span.context)
+                    metrics.ANOMALIES_DETECTED.labels(
+                        type=anomaly['type'], severity=anomaly['severity']
+                    ).inc()
+                    logger.info(f"Detected anomaly and published: {anomaly['type']}")
 
         client.close()
+        span.end(anomalies=len(anomalies))
         return True
 
     except Exception as e:
         logger.error(f"Error processing data: {e}")
+        span.end(error=type(e).__name__)
         return False
 
 # Continuously consume the pollution-data queue
 def consume_queue():
-    while True:
+    import pika
+    warm_up()
+    backoff = startup.Backoff(config.RETRY_INITIAL_DELAY, config.RETRY_MAX_DELAY)
+    stop = graceful_shutdown.event
+    regions = routing.parse_regions(config.PROCESSOR_REGIONS)
+    group = config.PROCESSOR_QUEUE_GROUP or routing.queue_group(regions)
+    lane_queues = routing.lane_queues(config.POLLUTION_DATA_PRIORITY_QUEUE, config.POLLUTION_DATA_QUEUE, group)
+    lane_prefetch = {routing.URGENT: config.LANE_PREFETCH_URGENT, routing.ROUTINE: config.LANE_PREFETCH_ROUTINE}
+    fallback_queue = config.POLLUTION_DATA_QUEUE if config.PROCESSOR_CONSUME_UNROUTED else None
+    while not stop.is_set():
         try:
             connection = get_rabbitmq_connection()
             if not connection:
-                logger.error("RabbitMQ not available, retrying in 5s")
-                time.sleep(5)
+                readiness.report('pollution_queue', False, 'RabbitMQ not available')
+                logger.error(f"RabbitMQ not available, retrying in {backoff.wait(stop):.1f}s")
                 continue
 
             channel = connection.channel()
-            channel.queue_declare(queue=config.POLLUTION_DATA_QUEUE, durable=True)
+            # One queue per lane, bound for this instance's regions
+            routing.declare_exchange(channel, config.POLLUTION_DATA_EXCHANGE, config.POLLUTION_DATA_QUEUE)
+            routing.bind_lanes(channel, config.POLLUTION_DATA_EXCHANGE, routing.READINGS, lane_queues, regions)
+            channel.exchange_declare(exchange=config.PROCESSED_READINGS_EXCHANGE, exchange_type='fanout', durable=True)
 
             def callback(ch, method, properties, body):
                 try:
-                    data = json.loads(body)
-                    logger.info(f"New data received: {data.get('id', 'unknown')}")
-                    success = process_pollution_data(data)
-                    if success:
+                    lane = consumer_lanes.get(method.consumer_tag, routing.ROUTINE)
+                    metrics.LANE_MESSAGES.labels(lane=lane).inc()
+                    metrics.observe_queue_lag(properties)
+                    # Bulk imports pack many readings into one message
+                    readings = wire_format.decode_readings(body, properties.content_type)
+                    if len(readings) == 1:
+                        logger.info(f"New data received: {readings[0].get('id', 'unknown')}")
+                    else:
+                        logger.info(f"New batch received: {len(readings)} readings")
+
+                    trace = tracer.from_headers(properties.headers)
+                    tracer.record_since_hop('processor.queue_wait', trace)
+                    span = tracer.start_span('processor.message', trace, readings=len(readings), lane=lane)
+
+                    processed, failed = [], []
+                    for data in readings:
+                        if stop.is_set() and not graceful_shutdown.remaining():
+                            # Out of time while draining: requeue the rest of the batch
+                            failed.append(data)
+                            continue
+                        with metrics.timed(metrics.STAGE_LATENCY, stage='total'):
+                            if process_pollution_data(data, span.context):
+                                processed.append(data)
+                            else:
+                                failed.append(data)
+
+                    if processed:
+                        publish_processed_readings(ch, processed)
+                    span.end(failed=len(failed))
+
+                    if not failed:
+                        ch.basic_ack(delivery_tag=method.delivery_tag)
+                        metrics.MESSAGES_CONSUMED.labels(status='success').inc()
+                    elif len(failed) < len(readings):
+                        # Requeue only the failed part of a batch (to its lane) so stored readings are not inserted twice
+                        retry_body, content_type = wire_format.encode_reading_batch(failed, config.WIRE_FORMAT)
+                        ch.basic_publish(
+                            exchange='',
+                            routing_key=lane_queues[lane],
+                            body=retry_body,
+                            properties=pika.BasicProperties(
+                                delivery_mode=2,
+                                content_type=content_type,
+                                headers=tracer.inject(span.context, {'published_at': int(time.time() * 1000)}, 'processor_retry')
+                            )
+                        )
                         ch.basic_ack(delivery_tag=method.delivery_tag)
+                        metrics.MESSAGES_CONSUMED.labels(status='partially_requeued').inc()
                     else:
                         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                        metrics.MESSAGES_CONSUMED.labels(status='requeued').inc()
                 except Exception as e:
                     logger.error(f"Consumer callback error: {e}")
                     ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                    metrics.MESSAGES_CONSUMED.labels(status='error').inc()
 
-            channel.basic_qos(prefetch_count=1)
-            channel.basic_consume(queue=config.POLLUTION_DATA_QUEUE, on_message_callback=callback)
+            # Urgent lane first and with a larger prefetch window, so it is read ahead of the routine backlog
+            consumer_lanes = routing.consume_lanes(channel, lane_queues, lane_prefetch, callback, fallback_queue)
 
-            logger.info("Listening to pollution data queue...")
+            queues = [*lane_queues.values(), *([fallback_queue] if fallback_queue else [])]
+            logger.info(f"Listening to {', '.join(queues)} for regions {', '.join(regions)}...")
+            backoff.reset()
+            readiness.report('pollution_queue', True)
+            graceful_shutdown.consuming('pollution_queue', connection, channel)
+            # Returns once shutdown stops the consumer, after the in-flight message is acked
             channel.start_consuming()
+            channel.close()
+            connection.close()
+            graceful_shutdown.stopped('pollution_queue')
+            logger.info("Pollution data consumer stopped")
 
         except Exception as e:
-            logger.error(f"Queue consumer error: {e}")
-            time.sleep(5)
+            graceful_shutdown.stopped('pollution_queue')
+            if stop.is_set():
+                logger.error(f"Queue consumer error while stopping: {e}")
+                break
+            readiness.report('pollution_queue', False, e)
+            logger.error(f"Queue consumer error: {e}, retrying in {backoff.wait(stop):.1f}s")
 
 # Health check endpoint
 @app.route('/health', methods=['GET'])
@@ -186,10 +531,33 @@ def health_check():
     """Returns service liveness."""
     return jsonify({"status": "ok", "service": "data-processor"}), 200
 
+# Readiness endpoint
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Returns 200 once the queue consumer and MongoDB are up, 503 otherwise."""
+    ready, dependencies = readiness.check()
+    return jsonify({
+        "status": "ready" if ready else "not_ready",
+        "service": "data-processor",
+        "dependencies": dependencies,
+        "startup": {
+            "imports_seconds": round(imports_seconds, 3),
+            "ready_seconds": round(readiness.ready_after, 3) if readiness.ready_after is not None else None
+        }
+    }), 200 if ready else 503
+
+# Prometheus metrics endpoint
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose Prometheus metrics."""
+    payload, content_type = metrics.render_metrics()
+    return Response(payload, mimetype=content_type)
+
 # Return summary stats for the last 24h
 @app.route('/api/v1/statistics/recent', methods=['GET'])
 def get_recent_statistics():
     """Get aggregated pollution statistics for the past 24 hours."""
+    from bson.json_util import dumps
     try:
         client = get_mongodb_client()
         if not client:
@@ -223,7 +591,8 @@ def get_recent_statistics():
             }
         ]
 
-        results = list(collection.aggregate(pipeline))
+        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='statistics_aggregate'):
+            results = list(collection.aggregate(pipeline))
         if not results:
             return jsonify({"status": "success", "message": "No data found", "data": {}}), 200
 
@@ -240,10 +609,87 @@ def get_recent_statistics():
         logger.error(f"Error fetching statistics: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+# Statistics over any window, grouping and metric set
+@app.route('/api/v1/statistics', methods=['GET'])
+def get_statistics():
+    """
+    Aggregated statistics.
+
+    Query parameters: window (e.g. 24h, 7d; default 24h) or start/end (ISO),
+    group_by (none|station|cell|hour), metrics (mean,min,max,pNN),
+    parameters (comma separated pollutants), cell_size (degrees), source (auto|raw).
+    """
+    import stats_engine
+    try:
+        def split(name, default):
+            value = request.args.get(name)
+            return [v.strip() for v in value.split(',') if v.strip()] if value else list(default)
+
+        if request.args.get('start'):
+            start_time = datetime.fromisoformat(request.args['start'].replace('Z', ''))
+            end_time = (datetime.fromisoformat(request.args['end'].replace('Z', ''))
+                        if request.args.get('end') else datetime.utcnow())
+        else:
+            end_time = datetime.utcnow()
+            start_time = end_time - stats_engine.parse_window(request.args.get('window', '24h'))
+
+        query = stats_engine.StatisticsQuery(
+            start_time,
+            end_time,
+            group_by=request.args.get('group_by', 'none'),
+            metrics=split('metrics', ('mean', 'max')),
+            parameters=split('parameters', stats_engine.POLLUTANTS),
+            cell_size=float(request.args.get('cell_size', 0.1)),
+            source=request.args.get('source', 'auto')
+        )
+    except ValueError as e:
+        # Includes StatisticsQueryError and malformed dates/numbers
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        client = get_mongodb_client()
+        if not client:
+            return jsonify({"status": "error", "message": "DB connection failed"}), 500
+
+        try:
+            result = stats_engine.run_query(
+                client[config.MONGODB_DB],
+                query,
+                get_statistics_executor(),
+                timed=lambda operation: metrics.timed(metrics.MONGO_QUERY_LATENCY, operation=operation)
+            )
+        finally:
+            client.close()
+
+        return jsonify({
+            "status": "success",
+            "period": {"start": start_time.isoformat(), "end": end_time.isoformat()},
+            "group_by": query.group_by,
+            "metrics": query.metrics,
+            "sources": result['sources'],
+            "data": result['data']
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error computing statistics: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+imports_seconds = startup.elapsed()
+metrics.STARTUP_SECONDS.labels(phase='imports').set(imports_seconds)
+
 # Main entry point
 if __name__ == '__main__':
+    logger.info(f"Modules loaded in {imports_seconds:.2f}s")
+
+    # Report time-to-ready once MongoDB and the queue are reachable
+    readiness.start_waiting(config.RETRY_INITIAL_DELAY, config.RETRY_MAX_DELAY, graceful_shutdown.event)
+
+    # Drain the consumer on SIGTERM/SIGINT instead of dying mid-message
+    graceful_shutdown.install()
+    tracer.start()
+
     # Start the consumer thread
-    consumer_thread = threading.Thread(target=consume_queue)
+    consumer_thread = threading.Thread(target=consume_queue, name='pollution-consumer')
     consumer_thread.daemon = True
     consumer_thread.start()
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-station seasonal baselines for forecast-based anomaly detection.
+
+Each station keeps, per pollutant, an exponentially weighted mean and
+variance for every seasonal slot: 24 hours of the day, split into weekdays
+and weekends (48 slots). The slot mean is the forecast for a new reading
+and the slot variance scales its residual, so a normal evening NO2 peak is
+compared with previous evening peaks rather than with the flat 24h mean.
+
+Forecasting and learning a reading are O(1). Models live in memory and are
+checkpointed to the `baselines` collection every BASELINE_CHECKPOINT_INTERVAL
+seconds as one compact document per station (float32/uint16 arrays), so a
+restart resumes from the last checkpoint instead of replaying history.
+"""
+
+import math
+from datetime import datetime
+
+import numpy as np
+
+from state_store import CheckpointedStore
+
+BASELINES_COLLECTION = 'baselines'
+MODEL_VERSION = 1
+SLOTS = 48
+
+# Residuals beyond this many standard deviations are clipped before the
+# update, so a spike does not drag the baseline with it
+UPDATE_CLIP_SIGMA = 4.0
+
+
+def seasonal_slot(timestamp):
+    """Slot index for an ISO timestamp: hour of day, +24 on weekends."""
+    ts = datetime.fromisoformat(timestamp.replace('Z', ''))
+    return ts.hour + (24 if ts.weekday() >= 5 else 0)
+
+
+class Forecast:
+    """Expected value and spread for one pollutant of one reading."""
+
+    def __init__(self, expected, std, samples):
+        self.expected = expected
+        self.std = std
+        self.samples = samples
+
+
+class SeasonalModel:
+    """EWMA mean/variance per seasonal slot for one station and pollutant."""
+
+    def __init__(self, mean=None, var=None, count=None):
+        self.mean = mean if mean is not None else np.zeros(SLOTS, dtype=np.float32)
+        self.var = var if var is not None else np.zeros(SLOTS, dtype=np.float32)
+        self.count = count if count is not None else np.zeros(SLOTS, dtype=np.uint16)
+
+    def forecast(self, slot, min_samples, min_std):
+        """Forecast for a slot, or None while it has fewer than min_samples readings."""
+        samples = int(self.count[slot])
+        if samples < min_samples:
+            return None
+        expected = float(self.mean[slot])
+        std = max(math.sqrt(float(self.var[slot])), min_std, 0.1 * abs(expected))
+        return Forecast(expected, std, samples)
+
+    def update(self, slot, value, alpha):
+        samples = int(self.count[slot])
+        mean = float(self.mean[slot])
+        var = float(self.var[slot])
+        if samples:
+            std = math.sqrt(var)
+            if std > 0:
+                value = min(max(value, mean - UPDATE_CLIP_SIGMA * std), mean + UPDATE_CLIP_SIGMA * std)
+        # Plain running mean while warming up, then a fixed-rate EWMA
+        a = max(alpha, 1.0 / (samples + 1))
+        residual = value - mean
+        self.mean[slot] = mean + a * residual
+        self.var[slot] = (1 - a) * (var + a * residual * residual)
+        if samples < np.iinfo(np.uint16).max:
+            self.count[slot] = samples + 1
+
+    def to_document(self):
+        return {
+            'mean': self.mean.tobytes(),
+            'var': self.var.tobytes(),
+            'count': self.count.tobytes()
+        }
+
+    @classmethod
+    def from_document(cls, doc):
+        return cls(
+            np.frombuffer(doc['mean'], dtype=np.float32).copy(),
+            np.frombuffer(doc['var'], dtype=np.float32).copy(),
+            np.frombuffer(doc['count'], dtype=np.uint16).copy()
+        )
+
+
+class BaselineStore(CheckpointedStore):
+    """
+    Seasonal models by station (pollutant -> SeasonalModel), checkpointed to MongoDB.
+
+    Args:
+        collection: pymongo collection for checkpoints, or None (memory only).
+        alpha (float): EWMA smoothing factor per slot update.
+        min_samples (int): Readings a slot needs before it forecasts.
+        min_std (float): Floor for the forecast spread (µg/m³).
+        max_stations (int): Stations kept in memory (least recently used are
+            checkpointed and evicted).
+    """
+
+    VERSION = MODEL_VERSION
+    NAME = 'baselines'
+
+    def __init__(self, collection, alpha, min_samples, min_std, max_stations):
+        super().__init__(collection, max_stations)
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.min_std = min_std
+
+    def new_state(self):
+        return {}
+
+    def encode(self, state):
+        return {'slots': SLOTS, 'parameters': {p: m.to_document() for p, m in state.items()}}
+
+    def decode(self, doc):
+        return {p: SeasonalModel.from_document(m) for p, m in doc.get('parameters', {}).items()}
+
+    def forecast(self, station_id, data):
+        """
+        Forecast each pollutant of a reading from the station's baseline.
+
+        Returns:
+            dict: pollutant -> Forecast for slots that are warmed up.
+        """
+        slot = seasonal_slot(data['timestamp'])
+        forecasts = {}
+        with self._lock:
+            models = self._load(station_id)
+            for pollutant in (data.get('parameters') or {}):
+                model = models.get(pollutant)
+                forecast = model.forecast(slot, self.min_samples, self.min_std) if model else None
+                if forecast is not None:
+                    forecasts[pollutant] = forecast
+        return forecasts
+
+    def update(self, station_id, data):
+        """Learn a stored reading into the station's baseline."""
+        slot = seasonal_slot(data['timestamp'])
+        with self._lock:
+            models = self._load(station_id)
+            for pollutant, raw_value in (data.get('parameters') or {}).items():
+                try:
+                    value = float(raw_value)
+                except (TypeError, ValueError):
+                    continue
+                models.setdefault(pollutant, SeasonalModel()).update(slot, value, self.alpha)
+            self._mark_dirty(station_id)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmarks for anomaly_detection.py.
+
+Each detector function is timed against seeded synthetic histories (5 to
+100k readings, see synthetic_data.py), both in its plain form and with the
+inputs the processor passes on its hot path: registry neighbours, seasonal
+forecasts and rolling exposures. See README.md in this directory for how
+to save a baseline and fail on regressions.
+"""
+
+from anomaly_detection import (
+    calculate_z_score,
+    detect_anomalies,
+    detect_forecast_anomalies,
+    detect_regional_anomalies,
+    haversine_distance,
+    is_who_threshold_exceeded,
+)
+
+
+def bench_is_who_threshold_exceeded(benchmark, current_reading):
+    result = benchmark(is_who_threshold_exceeded, current_reading)
+    assert result
+
+
+def bench_is_who_threshold_exceeded_exposures(benchmark, current_reading, exposures):
+    result = benchmark(is_who_threshold_exceeded, current_reading, exposures)
+    assert result
+
+
+def bench_haversine_distance(benchmark):
+    distance = benchmark(haversine_distance, 41.01, 28.97, 41.2, 29.1)
+    assert 20 < distance < 25
+
+
+def bench_calculate_z_score(benchmark, history):
+    series = [r['parameters']['PM2.5'] for r in history]
+    benchmark(calculate_z_score, 48.0, series)
+
+
+def bench_detect_forecast_anomalies(benchmark, current_reading, forecasts):
+    result = benchmark(detect_forecast_anomalies, current_reading, forecasts)
+    assert result
+
+
+def bench_detect_anomalies(benchmark, current_reading, history):
+    result = benchmark(detect_anomalies, current_reading, history)
+    assert isinstance(result, list)
+
+
+def bench_detect_anomalies_neighbours(benchmark, current_reading, history, neighbours):
+    result = benchmark(detect_anomalies, current_reading, history, neighbours)
+    assert isinstance(result, list)
+
+
+def bench_detect_anomalies_forecasts(benchmark, current_reading, history, forecasts):
+    result = benchmark(detect_anomalies, current_reading, history, None, forecasts)
+    assert result
+
+
+def bench_detect_anomalies_neighbours_forecasts(benchmark, current_reading, history, neighbours, forecasts):
+    result = benchmark(detect_anomalies, current_reading, history, neighbours, forecasts)
+    assert result
+
+
+def bench_detect_regional_anomalies(benchmark, current_reading, history):
+    def run():
+        anomalies = []
+        detect_regional_anomalies(current_reading, history, anomalies)
+        return anomalies
+
+    benchmark(run)
+
+
+def bench_detect_regional_anomalies_neighbours(benchmark, current_reading, history, neighbours):
+    def run():
+        anomalies = []
+        detect_regional_anomalies(current_reading, history, anomalies, neighbours)
+        return anomalies
+
+    benchmark(run)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Make the service modules importable without installing the service
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synthetic_data import (  # noqa: E402
+    HISTORY_SIZES,
+    build_current_reading,
+    build_exposures,
+    build_forecasts,
+    build_history,
+    build_neighbours,
+)
+
+_cache = {}
+
+
+def load_history(size):
+    """Build (and memoise) a synthetic history."""
+    if size not in _cache:
+        _cache[size] = build_history(size)
+    return _cache[size]
+
+
+@pytest.fixture(scope='session')
+def current_reading():
+    return build_current_reading()
+
+
+@pytest.fixture(scope='session')
+def neighbours():
+    return build_neighbours()
+
+
+@pytest.fixture(scope='session')
+def forecasts():
+    return build_forecasts()
+
+
+@pytest.fixture(params=[True, False], ids=['exposure=warm', 'exposure=warming_up'])
+def exposures(request):
+    return build_exposures(warm=request.param)
+
+
+@pytest.fixture(params=HISTORY_SIZES, ids=lambda n: f'history={n}')
+def history(request):
+    return load_history(request.param)
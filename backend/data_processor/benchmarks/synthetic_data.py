@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic inputs for the anomaly detection benchmarks.
+
+Everything is generated in memory from a fixed seed and a fixed reference
+time, so every run (and every machine) benchmarks the same data without
+committing it. To look at a history:
+
+    python synthetic_data.py 1000 > history_1000.json
+"""
+
+import json
+import math
+import random
+from datetime import datetime, timedelta
+
+# History sizes covered by the benchmarks
+HISTORY_SIZES = (5, 100, 1000, 10000, 100000)
+
+# Reference time of the "current" reading; history spans the 24h before it
+REFERENCE_TIME = datetime(2025, 6, 1, 12, 0, 0)
+
+# Station the current reading belongs to, plus nearby stations up to ~30 km away
+CENTER = (41.01, 28.97)
+NEIGHBOUR_RADIUS_KM = 30.0
+NEIGHBOUR_COUNT = 12
+
+BASE_LEVELS = {'PM2.5': 10.0, 'PM10': 30.0, 'NO2': 18.0, 'SO2': 8.0, 'O3': 60.0}
+
+# Relative noise of the readings, also the spread of the forecasts
+NOISE = 0.15
+
+
+def station_id(index):
+    """Registry id of a synthetic station; 0 is the current reading's station."""
+    return f'stn:bench{index:02d}'
+
+
+def _stations(rng):
+    stations = [CENTER]
+    for _ in range(NEIGHBOUR_COUNT):
+        distance = rng.uniform(1.0, NEIGHBOUR_RADIUS_KM)
+        bearing = rng.uniform(0, 2 * math.pi)
+        dlat = distance * math.cos(bearing) / 111.0
+        dlon = distance * math.sin(bearing) / (111.0 * math.cos(math.radians(CENTER[0])))
+        stations.append((round(CENTER[0] + dlat, 6), round(CENTER[1] + dlon, 6)))
+    return stations
+
+
+def _diurnal(ts):
+    hour = ts.hour + ts.minute / 60
+    return 1 + 0.3 * math.sin((hour - 8) / 24 * 2 * math.pi)
+
+
+def build_history(size, seed=1234):
+    """
+    Build `size` readings spread evenly over the 24h before REFERENCE_TIME.
+
+    Roughly half the readings come from the current station and the rest
+    from its neighbours, matching what the regional check iterates over.
+    Each reading carries the 'station_id' the registry would have assigned.
+    """
+    rng = random.Random(seed + size)
+    stations = _stations(rng)
+    step = timedelta(hours=24) / size
+    history = []
+    for i in range(size):
+        ts = REFERENCE_TIME - timedelta(hours=24) + step * i
+        index = 0 if rng.random() < 0.5 else rng.randrange(1, len(stations))
+        lat, lon = stations[index]
+        diurnal = _diurnal(ts)
+        history.append({
+            'station_id': station_id(index),
+            'latitude': lat,
+            'longitude': lon,
+            'timestamp': ts.isoformat(),
+            'parameters': {
+                p: round(base * diurnal * max(0.0, rng.gauss(1.0, NOISE)), 2)
+                for p, base in BASE_LEVELS.items()
+            }
+        })
+    return history
+
+
+def build_current_reading():
+    """A reading at the reference time with PM2.5/NO2/O3 spikes."""
+    return {
+        'station_id': station_id(0),
+        'latitude': CENTER[0],
+        'longitude': CENTER[1],
+        'timestamp': REFERENCE_TIME.isoformat(),
+        'parameters': {'PM2.5': 48.0, 'PM10': 32.0, 'NO2': 70.0, 'SO2': 7.5, 'O3': 110.0}
+    }
+
+
+def build_neighbours():
+    """Neighbour ids of the current station, as the station registry returns them."""
+    return {station_id(i) for i in range(1, NEIGHBOUR_COUNT + 1)}
+
+
+def build_forecasts():
+    """Warmed-up seasonal forecasts for every pollutant of the current reading."""
+    from baseline import Forecast
+
+    diurnal = _diurnal(REFERENCE_TIME)
+    return {
+        p: Forecast(base * diurnal, NOISE * base * diurnal, 50)
+        for p, base in BASE_LEVELS.items()
+    }
+
+
+def build_exposures(warm=True):
+    """
+    Rolling means in the shape ExposureStore.observe returns.
+
+    With warm=False every window is still below its coverage (None), as
+    after a restart or for a new station.
+    """
+    return {
+        p: {window: (base * 1.6 if warm else None) for window in ('1h', '8h', '24h')}
+        for p, base in BASE_LEVELS.items()
+    }
+
+
+if __name__ == '__main__':
+    import sys
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    json.dump(build_history(size), sys.stdout, indent=2)
+    sys.stdout.write('\n')
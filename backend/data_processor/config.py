@@ -20,7 +20,77 @@ MONGODB_PORT = int(os.environ.get('MONGODB_PORT', 27017))
 MONGODB_USER = os.environ.get('MONGODB_USER', '')
 MONGODB_PASS = os.environ.get('MONGODB_PASS', '')
 MONGODB_DB = os.environ.get('MONGODB_DB', 'air_pollution')
+# Server selection/connect timeout (seconds) of the registry's and stores' shared client
+MONGODB_TIMEOUT = float(os.environ.get('MONGODB_TIMEOUT', 5))
+# Minimum seconds between registry syncs for station ids the cache does not know yet;
+# until the next one such stations are compared by coordinates, without neighbours
+REGISTRY_SYNC_INTERVAL = float(os.environ.get('REGISTRY_SYNC_INTERVAL', 30))
 
-# Queue name
-POLLUTION_DATA_QUEUE = 'pollution_data_queue'
-ANOMALY_QUEUE = 'anomaly_notification_queue'
\ No newline at end of file
+# Queue message encoding for published messages: 'json' or 'msgpack'.
+# Consumers accept both, so switch producers only after consumers are upgraded.
+WIRE_FORMAT = os.environ.get('WIRE_FORMAT', 'json').lower()
+
+# Queue names; POLLUTION_DATA_QUEUE is the fallback of POLLUTION_DATA_EXCHANGE
+POLLUTION_DATA_QUEUE = os.environ.get('POLLUTION_DATA_QUEUE', 'pollution_data_queue')
+ANOMALY_QUEUE = 'anomaly_notification_queue'
+
+# Region and priority lane routing (see routing.py). Readings arrive through
+# POLLUTION_DATA_EXCHANGE; this instance binds the lane queues for the regions
+# in PROCESSOR_REGIONS (comma-separated names or topic patterns, '*' for all).
+# The lane queues are <POLLUTION_DATA_PRIORITY_QUEUE>.<group> and
+# <POLLUTION_DATA_QUEUE>.<group>, where the group defaults to the regions
+# ('all', 'n30e30-n40e30'): instances with the same regions share their queues.
+POLLUTION_DATA_EXCHANGE = os.environ.get('POLLUTION_DATA_EXCHANGE', 'pollution_data_exchange')
+POLLUTION_DATA_PRIORITY_QUEUE = os.environ.get('POLLUTION_DATA_PRIORITY_QUEUE', 'pollution_data_priority_queue')
+PROCESSOR_REGIONS = os.environ.get('PROCESSOR_REGIONS', '*')
+PROCESSOR_QUEUE_GROUP = os.environ.get('PROCESSOR_QUEUE_GROUP', '')
+# Also drain POLLUTION_DATA_QUEUE, where readings no lane queue is bound for end up.
+# Keep it on for at least one instance.
+PROCESSOR_CONSUME_UNROUTED = os.environ.get('PROCESSOR_CONSUME_UNROUTED', 'True').lower() == 'true'
+# Anomalies are published to ANOMALY_EXCHANGE; 'danger' ones take the urgent lane
+ANOMALY_EXCHANGE = os.environ.get('ANOMALY_EXCHANGE', 'anomaly_exchange')
+# Messages in flight per lane: the urgent lane is read with a larger window
+LANE_PREFETCH_URGENT = int(os.environ.get('LANE_PREFETCH_URGENT', 10))
+LANE_PREFETCH_ROUTINE = int(os.environ.get('LANE_PREFETCH_ROUTINE', 1))
+
+# Fanout exchange carrying every stored reading to live dashboards
+PROCESSED_READINGS_EXCHANGE = os.environ.get('PROCESSED_READINGS_EXCHANGE', 'processed_readings_exchange')
+
+# Seasonal baselines (see baseline.py)
+BASELINE_ENABLED = os.environ.get('BASELINE_ENABLED', 'True').lower() == 'true'
+# EWMA smoothing per slot update; slots use a plain mean until 1/n drops below it
+BASELINE_ALPHA = float(os.environ.get('BASELINE_ALPHA', 0.05))
+# Readings a slot needs before anomalies are scored against it
+BASELINE_MIN_SAMPLES = int(os.environ.get('BASELINE_MIN_SAMPLES', 5))
+# Lower bound of the forecast spread (µg/m³), so flat series do not alert on noise
+BASELINE_MIN_STD = float(os.environ.get('BASELINE_MIN_STD', 1.0))
+BASELINE_MAX_STATIONS = int(os.environ.get('BASELINE_MAX_STATIONS', 50000))
+BASELINE_CHECKPOINT_INTERVAL = float(os.environ.get('BASELINE_CHECKPOINT_INTERVAL', 60))
+
+# Rolling exposure for WHO thresholds (see exposure.py)
+EXPOSURE_ENABLED = os.environ.get('EXPOSURE_ENABLED', 'True').lower() == 'true'
+# Bucket width in seconds; must divide one hour
+EXPOSURE_BUCKET_SECONDS = int(os.environ.get('EXPOSURE_BUCKET_SECONDS', 300))
+# Fraction of an averaging window the data must span before its mean is judged
+EXPOSURE_MIN_COVERAGE = float(os.environ.get('EXPOSURE_MIN_COVERAGE', 0.75))
+EXPOSURE_MAX_STATIONS = int(os.environ.get('EXPOSURE_MAX_STATIONS', 50000))
+EXPOSURE_CHECKPOINT_INTERVAL = float(os.environ.get('EXPOSURE_CHECKPOINT_INTERVAL', 60))
+
+# Statistics API: threads running per-pollutant sub-aggregations concurrently
+STATISTICS_WORKERS = int(os.environ.get('STATISTICS_WORKERS', 8))
+
+# Reconnect backoff (seconds): jittered, doubling from the initial delay up to the maximum
+RETRY_INITIAL_DELAY = float(os.environ.get('RETRY_INITIAL_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 30))
+# Readiness probes: seconds a result is reused, and the connect timeout of a probe
+READY_PROBE_TTL = float(os.environ.get('READY_PROBE_TTL', 5))
+READY_PROBE_TIMEOUT = float(os.environ.get('READY_PROBE_TIMEOUT', 2))
+
+# Graceful shutdown: seconds to finish the in-flight message and checkpoint
+# state after SIGTERM; keep below the container's stop_grace_period
+SHUTDOWN_TIMEOUT = float(os.environ.get('SHUTDOWN_TIMEOUT', 25))
+
+# Tracing (see tracing.py): spans of readings traced by the collector are
+# appended to TRACE_FILE (empty disables tracing)
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+TRACE_FLUSH_INTERVAL = float(os.environ.get('TRACE_FLUSH_INTERVAL', 1.0))
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rolling exposure (1h, 8h and 24h means) per station and pollutant.
+
+WHO guideline values are averages over a period (24 hours, 8 hours for O3),
+so a single reading above the value is not an exceedance. Each station and
+pollutant keeps a ring of time buckets (EXPOSURE_BUCKET_SECONDS wide,
+covering 24 hours) holding the sum and count of the readings that fell in
+them, plus running totals for every window. A reading updates one bucket
+and the window totals; moving to a new bucket subtracts the bucket that
+leaves each window. Both are O(number of windows), with no MongoDB reads.
+
+Windows are driven by reading timestamps, not the wall clock, so late and
+replayed data land in the right buckets. Readings older than 24 hours
+behind the newest one are ignored.
+
+A window mean is only reported once the station's data spans at least
+EXPOSURE_MIN_COVERAGE of the window, so a station that came online ten
+minutes ago does not get a "24h mean".
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+from state_store import CheckpointedStore
+
+EXPOSURE_COLLECTION = 'exposure_state'
+
+# Averaging windows, in seconds
+WINDOWS = {
+    '1h': 3600,
+    '8h': 8 * 3600,
+    '24h': 24 * 3600
+}
+LONGEST_WINDOW = max(WINDOWS.values())
+
+
+def _epoch_seconds(timestamp):
+    ts = datetime.fromisoformat(timestamp.replace('Z', ''))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)  # readings are UTC
+    return ts.timestamp()
+
+
+class ExposureSeries:
+    """Bucketed sums and counts for one station and pollutant."""
+
+    def __init__(self, bucket_seconds, sums=None, counts=None, head=None, first=None):
+        self.bucket_seconds = bucket_seconds
+        self.size = LONGEST_WINDOW // bucket_seconds
+        self.window_buckets = {name: max(1, seconds // bucket_seconds) for name, seconds in WINDOWS.items()}
+        self.sums = sums if sums is not None else np.zeros(self.size, dtype=np.float64)
+        self.counts = counts if counts is not None else np.zeros(self.size, dtype=np.uint32)
+        self.head = head      # absolute index of the newest bucket
+        self.first = first    # absolute index of the first bucket of unbroken data
+        self.totals = {}
+        self._recompute_totals()
+
+    def _recompute_totals(self):
+        self.totals = {}
+        for name, k in self.window_buckets.items():
+            if self.head is None:
+                self.totals[name] = [0.0, 0]
+                continue
+            idx = [(self.head - i) % self.size for i in range(k)]
+            self.totals[name] = [float(self.sums[idx].sum()), int(self.counts[idx].sum())]
+
+    def _advance(self, bucket):
+        """Move the head forward to `bucket`, expiring old buckets from each window."""
+        gap = bucket - self.head
+        if gap >= self.size:
+            # Nothing recent survives: start over
+            self.sums[:] = 0
+            self.counts[:] = 0
+            self.head = bucket
+            self.first = bucket
+            for name in self.totals:
+                self.totals[name] = [0.0, 0]
+            return
+
+        for step in range(self.head + 1, bucket + 1):
+            for name, k in self.window_buckets.items():
+                leaving = (step - k) % self.size
+                total = self.totals[name]
+                total[0] -= float(self.sums[leaving])
+                total[1] -= int(self.counts[leaving])
+                if total[1] == 0:
+                    total[0] = 0.0  # drop accumulated rounding error
+            slot = step % self.size
+            self.sums[slot] = 0
+            self.counts[slot] = 0
+        self.head = bucket
+
+    def add(self, timestamp, value):
+        """Add a reading. Returns False if it is too old to affect any window."""
+        bucket = int(_epoch_seconds(timestamp) // self.bucket_seconds)
+        if self.head is None:
+            self.head = bucket
+            self.first = bucket
+        elif bucket > self.head:
+            self._advance(bucket)
+        elif bucket <= self.head - self.size:
+            return False
+
+        slot = bucket % self.size
+        self.sums[slot] += value
+        self.counts[slot] += 1
+        age = self.head - bucket
+        for name, k in self.window_buckets.items():
+            if age < k:
+                self.totals[name][0] += value
+                self.totals[name][1] += 1
+        if bucket < self.first:
+            self.first = bucket
+        return True
+
+    def means(self, min_coverage):
+        """Window name -> mean, or None while the data spans too little of the window."""
+        span = self.head - self.first + 1 if self.head is not None else 0
+        result = {}
+        for name, k in self.window_buckets.items():
+            total_sum, total_count = self.totals[name]
+            if total_count and min(span, k) >= min_coverage * k:
+                result[name] = total_sum / total_count
+            else:
+                result[name] = None
+        return result
+
+    def to_document(self):
+        return {
+            'sums': self.sums.astype(np.float32).tobytes(),
+            'counts': self.counts.tobytes(),
+            'head': self.head,
+            'first': self.first
+        }
+
+    @classmethod
+    def from_document(cls, doc, bucket_seconds):
+        return cls(
+            bucket_seconds,
+            np.frombuffer(doc['sums'], dtype=np.float32).astype(np.float64),
+            np.frombuffer(doc['counts'], dtype=np.uint32).copy(),
+            doc['head'],
+            doc['first']
+        )
+
+
+class ExposureStore(CheckpointedStore):
+    """
+    Rolling exposure by station (pollutant -> ExposureSeries), checkpointed to MongoDB.
+
+    Args:
+        collection: pymongo collection for checkpoints, or None (memory only).
+        bucket_seconds (int): Bucket width; must divide one hour.
+        min_coverage (float): Fraction of a window the data must span.
+        max_stations (int): Stations kept in memory.
+    """
+
+    VERSION = 1
+    NAME = 'exposure'
+
+    def __init__(self, collection, bucket_seconds, min_coverage, max_stations):
+        super().__init__(collection, max_stations)
+        if 3600 % bucket_seconds:
+            raise ValueError("Exposure bucket width must divide one hour")
+        self.bucket_seconds = bucket_seconds
+        self.min_coverage = min_coverage
+
+    def new_state(self):
+        return {}
+
+    def encode(self, state):
+        return {
+            'bucket_seconds': self.bucket_seconds,
+            'parameters': {p: s.to_document() for p, s in state.items()}
+        }
+
+    def decode(self, doc):
+        if doc.get('bucket_seconds') != self.bucket_seconds:
+            return {}
+        return {
+            p: ExposureSeries.from_document(s, self.bucket_seconds)
+            for p, s in doc.get('parameters', {}).items()
+        }
+
+    def observe(self, station_id, data):
+        """
+        Add a stored reading and return the station's rolling means.
+
+        Returns:
+            dict: pollutant -> {window name: mean or None}, for the reading's pollutants.
+        """
+        exposures = {}
+        with self._lock:
+            series_by_pollutant = self._load(station_id)
+            for pollutant, raw_value in (data.get('parameters') or {}).items():
+                try:
+                    value = float(raw_value)
+                except (TypeError, ValueError):
+                    continue
+                series = series_by_pollutant.get(pollutant)
+                if series is None:
+                    series = series_by_pollutant[pollutant] = ExposureSeries(self.bucket_seconds)
+                if series.add(data['timestamp'], value):
+                    exposures[pollutant] = series.means(self.min_coverage)
+            self._mark_dirty(station_id)
+        return exposures
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Latency buckets (seconds) covering sub-millisecond detector runs up to slow DB calls
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Queue lag can reach minutes when the processor falls behind
+LAG_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+    5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0
+)
+
+# Messages consumed from the pollution data queue, by outcome
+MESSAGES_CONSUMED = Counter(
+    'processor_messages_consumed_total',
+    'Messages consumed from the pollution data queue',
+    ['status']
+)
+
+# Time between the collector publishing a reading and the processor receiving it
+QUEUE_LAG = Histogram(
+    'processor_queue_lag_seconds',
+    'Delay between publish and consumption of a reading',
+    buckets=LAG_BUCKETS
+)
+
+# Per-stage latency inside process_pollution_data()
+STAGE_LATENCY = Histogram(
+    'processor_stage_latency_seconds',
+    'Latency of each stage of process_pollution_data',
+    ['stage'],
+    buckets=LATENCY_BUCKETS
+)
+
+# MongoDB operation durations
+MONGO_QUERY_LATENCY = Histogram(
+    'processor_mongo_query_latency_seconds',
+    'Duration of MongoDB operations',
+    ['operation'],
+    buckets=LATENCY_BUCKETS
+)
+
+# Messages consumed per priority lane (see routing.py)
+LANE_MESSAGES = Counter(
+    'processor_lane_messages_total',
+    'Messages consumed per lane',
+    ['lane']
+)
+
+# Anomalies detected, by type and severity
+ANOMALIES_DETECTED = Counter(
+    'processor_anomalies_detected_total',
+    'Anomalies detected',
+    ['type', 'severity']
+)
+
+# Outcome of publish_anomaly()
+ANOMALIES_PUBLISHED = Counter(
+    'processor_anomalies_published_total',
+    'Anomaly notifications published to RabbitMQ',
+    ['status']
+)
+
+# Encoded message sizes, to compare wire formats
+PUBLISHED_BYTES = Counter(
+    'processor_published_bytes_total',
+    'Bytes of anomaly notifications published to RabbitMQ',
+    ['content_type']
+)
+
+# Time spent connecting and publishing one anomaly to RabbitMQ
+PUBLISH_LATENCY = Histogram(
+    'processor_publish_latency_seconds',
+    'Time to publish an anomaly to RabbitMQ',
+    buckets=LATENCY_BUCKETS
+)
+
+@contextmanager
+def timed(histogram, **labels):
+    """
+    Observe the wall time of a block on a histogram.
+
+    Args:
+        histogram (Histogram): Target metric.
+        **labels: Label values, if the metric is labelled.
+    """
+    target = histogram.labels(**labels) if labels else histogram
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        target.observe(time.perf_counter() - started)
+
+def observe_queue_lag(properties):
+    """
+    Record queue lag from the 'published_at' header set by the producer
+    (epoch milliseconds: pika cannot encode float header values).
+
+    Args:
+        properties (pika.BasicProperties): Properties of the consumed message.
+    """
+    headers = getattr(properties, 'headers', None) or {}
+    published_at = headers.get('published_at')
+    if published_at is None:
+        return
+    try:
+        QUEUE_LAG.observe(max(0.0, time.time() - int(published_at) / 1000))
+    except (TypeError, ValueError):
+        pass
+
+# Startup phases ('imports', 'ready'), in seconds since the service started loading
+STARTUP_SECONDS = Gauge(
+    'processor_startup_seconds',
+    'Time from the start of loading to each startup phase',
+    ['phase']
+)
+
+# Dependency reachability as last seen by readiness checks (1 up, 0 down)
+DEPENDENCY_UP = Gauge(
+    'processor_dependency_up',
+    'Whether a dependency is reachable',
+    ['dependency']
+)
+
+def render_metrics():
+    """
+    Render all registered metrics in the Prometheus text exposition format.
+
+    Returns:
+        tuple: (payload bytes, content type header value)
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
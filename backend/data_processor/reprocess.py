@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Offline reprocessing of stored readings with the current anomaly detectors.
+
+Streams `pollution_data` from MongoDB in timestamp order and re-runs the
+same detection as the live consumer (seasonal forecasts, statistical and
+regional checks, WHO thresholds on rolling exposure) in a pool of worker
+processes. Results go to a versioned collection, `anomalies_<version>`,
+in the live anomalies format (anomaly_store.py) plus the run's version,
+with a summary in `anomaly_runs`; nothing is published to RabbitMQ, so
+clients are not notified.
+
+Stations are partitioned across workers in contiguous longitude stripes,
+so each worker owns whole stations and keeps their history, baselines and
+exposure windows in memory. Readings within 25 km of a stripe edge are also
+sent to the neighbouring worker as context, so regional comparisons see
+every neighbour. Baselines and exposure windows start empty at --start.
+
+Usage:
+
+    python reprocess.py --start 2024-01-01 --end 2024-04-01 --version thresholds-v2 --workers 8
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import math
+import multiprocessing
+import queue
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import pymongo
+
+import config
+from anomaly_detection import detect_anomalies, is_who_threshold_exceeded
+from anomaly_store import compact_info
+from baseline import BaselineStore
+from exposure import ExposureStore
+from station_registry import NEIGHBOUR_RADIUS_KM, STATIONS_COLLECTION, StationRegistry
+
+logger = logging.getLogger(__name__)
+
+RUNS_COLLECTION = 'anomaly_runs'
+COLLECTION_PREFIX = 'anomalies_'
+HISTORY_WINDOW = timedelta(hours=24)
+_VERSION = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+# Fields kept in the in-memory history of each station
+_HISTORY_FIELDS = ('station_id', 'latitude', 'longitude', 'timestamp', 'parameters')
+
+
+def get_mongodb_client():
+    return pymongo.MongoClient(
+        host=config.MONGODB_HOST,
+        port=config.MONGODB_PORT,
+        username=config.MONGODB_USER,
+        password=config.MONGODB_PASS
+    )
+
+
+class StripePartitioner:
+    """Assigns readings to workers by longitude stripes holding equal numbers of stations."""
+
+    def __init__(self, longitudes, workers):
+        longitudes = sorted(longitudes)
+        self.workers = workers
+        if longitudes:
+            self.bounds = [longitudes[len(longitudes) * i // workers] for i in range(1, workers)]
+        else:
+            self.bounds = [-180 + 360 * i / workers for i in range(1, workers)]
+
+    def owner(self, longitude):
+        return bisect.bisect_right(self.bounds, longitude)
+
+    def context_workers(self, latitude, longitude):
+        """Workers other than the owner whose stripe is within the neighbour radius."""
+        reach = NEIGHBOUR_RADIUS_KM / (111.32 * max(math.cos(math.radians(latitude)), 0.01))
+        low = bisect.bisect_right(self.bounds, longitude - reach)
+        high = bisect.bisect_right(self.bounds, longitude + reach)
+        owner = self.owner(longitude)
+        return [w for w in range(low, high + 1) if w != owner]
+
+
+class StationReplayer:
+    """Per-worker detection state for the stations of one partition."""
+
+    def __init__(self, stations, use_baseline):
+        self.registry = StationRegistry(None)
+        for latitude, longitude in stations.values():
+            self.registry.add_local(latitude, longitude)
+        self.history = {}   # station_id -> deque of recent readings
+        self.baselines = BaselineStore(
+            None,
+            alpha=config.BASELINE_ALPHA,
+            min_samples=config.BASELINE_MIN_SAMPLES,
+            min_std=config.BASELINE_MIN_STD,
+            max_stations=math.inf
+        ) if use_baseline else None
+        self.exposure = ExposureStore(
+            None,
+            bucket_seconds=config.EXPOSURE_BUCKET_SECONDS,
+            min_coverage=config.EXPOSURE_MIN_COVERAGE,
+            max_stations=math.inf
+        )
+
+    def _remember(self, sid, reading):
+        record = {k: reading.get(k) for k in _HISTORY_FIELDS}
+        record['station_id'] = sid
+        recent = self.history.setdefault(sid, deque())
+        recent.append(record)
+        cutoff = (datetime.fromisoformat(reading['timestamp'].replace('Z', '')) - HISTORY_WINDOW).isoformat()
+        while recent and recent[0]['timestamp'] < cutoff:
+            recent.popleft()
+
+    def add_context(self, reading):
+        sid = self.registry.add_local(reading['latitude'], reading['longitude'])
+        self._remember(sid, reading)
+
+    def score(self, reading):
+        """Detect anomalies for a reading, then learn it. Returns anomaly_info dicts."""
+        sid = self.registry.add_local(reading['latitude'], reading['longitude'])
+        data = dict(reading, station_id=sid)
+        neighbours = self.registry.neighbours.get(sid, set())
+
+        forecasts = self.baselines.forecast(sid, data) if self.baselines else None
+        historical_data = [rec for s in (sid, *neighbours) for rec in self.history.get(s, ())]
+        anomalies = []
+        if historical_data or forecasts:
+            anomalies = detect_anomalies(data, historical_data, neighbours, forecasts)
+
+        if self.baselines:
+            self.baselines.update(sid, data)
+        self._remember(sid, data)
+        exposures = self.exposure.observe(sid, data)
+        return is_who_threshold_exceeded(data, exposures) + anomalies
+
+
+def worker_main(index, stations, use_baseline, target, version, tasks, results):
+    """Worker process: score batches of readings and write their anomalies."""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - worker {index} - %(levelname)s - %(message)s')
+    client = get_mongodb_client()
+    collection = client[config.MONGODB_DB][target]
+    replayer = StationReplayer(stations, use_baseline)
+    try:
+        while True:
+            batch = tasks.get()
+            if batch is None:
+                break
+            docs = []
+            scored = 0
+            for is_owner, reading_id, reading in batch:
+                if not is_owner:
+                    replayer.add_context(reading)
+                    continue
+                scored += 1
+                for anomaly in replayer.score(reading):
+                    docs.append({
+                        'reading_id': reading_id,
+                        'anomaly_info': compact_info(anomaly),
+                        'timestamp': reading['timestamp'],
+                        'version': version
+                    })
+            if docs:
+                collection.insert_many(docs, ordered=False)
+            results.put((scored, len(docs)))
+    except Exception as e:
+        logging.exception(f"Worker {index} failed")
+        results.put(e)
+    finally:
+        client.close()
+
+
+def _station_longitudes(db, registry, match, workers):
+    longitudes = [lon for _, lon in registry.stations.values()]
+    if len(longitudes) >= workers * 10:
+        return longitudes
+    # Registry too small (e.g. untagged history): sample reading locations instead
+    sample = db.pollution_data.aggregate([
+        {'$match': match},
+        {'$sample': {'size': 10000}},
+        {'$project': {'_id': 0, 'longitude': 1}}
+    ])
+    return longitudes + [float(doc['longitude']) for doc in sample]
+
+
+def run(start, end, version, workers, batch_size, use_baseline=True, overwrite=False, report_every=10.0):
+    """
+    Reprocess readings in [start, end) into anomalies_<version>.
+
+    Returns:
+        dict: Run summary, also stored in anomaly_runs.
+    """
+    if not _VERSION.match(version):
+        raise ValueError("Version may only contain letters, digits, '.', '_' and '-'")
+    target = f"{COLLECTION_PREFIX}{version}"
+
+    client = get_mongodb_client()
+    db = client[config.MONGODB_DB]
+    if db[target].estimated_document_count() and not overwrite:
+        raise ValueError(f"{target} already has documents; pass --overwrite to replace them")
+    db[target].drop()
+
+    # Uses the timestamp index the processor service creates (station_registry.ensure_indexes)
+    match = {'timestamp': {'$gte': start.isoformat(), '$lt': end.isoformat()}}
+    total = db.pollution_data.count_documents(match)
+
+    registry = StationRegistry(db[STATIONS_COLLECTION])
+    registry.sync()
+    partitioner = StripePartitioner(_station_longitudes(db, registry, match, workers), workers)
+
+    summary = {
+        '_id': version,
+        'collection': target,
+        'window': {'start': start.isoformat(), 'end': end.isoformat()},
+        'workers': workers,
+        'baseline': use_baseline,
+        'started_at': datetime.utcnow(),
+        'readings': 0,
+        'anomalies': 0,
+        'status': 'running'
+    }
+    db[RUNS_COLLECTION].replace_one({'_id': version}, summary, upsert=True)
+
+    ctx = multiprocessing.get_context('spawn')
+    tasks = [ctx.Queue(maxsize=4) for _ in range(workers)]
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=worker_main,
+            args=(i, registry.stations, use_baseline, target, version, tasks[i], results),
+            daemon=True
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    pending = [[] for _ in range(workers)]
+    streamed = 0
+    started = time.perf_counter()
+    last_report = started
+
+    def dispatch(w, item):
+        # A worker that failed stops reading its queue: keep checking for its
+        # error instead of blocking on a full queue
+        while True:
+            collect()
+            try:
+                tasks[w].put(item, timeout=1)
+                return
+            except queue.Full:
+                if not processes[w].is_alive():
+                    collect()
+                    raise RuntimeError(f"Worker {w} exited with code {processes[w].exitcode}")
+
+    def collect(block=False):
+        while True:
+            try:
+                item = results.get(block=block, timeout=1 if block else None)
+            except queue.Empty:
+                return
+            if isinstance(item, Exception):
+                raise RuntimeError(f"Worker failed: {item}")
+            summary['readings'] += item[0]
+            summary['anomalies'] += item[1]
+            if block:
+                return
+
+    def report():
+        elapsed = time.perf_counter() - started
+        rate = summary['readings'] / elapsed if elapsed else 0
+        remaining = (total - summary['readings']) / rate if rate else float('inf')
+        logger.info(
+            f"{summary['readings']}/{total} readings ({100 * summary['readings'] / max(total, 1):.1f}%), "
+            f"{summary['anomalies']} anomalies, {rate:.0f} readings/s, ETA {remaining / 60:.1f} min"
+        )
+
+    try:
+        cursor = db.pollution_data.find(match, batch_size=batch_size).sort('timestamp', pymongo.ASCENDING)
+        for reading in cursor:
+            streamed += 1
+            reading_id = reading.pop('_id')
+            latitude, longitude = float(reading['latitude']), float(reading['longitude'])
+            owner = partitioner.owner(longitude)
+            pending[owner].append((True, reading_id, reading))
+            for w in partitioner.context_workers(latitude, longitude):
+                pending[w].append((False, reading_id, reading))
+
+            for w in range(workers):
+                if len(pending[w]) >= batch_size:
+                    dispatch(w, pending[w])
+                    pending[w] = []
+
+            collect()
+            if time.perf_counter() - last_report >= report_every:
+                report()
+                last_report = time.perf_counter()
+
+        for w in range(workers):
+            if pending[w]:
+                dispatch(w, pending[w])
+            dispatch(w, None)
+
+        while summary['readings'] < streamed and any(p.is_alive() for p in processes):
+            collect(block=True)
+        collect()
+        for process in processes:
+            process.join()
+        summary['status'] = 'completed' if summary['readings'] == streamed else 'incomplete'
+    except BaseException:
+        summary['status'] = 'failed'
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        summary['finished_at'] = datetime.utcnow()
+        summary['elapsed_seconds'] = round(elapsed, 1)
+        summary['readings_per_second'] = round(summary['readings'] / elapsed, 1) if elapsed else None
+        db[RUNS_COLLECTION].replace_one({'_id': version}, summary, upsert=True)
+        db[target].create_index('timestamp')
+        client.close()
+
+    report()
+    return summary
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Re-run anomaly detection over stored readings")
+    parser.add_argument('--start', required=True, help='ISO date/time (inclusive)')
+    parser.add_argument('--end', help='ISO date/time (exclusive), default now')
+    parser.add_argument('--version', default=datetime.utcnow().strftime('%Y%m%dT%H%M%S'),
+                        help='Label of the run; results go to anomalies_<version>')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=1000, help='Readings per worker batch')
+    parser.add_argument('--no-baseline', action='store_true', help='Skip seasonal forecasts')
+    parser.add_argument('--overwrite', action='store_true', help='Replace an existing run of this version')
+    parser.add_argument('--report-every', type=float, default=10.0, help='Seconds between progress lines')
+    args = parser.parse_args()
+
+    start = datetime.fromisoformat(args.start.replace('Z', ''))
+    end = datetime.fromisoformat(args.end.replace('Z', '')) if args.end else datetime.utcnow()
+    summary = run(start, end, args.version, args.workers, args.batch_size,
+                  use_baseline=not args.no_baseline, overwrite=args.overwrite,
+                  report_every=args.report_every)
+    print(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
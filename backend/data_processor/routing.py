@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Queue routing by region and priority lane. This file is kept identical in
+# data_collector, data_processor and notification_service.
+#
+# Readings and anomalies are published to topic exchanges with the routing key
+#
+#   <kind>.<region>.<lane>        e.g. readings.n30e30.urgent
+#
+# where region names the REGION_DEGREES cell of the coordinates by its
+# south-west corner (n30e30: 30-40°N, 30-40°E) and lane is
+#
+#   urgent    readings with a value above its dangerous threshold,
+#             anomalies of 'danger' severity
+#   routine   everything else
+#
+# Consumers bind one queue per lane for the regions they handle
+# (readings.n30e30.urgent, readings.*.routine, ...), so a backlog of routine
+# messages never sits in front of urgent ones. They read the lanes with
+# separate prefetch windows, which weights how many messages of each lane
+# are in flight at once.
+#
+# Lane queues are named after the consumer's queue group, by default its
+# regions (lane_queues: pollution_data_queue.all, pollution_data_queue.n30e30-n40e30),
+# so instances serving the same regions share their queues and scale out,
+# while instances serving different regions never compete for messages.
+#
+# Each topic exchange has an alternate exchange, <exchange>.unrouted,
+# delivering messages no lane queue is bound for (no consumer has started
+# yet, or no consumer covers the region) to a fallback queue, so nothing
+# published is dropped. The consumer side names who drains it: the processor
+# subscribes to it next to its lanes (PROCESSOR_CONSUME_UNROUTED), the
+# notification service uses it as its routine lane queue.
+
+import math
+
+URGENT = 'urgent'
+ROUTINE = 'routine'
+# Consumption order: urgent lanes are subscribed first
+LANES = (URGENT, ROUTINE)
+
+READINGS = 'readings'
+ANOMALIES = 'anomalies'
+
+# Size of a region cell in degrees. Producers and consumers must agree.
+REGION_DEGREES = 10
+
+
+def region(latitude, longitude):
+    """Region of a coordinate, e.g. 'n30e30' or 's10w80'."""
+    lat = math.floor(float(latitude) / REGION_DEGREES) * REGION_DEGREES
+    lon = math.floor(float(longitude) / REGION_DEGREES) * REGION_DEGREES
+    return f"{'n' if lat >= 0 else 's'}{abs(lat)}{'e' if lon >= 0 else 'w'}{abs(lon)}"
+
+
+def reading_lane(reading, dangerous_thresholds):
+    """URGENT when any pollutant of the reading is above its dangerous threshold."""
+    for pollutant, raw_value in (reading.get('parameters') or {}).items():
+        threshold = dangerous_thresholds.get(pollutant)
+        if threshold is None:
+            continue
+        try:
+            if float(raw_value) > threshold:
+                return URGENT
+        except (TypeError, ValueError):
+            continue
+    return ROUTINE
+
+
+def anomaly_lane(anomaly_info):
+    return URGENT if anomaly_info.get('severity') == 'danger' else ROUTINE
+
+
+def routing_key(kind, data, lane):
+    """Routing key of a reading (or of the reading an anomaly was detected on)."""
+    try:
+        where = region(data['latitude'], data['longitude'])
+    except (KeyError, TypeError, ValueError):
+        where = 'unknown'
+    return f"{kind}.{where}.{lane}"
+
+
+def parse_regions(value):
+    """Comma-separated region patterns from the environment ('*' for all)."""
+    regions = [r.strip() for r in (value or '').split(',') if r.strip()]
+    return regions or ['*']
+
+
+def queue_group(regions):
+    """Queue name suffix of a set of regions: 'all' for '*', else the names joined by '-'."""
+    names = sorted({'all' if where in ('*', '#') else where.replace('*', 'any').replace('#', 'all')
+                    for where in regions})
+    return 'all' if 'all' in names else '-'.join(names)
+
+
+def lane_queues(urgent_queue, routine_queue, group):
+    """Lane -> queue name of a queue group, e.g. {'routine': 'pollution_data_queue.all', ...}."""
+    return {URGENT: f"{urgent_queue}.{group}", ROUTINE: f"{routine_queue}.{group}"}
+
+
+def declare_exchange(channel, exchange, fallback_queue):
+    """
+    Declare a topic exchange whose unroutable messages go to fallback_queue.
+
+    Producers and consumers both call this, with the same arguments.
+    """
+    unrouted = f"{exchange}.unrouted"
+    channel.exchange_declare(exchange=unrouted, exchange_type='fanout', durable=True)
+    channel.queue_declare(queue=fallback_queue, durable=True)
+    channel.queue_bind(queue=fallback_queue, exchange=unrouted)
+    channel.exchange_declare(
+        exchange=exchange,
+        exchange_type='topic',
+        durable=True,
+        arguments={'alternate-exchange': unrouted}
+    )
+
+
+def bind_lanes(channel, exchange, kind, queues, regions):
+    """
+    Declare the lane queues and bind them for the given regions.
+
+    Args:
+        queues (dict): Lane -> queue name.
+        regions (list): Region names or topic patterns ('*' for all).
+    """
+    for lane, queue in queues.items():
+        channel.queue_declare(queue=queue, durable=True)
+        for where in regions:
+            channel.queue_bind(queue=queue, exchange=exchange, routing_key=f"{kind}.{where}.{lane}")
+
+
+def consume_lanes(channel, queues, prefetch, callback, fallback_queue=None):
+    """
+    Subscribe to the lane queues, each with its own prefetch window.
+
+    RabbitMQ applies a (non-global) basic_qos to the consumers created after
+    it, so the urgent lane can have more messages in flight than the
+    routine one.
+
+    Args:
+        queues (dict): Lane -> queue name.
+        prefetch (dict): Lane -> prefetch count.
+        fallback_queue (str): Also drain the exchange's fallback queue, read
+            like the routine lane.
+
+    Returns:
+        dict: Consumer tag -> lane, to tell in the callback which lane a message came from.
+    """
+    lanes = {}
+    for lane in LANES:
+        if lane not in queues:
+            continue
+        channel.basic_qos(prefetch_count=prefetch[lane])
+        tag = channel.basic_consume(queue=queues[lane], on_message_callback=callback)
+        lanes[tag] = lane
+    if fallback_queue and fallback_queue not in queues.values():
+        channel.basic_qos(prefetch_count=prefetch[ROUTINE])
+        tag = channel.basic_consume(queue=fallback_queue, on_message_callback=callback)
+        lanes[tag] = ROUTINE
+    return lanes
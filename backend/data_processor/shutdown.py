@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Graceful shutdown for services with queue consumers. This file is kept
+# identical in data_processor and notification_service.
+#
+# On SIGTERM (docker stop) or SIGINT the service:
+#
+#   1. runs the on_request callbacks (readiness goes down),
+#   2. asks every registered consumer to stop fetching; pika finishes the
+#      callback it is running, so the in-flight message or batch is acked,
+#      and prefetched messages go back to the queue,
+#   3. waits until every consumer has closed its channel (a thread that is
+#      still connecting holds no messages and is not waited for),
+#   4. runs the drain hooks (checkpoints, buffered writes),
+#   5. stops the HTTP server.
+#
+# Steps 2-4 share SHUTDOWN_TIMEOUT; past it the service exits anyway and
+# unacked messages are redelivered. A second signal exits at once.
+
+import _thread
+import logging
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class GracefulShutdown:
+    """
+    Coordinates consumer threads and drain hooks on shutdown.
+
+    Args:
+        timeout (float): Seconds from the signal until the process exits.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.event = threading.Event()
+        self.deadline = None
+        self._consumers = {}    # name -> (connection, channel) while consuming
+        self._on_request = []
+        self._hooks = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    @property
+    def requested(self):
+        return self.event.is_set()
+
+    def remaining(self):
+        """Seconds left before the deadline (timeout while not shutting down)."""
+        if self.deadline is None:
+            return self.timeout
+        return max(0.0, self.deadline - time.monotonic())
+
+    def install(self):
+        """Handle SIGTERM and SIGINT (call from the main thread)."""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        if self.requested:
+            # Second signal, or the drain finishing: stop the HTTP server now
+            raise KeyboardInterrupt
+        self.request(signal.Signals(signum).name)
+
+    def on_request(self, callback):
+        """Run callback() as soon as shutdown starts."""
+        self._on_request.append(callback)
+
+    def add_hook(self, name, callback):
+        """Run callback() once the consumers have stopped."""
+        self._hooks.append((name, callback))
+
+    def consuming(self, name, connection, channel):
+        """Register the channel a consumer thread is about to consume on; shutdown waits for stopped()."""
+        with self._lock:
+            self._consumers[name] = (connection, channel)
+        if self.requested:
+            self._stop_consumer(name)
+
+    def stopped(self, name):
+        """The consumer has closed its channel (or lost it)."""
+        with self._lock:
+            self._consumers.pop(name, None)
+            self._idle.notify_all()
+
+    def _stop_consumer(self, name):
+        with self._lock:
+            entry = self._consumers.get(name)
+        if entry is None:
+            return
+        connection, channel = entry
+        try:
+            # stop_consuming must run on the connection's own thread
+            connection.add_callback_threadsafe(channel.stop_consuming)
+        except Exception as e:
+            logger.warning(f"Could not stop consumer {name}: {e}")
+
+    def request(self, reason):
+        """Start shutting down (idempotent)."""
+        with self._lock:
+            if self.event.is_set():
+                return
+            self.deadline = time.monotonic() + self.timeout
+            self.event.set()
+        logger.info(f"Shutdown requested ({reason}), draining within {self.timeout:.0f}s")
+        for callback in self._on_request:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Shutdown callback error: {e}")
+        threading.Thread(target=self._drain, name='shutdown', daemon=True).start()
+
+    def _drain(self):
+        started = time.monotonic()
+        with self._lock:
+            names = list(self._consumers)
+        for name in names:
+            self._stop_consumer(name)
+
+        with self._idle:
+            self._idle.wait_for(lambda: not self._consumers, self.remaining())
+            pending = list(self._consumers)
+        if pending:
+            logger.warning(f"Consumers still running at the deadline: {', '.join(pending)}")
+
+        for name, callback in self._hooks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Shutdown hook {name} failed: {e}")
+
+        logger.info(f"Drained in {time.monotonic() - started:.2f}s, stopping")
+        # Raise KeyboardInterrupt in the main thread, which stops the HTTP server
+        _thread.interrupt_main()
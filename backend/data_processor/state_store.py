@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-station in-memory state, checkpointed to MongoDB.
+
+Subclasses define what one station's state is and how it is stored. The
+store keeps the most recently used `max_stations` states in memory, loads a
+station's last checkpoint on first use, and writes changed states in bulk
+every checkpoint interval (and when evicting), so a restart resumes without
+replaying history and the hot path never reads MongoDB.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointedStore:
+    """
+    LRU-bounded per-station state with background checkpoints.
+
+    Args:
+        collection: pymongo collection for checkpoints, one document per
+            station, or None to keep state in memory only (offline replays).
+        max_stations (int): Stations kept in memory.
+    """
+
+    # Stored with every document; checkpoints of another version are ignored
+    VERSION = 1
+    NAME = 'state'
+
+    def __init__(self, collection, max_stations):
+        self.collection = collection
+        self.max_stations = max_stations
+        self._stations = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def new_state(self):
+        """Empty state for a station without a checkpoint."""
+        raise NotImplementedError
+
+    def encode(self, state):
+        """Document fields for a state (must not share mutable buffers with it)."""
+        raise NotImplementedError
+
+    def decode(self, doc):
+        """State from a checkpoint document."""
+        raise NotImplementedError
+
+    def _load(self, station_id):
+        """Station state, loaded from its checkpoint on first use. Call with the lock held."""
+        state = self._stations.get(station_id)
+        if state is not None:
+            self._stations.move_to_end(station_id)
+            return state
+
+        doc = self.collection.find_one({'_id': station_id}) if self.collection is not None else None
+        if doc and doc.get('version') == self.VERSION:
+            state = self.decode(doc)
+        else:
+            state = self.new_state()
+        self._stations[station_id] = state
+
+        if len(self._stations) > self.max_stations:
+            evicted, evicted_state = self._stations.popitem(last=False)
+            if evicted in self._dirty:
+                self._dirty.discard(evicted)
+                self._write({evicted: self.encode(evicted_state)})
+        return state
+
+    def _mark_dirty(self, station_id):
+        if self.collection is not None:
+            self._dirty.add(station_id)
+
+    def _write(self, docs):
+        now = datetime.utcnow()
+        requests = [
+            ReplaceOne({'_id': station_id}, dict(doc, version=self.VERSION, updated_at=now), upsert=True)
+            for station_id, doc in docs.items()
+        ]
+        if requests and self.collection is not None:
+            self.collection.bulk_write(requests, ordered=False)
+
+    def checkpoint(self):
+        """Write states changed since the last checkpoint."""
+        with self._lock:
+            docs = {sid: self.encode(self._stations[sid]) for sid in self._dirty if sid in self._stations}
+            self._dirty.clear()
+        try:
+            self._write(docs)
+        except Exception:
+            with self._lock:
+                self._dirty.update(docs)
+            raise
+        return len(docs)
+
+    def start_checkpointing(self, interval):
+        """Checkpoint in a background thread every `interval` seconds."""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    written = self.checkpoint()
+                    if written:
+                        logger.info(f"Checkpointed {self.NAME} for {written} stations")
+                except Exception as e:
+                    logger.error(f"Checkpoint error ({self.NAME}): {e}")
+
+        self._thread = threading.Thread(target=run, name=f'{self.NAME}-checkpoint', daemon=True)
+        self._thread.start()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Statistics over arbitrary windows, groupings and metrics.
+
+A query is split into independent sub-aggregations, one per pollutant, that
+run concurrently on a shared thread pool and are merged into one result per
+group. Percentiles use MongoDB's `$percentile` operator with the
+approximate (t-digest) method, so they need MongoDB 7.0 or newer.
+
+When only mean/max are requested and the grouping is not by hour, whole
+days of the window are taken from the daily rollups written by bulk-import
+backfills (pollution_daily_rollups), provided the rollup of that day was
+computed after the day ended and still counts every reading of the day:
+a day that received live or late readings after its rollup ran is
+aggregated from raw readings instead. The remaining time ranges are
+aggregated from raw readings and the two are combined with count-weighted
+means.
+"""
+
+import math
+import re
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from station_registry import station_id
+
+POLLUTANTS = ('PM2.5', 'PM10', 'NO2', 'SO2', 'O3')
+GROUP_BY = ('none', 'station', 'cell', 'hour')
+ROLLUP_COLLECTION = 'pollution_daily_rollups'
+# Field names of each pollutant in the daily rollups
+ROLLUP_KEYS = {'PM2.5': 'pm25', 'PM10': 'pm10', 'NO2': 'no2', 'SO2': 'so2', 'O3': 'o3'}
+ROLLUP_METRICS = {'mean', 'max'}
+
+_BASE_METRICS = ('mean', 'min', 'max')
+_PERCENTILE = re.compile(r'^p(\d{1,2}(?:\.\d+)?)$')
+_WINDOW = re.compile(r'^(\d+)([mhd])$')
+_WINDOW_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+
+
+class StatisticsQueryError(ValueError):
+    """Raised for an invalid statistics request."""
+
+
+def parse_window(window):
+    """'90m', '24h' or '7d' as a timedelta."""
+    match = _WINDOW.match(window or '')
+    if not match:
+        raise StatisticsQueryError(f"Invalid window: {window} (use e.g. 90m, 24h, 7d)")
+    return timedelta(**{_WINDOW_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def parse_metrics(names):
+    """Validate metric names; percentiles are pNN (e.g. p50, p95, p99.9)."""
+    metrics = []
+    for name in names:
+        if name in _BASE_METRICS:
+            metrics.append(name)
+            continue
+        match = _PERCENTILE.match(name)
+        if not match or not 0 < float(match.group(1)) < 100:
+            raise StatisticsQueryError(f"Invalid metric: {name}. Valid: mean, min, max, pNN")
+        metrics.append(name)
+    if not metrics:
+        raise StatisticsQueryError("At least one metric is required")
+    return metrics
+
+
+class StatisticsQuery:
+    """A validated statistics request."""
+
+    def __init__(self, start, end, group_by='none', metrics=('mean', 'max'),
+                 parameters=POLLUTANTS, cell_size=0.1, source='auto'):
+        if start >= end:
+            raise StatisticsQueryError("Window start must be before its end")
+        if group_by not in GROUP_BY:
+            raise StatisticsQueryError(f"Invalid group_by: {group_by}. Valid: {', '.join(GROUP_BY)}")
+        unknown = [p for p in parameters if p not in POLLUTANTS]
+        if unknown or not parameters:
+            raise StatisticsQueryError(f"Invalid parameters: {', '.join(unknown)}. Valid: {', '.join(POLLUTANTS)}")
+        if not cell_size > 0:
+            raise StatisticsQueryError("cell_size must be positive")
+        if source not in ('auto', 'raw'):
+            raise StatisticsQueryError("source must be 'auto' or 'raw'")
+        self.start = start
+        self.end = end
+        self.group_by = group_by
+        self.metrics = parse_metrics(metrics)
+        self.parameters = list(parameters)
+        self.cell_size = cell_size
+        self.source = source
+
+    @property
+    def percentiles(self):
+        return [m for m in self.metrics if _PERCENTILE.match(m)]
+
+    def can_use_rollups(self):
+        return (self.source == 'auto' and self.group_by != 'hour'
+                and set(self.metrics) <= ROLLUP_METRICS)
+
+
+def _field(name):
+    return {'$convert': {'input': name, 'to': 'double', 'onError': None, 'onNull': None}}
+
+
+def _group_expression(query):
+    """Group key of a raw reading, computed in the pipeline."""
+    lat, lon = _field('$latitude'), _field('$longitude')
+    if query.group_by == 'station':
+        return {'latitude': {'$round': [lat, 2]}, 'longitude': {'$round': [lon, 2]}}
+    if query.group_by == 'cell':
+        size = query.cell_size
+        return {
+            'latitude': {'$multiply': [{'$floor': {'$divide': [lat, size]}}, size]},
+            'longitude': {'$multiply': [{'$floor': {'$divide': [lon, size]}}, size]}
+        }
+    if query.group_by == 'hour':
+        return {'$substrBytes': ['$timestamp', 0, 13]}
+    return None
+
+
+def _rollup_group_key(query, latitude, longitude):
+    """The same group key as _group_expression, for a rollup document."""
+    if query.group_by == 'station':
+        return (round(latitude, 2), round(longitude, 2))
+    if query.group_by == 'cell':
+        size = query.cell_size
+        return (math.floor(latitude / size) * size, math.floor(longitude / size) * size)
+    return None
+
+
+def _key(group):
+    """Hashable, rounding-tolerant key for a group value from either source."""
+    if isinstance(group, dict):
+        return (round(group['latitude'], 6), round(group['longitude'], 6))
+    if isinstance(group, tuple):
+        return tuple(round(v, 6) for v in group)
+    return group
+
+
+def build_raw_pipeline(query, parameter, ranges):
+    """Aggregation of one pollutant over raw readings in the given time ranges."""
+    time_filters = [{'timestamp': {'$gte': s.isoformat(), '$lt': e.isoformat()}} for s, e in ranges]
+    group = {
+        '_id': _group_expression(query),
+        'count': {'$sum': 1},
+    }
+    for metric in query.metrics:
+        if metric in _BASE_METRICS:
+            accumulator = {'mean': '$avg', 'min': '$min', 'max': '$max'}[metric]
+            group[metric] = {accumulator: '$value'}
+    if query.percentiles:
+        group['percentiles'] = {'$percentile': {
+            'input': '$value',
+            'p': [float(_PERCENTILE.match(m).group(1)) / 100 for m in query.percentiles],
+            'method': 'approximate'
+        }}
+    return [
+        {'$match': time_filters[0] if len(time_filters) == 1 else {'$or': time_filters}},
+        # $getField: pollutant names contain dots
+        {'$project': {
+            '_id': 0,
+            'latitude': 1,
+            'longitude': 1,
+            'timestamp': 1,
+            'value': _field({'$getField': {'field': parameter, 'input': '$parameters'}})
+        }},
+        {'$match': {'value': {'$ne': None}}},
+        {'$group': group}
+    ]
+
+
+def _split_window(query, rollup_days):
+    """Time ranges of the window not covered by the given whole days."""
+    ranges = []
+    cursor = query.start
+    for day in sorted(rollup_days):
+        day_start = datetime.fromisoformat(day)
+        if cursor < day_start:
+            ranges.append((cursor, day_start))
+        cursor = max(cursor, day_start + timedelta(days=1))
+    if cursor < query.end:
+        ranges.append((cursor, query.end))
+    return ranges
+
+
+def _raw_day_counts(db, days):
+    """
+    Number of raw readings per day, for the given days.
+
+    One aggregation covered by the timestamp index (station_registry.ensure_indexes,
+    created when the processor loads the registry).
+    """
+    end = (datetime.fromisoformat(max(days)) + timedelta(days=1)).date().isoformat()
+    pipeline = [
+        {'$match': {'timestamp': {'$gte': min(days), '$lt': end}}},
+        {'$project': {'_id': 0, 'timestamp': 1}},
+        {'$group': {'_id': {'$substrBytes': ['$timestamp', 0, 10]}, 'count': {'$sum': 1}}},
+        {'$match': {'_id': {'$in': list(days)}}}
+    ]
+    return {row['_id']: row['count'] for row in db.pollution_data.aggregate(pipeline)}
+
+
+def _complete_rollup_days(db, query):
+    """
+    Whole days inside the window whose rollups were computed after the day
+    ended and cover all of the day's readings.
+
+    Returns:
+        dict: day -> list of rollup documents.
+    """
+    first = datetime.combine(query.start.date(), datetime.min.time())
+    if first < query.start:
+        first += timedelta(days=1)
+    days = []
+    day = first
+    while day + timedelta(days=1) <= query.end:
+        days.append(day.date().isoformat())
+        day += timedelta(days=1)
+    if not days:
+        return {}
+
+    by_day = {}
+    for doc in db[ROLLUP_COLLECTION].find({'day': {'$in': days}}):
+        by_day.setdefault(doc['day'], []).append(doc)
+
+    complete = {}
+    for day, docs in by_day.items():
+        day_end = datetime.fromisoformat(day) + timedelta(days=1)
+        if all(doc.get('updated_at') and doc['updated_at'] >= day_end for doc in docs):
+            complete[day] = docs
+    if not complete:
+        return {}
+
+    # Readings stored after the rollup ran (live traffic, late arrivals) are
+    # not in it; such days are read raw until the next backfill re-rolls them
+    raw_counts = _raw_day_counts(db, complete)
+    return {
+        day: docs for day, docs in complete.items()
+        if raw_counts.get(day, 0) == sum(doc.get('count', 0) for doc in docs)
+    }
+
+
+def _merge(results, key, group, parameter, values):
+    """Fold one partial result for (group, parameter) into `results`."""
+    entry = results.setdefault(key, {'group': group, 'parameters': {}})
+    current = entry['parameters'].get(parameter)
+    if current is None:
+        entry['parameters'][parameter] = values
+        return
+    # Raw and rollup parts of the same group: combine mean and max
+    count = current['count'] + values['count']
+    if 'mean' in current:
+        current['mean'] = (current['mean'] * current['count'] + values['mean'] * values['count']) / count
+    if 'max' in current:
+        current['max'] = max(current['max'], values['max'])
+    current['count'] = count
+
+
+def _format_group(query, group):
+    if query.group_by == 'station':
+        return {
+            'station_id': station_id(group['latitude'], group['longitude']),
+            'latitude': group['latitude'],
+            'longitude': group['longitude']
+        }
+    if query.group_by == 'cell':
+        return {'latitude': group['latitude'], 'longitude': group['longitude'], 'cell_size': query.cell_size}
+    if query.group_by == 'hour':
+        return {'hour': f"{group}:00:00"}
+    return {}
+
+
+def run_query(db, query, executor, timed=None):
+    """
+    Run a statistics query.
+
+    Args:
+        db: pymongo database.
+        query (StatisticsQuery): The request.
+        executor (ThreadPoolExecutor): Pool the sub-aggregations run on.
+        timed (callable, optional): timed(operation) context manager for
+            per-aggregation latency metrics.
+
+    Returns:
+        dict: {'data': [...], 'sources': {...}}
+    """
+    rollup_days = _complete_rollup_days(db, query) if query.can_use_rollups() else {}
+    ranges = _split_window(query, rollup_days)
+
+    timed = timed or (lambda operation: nullcontext())
+
+    def aggregate(parameter):
+        pipeline = build_raw_pipeline(query, parameter, ranges)
+        with timed(f'statistics_{parameter}'):
+            return parameter, list(db.pollution_data.aggregate(pipeline, allowDiskUse=True))
+
+    futures = [executor.submit(aggregate, p) for p in query.parameters] if ranges else []
+
+    results = {}
+    for future in futures:
+        parameter, rows = future.result()
+        for row in rows:
+            values = {'count': row['count']}
+            for metric in query.metrics:
+                if metric in _BASE_METRICS:
+                    values[metric] = row.get(metric)
+            for metric, value in zip(query.percentiles, row.get('percentiles') or []):
+                values[metric] = value
+            _merge(results, _key(row['_id']), row['_id'], parameter, values)
+
+    for docs in rollup_days.values():
+        for doc in docs:
+            lat_lon = _rollup_group_key(query, float(doc['latitude']), float(doc['longitude']))
+            group = {'latitude': lat_lon[0], 'longitude': lat_lon[1]} if lat_lon else None
+            for parameter in query.parameters:
+                stats = (doc.get('pollutants') or {}).get(ROLLUP_KEYS[parameter]) or {}
+                if not stats.get('count'):
+                    continue
+                values = {'count': stats['count']}
+                for metric in query.metrics:
+                    values[metric] = stats.get(metric)
+                _merge(results, _key(lat_lon), group, parameter, values)
+
+    data = []
+    for entry in results.values():
+        data.append({
+            'group': _format_group(query, entry['group']),
+            'parameters': entry['parameters']
+        })
+    if query.group_by == 'hour':
+        data.sort(key=lambda item: item['group']['hour'])
+
+    return {
+        'data': data,
+        'sources': {
+            'rollup_days': sorted(rollup_days),
+            'raw_ranges': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in ranges]
+        }
+    }
+
+
+def create_executor(workers):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='statistics')
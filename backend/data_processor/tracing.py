@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Per-stage tracing of a reading's path through the services. This file is
+# kept identical in data_collector, data_processor and notification_service.
+#
+# A trace starts at the collector's POST (sampled at TRACE_SAMPLE_RATE) and
+# follows the queue message through the processor to the notification
+# service's Socket.IO broadcast. Its context travels in AMQP headers next to
+# published_at:
+#
+#   trace_id      32 hex chars, shared by every span of the trace
+#   trace_parent  16 hex chars, id of the span that published the message
+#   trace_hops    [[stage, epoch milliseconds], ...], one entry per publish
+#
+# Times are integer milliseconds, like published_at: pika cannot encode
+# float header values.
+#
+# Messages without trace_id (unsampled, bulk imports, older producers) are
+# not traced. Each service appends its spans as JSON lines to TRACE_FILE,
+# written by a background thread, with the OTLP/JSON span field names:
+#
+#   {"traceId", "spanId", "parentSpanId", "name", "startTimeUnixNano",
+#    "endTimeUnixNano", "attributes": {"service.name", ...}}
+#
+# Queue waits are recorded as spans from the publishing hop to the consumer
+# picking the message up; they compare clocks of different hosts, so they
+# are only as accurate as the hosts' time synchronisation.
+#
+# Latency distributions per stage, over the files of all services:
+#
+#   python tracing.py summary /traces/*.jsonl [--minutes 60]
+
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_HEADER = 'trace_id'
+TRACE_PARENT_HEADER = 'trace_parent'
+TRACE_HOPS_HEADER = 'trace_hops'
+
+
+def _text(value):
+    # pika returns header strings as bytes when they are not valid UTF-8
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+
+
+class TraceContext:
+    """Position in a trace: the trace id, the current span and the hops so far."""
+
+    def __init__(self, trace_id, span_id=None, hops=None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.hops = hops or []
+
+
+class Span:
+    """A timed stage; end() records it. Also a context manager."""
+
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.parent_id = parent.span_id
+        self.context = TraceContext(parent.trace_id, f'{random.getrandbits(64):016x}', parent.hops)
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.ended = False
+
+    def end(self, **attributes):
+        if self.ended:
+            return
+        self.ended = True
+        self.attributes.update(attributes)
+        self.tracer.emit(self.name, self.context.trace_id, self.context.span_id, self.parent_id,
+                         self.start, time.time_ns(), self.attributes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.end()
+        return False
+
+
+class _NoSpan:
+    """Stand-in for untraced work: no context, records nothing."""
+
+    context = None
+
+    def end(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Records spans of one service to a JSON lines file.
+
+    Args:
+        service (str): service.name attribute of the spans.
+        path (str): File the spans are appended to; empty disables tracing.
+        sample_rate (float): Share of new traces recorded (start_trace).
+        flush_interval (float): Seconds between writes.
+        max_buffered (int): Spans kept while waiting to be written; more are dropped.
+        max_file_bytes (int): The file is rotated to <path>.1 past this size.
+    """
+
+    def __init__(self, service, path, sample_rate=1.0, flush_interval=1.0,
+                 max_buffered=10000, max_file_bytes=50 * 1024 * 1024):
+        self.service = service
+        self.path = path
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_file_bytes = max_file_bytes
+        self.enabled = bool(path) and sample_rate > 0
+        self._buffer = []
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background writer; what is still buffered is written at exit."""
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def start_trace(self):
+        """Context of a new trace, or None when tracing is off or the trace is not sampled."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        return TraceContext(f'{random.getrandbits(128):032x}')
+
+    def from_headers(self, headers):
+        """Context carried by a message's AMQP headers, or None."""
+        if not self.enabled or not headers or TRACE_ID_HEADER not in headers:
+            return None
+        hops = [[_text(stage), int(at)] for stage, at in headers.get(TRACE_HOPS_HEADER) or []]
+        return TraceContext(_text(headers[TRACE_ID_HEADER]), _text(headers.get(TRACE_PARENT_HEADER)), hops)
+
+    def inject(self, context, headers, stage):
+        """Add the trace headers to an outgoing message and record the hop."""
+        if context is None:
+            return headers
+        headers[TRACE_ID_HEADER] = context.trace_id
+        if context.span_id:
+            headers[TRACE_PARENT_HEADER] = context.span_id
+        headers[TRACE_HOPS_HEADER] = [*context.hops, [stage, time.time_ns() // 1000000]]
+        return headers
+
+    def start_span(self, name, parent, **attributes):
+        """Start a span under `parent` (a TraceContext); a no-op span when parent is None."""
+        if parent is None:
+            return _NO_SPAN
+        return Span(self, name, parent, attributes)
+
+    def record_since_hop(self, name, context, hop=-1, **attributes):
+        """
+        Record a span from a hop's publish time until now: the last hop
+        (hop=-1) gives the time spent in the queue, the first (hop=0) the
+        latency of the trace so far.
+        """
+        if context is None or not context.hops:
+            return
+        stage, at = context.hops[hop]
+        attributes['hop'] = stage
+        self.emit(name, context.trace_id, f'{random.getrandbits(64):016x}', context.span_id,
+                  at * 1000000, time.time_ns(), attributes)
+
+    def emit(self, name, trace_id, span_id, parent_id, start_ns, end_ns, attributes):
+        record = {
+            'traceId': trace_id,
+            'spanId': span_id,
+            'parentSpanId': parent_id or '',
+            'name': name,
+            'startTimeUnixNano': start_ns,
+            'endTimeUnixNano': end_ns,
+            'attributes': {'service.name': self.service, **attributes}
+        }
+        with self._lock:
+            if len(self._buffer) >= self.max_buffered:
+                self._dropped += 1
+                return
+            self._buffer.append(record)
+
+    def flush(self):
+        """Write the buffered spans (also called on shutdown)."""
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            logger.warning(f"Dropped {dropped} spans: trace buffer full")
+        if not records:
+            return
+        lines = ''.join(json.dumps(r, default=str) + '\n' for r in records)
+        with self._write_lock:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_file_bytes:
+                    os.replace(self.path, self.path + '.1')
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            except OSError as e:
+                logger.error(f"Cannot write spans to {self.path}: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(paths, minutes=None):
+    """
+    Latency distribution per stage from span files.
+
+    Stages are ordered by when they end on average, relative to the start
+    of their trace, so the output follows the path of a reading.
+
+    Returns:
+        list of dict: {stage, service, count, p50_ms, p90_ms, p99_ms, max_ms}
+    """
+    cutoff = (time.time() - minutes * 60) * 1e9 if minutes else None
+    durations = {}      # (service, name) -> [ms]
+    offsets = {}        # (service, name) -> [ms from trace start to span end]
+    traces = {}         # trace id -> earliest start
+    spans = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                    start, end = int(span['startTimeUnixNano']), int(span['endTimeUnixNano'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if cutoff is not None and end < cutoff:
+                    continue
+                spans.append((span, start, end))
+                trace_id = span.get('traceId')
+                traces[trace_id] = min(start, traces.get(trace_id, start))
+
+    for span, start, end in spans:
+        key = ((span.get('attributes') or {}).get('service.name', ''), span.get('name', ''))
+        durations.setdefault(key, []).append((end - start) / 1e6)
+        offsets.setdefault(key, []).append((end - traces[span.get('traceId')]) / 1e6)
+
+    rows = []
+    for key, values in durations.items():
+        values.sort()
+        rows.append({
+            'service': key[0],
+            'stage': key[1],
+            'count': len(values),
+            'p50_ms': _percentile(values, 0.5),
+            'p90_ms': _percentile(values, 0.9),
+            'p99_ms': _percentile(values, 0.99),
+            'max_ms': values[-1],
+            'offset_ms': sum(offsets[key]) / len(offsets[key])
+        })
+    rows.sort(key=lambda r: r['offset_ms'])
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise recorded trace spans")
+    parser.add_argument('command', choices=['summary'])
+    parser.add_argument('files', nargs='+', help="span files of one or more services")
+    parser.add_argument('--minutes', type=float, help="only spans that ended in the last N minutes")
+    parser.add_argument('--json', action='store_true', help="print the rows as JSON")
+    args = parser.parse_args()
+
+    rows = summarize(args.files, args.minutes)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"{'service':<22} {'stage':<30} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for r in rows:
+            print(f"{r['service']:<22} {r['stage']:<30} {r['count']:>7} {r['p50_ms']:>9.1f} "
+                  f"{r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
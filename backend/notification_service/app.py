@@ -1,20 +1,31 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from flask import Flask, jsonify, request
+# First, so startup timing covers every other import
+import startup
+
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
-import pika
 import json
+import math
 import threading
 import time
 import os
 import logging
 from datetime import datetime, timedelta, timezone
-import pymongo
-from bson.json_util import dumps
-from bson.objectid import ObjectId
 import config
+import metrics
+import routing
+import shutdown
+import tracing
+import wire_format
+import anomaly_store
+from live_feed import LiveFeed
+from latest_values import LatestValues
+
+# pika, pymongo and bson are imported where they are first used, so the
+# HTTP server is up before they load
 
 # Initialize Flask application
 app = Flask(__name__)
@@ -28,9 +39,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Incremental feed of processed readings for dashboards
+live_feed = LiveFeed(
+    socketio,
+    namespace='/notifications',
+    flush_interval=config.LIVE_FEED_FLUSH_INTERVAL,
+    buffer_size=config.LIVE_FEED_BUFFER_SIZE
+)
+
+# Latest value per station and pollutant, fed by the same stream
+latest_values = LatestValues(
+    max_stations=config.LATEST_MAX_STATIONS,
+    cell_degrees=config.LATEST_GRID_DEGREES,
+    on_evict=metrics.LATEST_EVICTIONS.inc
+)
+
 # Function to get MongoDB client
 def get_mongodb_client():
     try:
+        import pymongo
         client = pymongo.MongoClient(
             host=config.MONGODB_HOST,
             port=config.MONGODB_PORT,
@@ -45,6 +72,7 @@ def get_mongodb_client():
 # Function to get RabbitMQ connection
 def get_rabbitmq_connection():
     try:
+        import pika
         credentials = pika.PlainCredentials(
             config.RABBITMQ_USER,
             config.RABBITMQ_PASS
@@ -61,65 +89,273 @@ def get_rabbitmq_connection():
         logger.error(f"RabbitMQ connection error: {e}")
         return None
 
+# Dependency status for /ready: consumers report their queues, MongoDB is probed
+_readiness_client = None
+
+def probe_mongodb():
+    global _readiness_client
+    if _readiness_client is None:
+        import pymongo
+        _readiness_client = pymongo.MongoClient(
+            host=config.MONGODB_HOST,
+            port=config.MONGODB_PORT,
+            username=config.MONGODB_USER,
+            password=config.MONGODB_PASS,
+            serverSelectionTimeoutMS=int(config.READY_PROBE_TIMEOUT * 1000),
+            connectTimeoutMS=int(config.READY_PROBE_TIMEOUT * 1000)
+        )
+    _readiness_client.admin.command('ping')
+
+def on_dependency_change(name, up):
+    metrics.DEPENDENCY_UP.labels(dependency=name).set(1 if up else 0)
+    if up:
+        logger.info(f"Dependency up: {name}")
+    else:
+        logger.warning(f"Dependency down: {name}")
+
+def on_ready(seconds):
+    metrics.STARTUP_SECONDS.labels(phase='ready').set(seconds)
+    logger.info(f"Ready {seconds:.2f}s after start")
+
+readiness = startup.Readiness(
+    probes={'mongodb': probe_mongodb},
+    reported=('anomaly_queue', 'live_feed'),
+    probe_ttl=config.READY_PROBE_TTL,
+    on_change=on_dependency_change,
+    on_ready=on_ready
+)
+
+# Signal-aware drain of the consumers (see shutdown.py)
+graceful_shutdown = shutdown.GracefulShutdown(config.SHUTDOWN_TIMEOUT)
+
+def _mark_not_ready():
+    for name in ('anomaly_queue', 'live_feed'):
+        readiness.report(name, False, 'shutting down')
+
+graceful_shutdown.on_request(_mark_not_ready)
+# Send readings still waiting for the next flush interval to connected clients
+graceful_shutdown.add_hook('live_feed_flush', lambda: live_feed.flush())
+
+# Spans of traced anomalies (context from the processor's AMQP headers)
+tracer = tracing.Tracer(
+    service='notification-service',
+    path=config.TRACE_FILE,
+    flush_interval=config.TRACE_FLUSH_INTERVAL
+)
+graceful_shutdown.add_hook('trace_flush', tracer.flush)
+
 # Broadcast anomaly notifications over WebSocket
-def broadcast_anomaly(anomaly_data):
+def broadcast_anomaly(anomaly_data, trace=None):
     try:
-        socketio.emit('anomaly_alert', anomaly_data, namespace='/notifications')
+        with metrics.timed(metrics.EMIT_LATENCY), tracer.start_span('notification.broadcast', trace):
+            socketio.emit('anomaly_alert', anomaly_data, namespace='/notifications')
         logger.info(f"Anomaly notification broadcasted: {anomaly_data.get('anomaly_info', {}).get('type')}")
     except Exception as e:
         logger.error(f"WebSocket broadcast error: {e}")
 
 # Consume anomaly queue and process messages
 def consume_anomaly_queue():
-    while True:
+    backoff = startup.Backoff(config.RETRY_INITIAL_DELAY, config.RETRY_MAX_DELAY)
+    stop = graceful_shutdown.event
+    lane_queues = {routing.URGENT: config.ANOMALY_PRIORITY_QUEUE, routing.ROUTINE: config.ANOMALY_QUEUE}
+    lane_prefetch = {routing.URGENT: config.LANE_PREFETCH_URGENT, routing.ROUTINE: config.LANE_PREFETCH_ROUTINE}
+    while not stop.is_set():
         try:
             connection = get_rabbitmq_connection()
             if not connection:
-                logger.error("Cannot connect to RabbitMQ. Retrying in 5 seconds...")
-                time.sleep(5)
+                readiness.report('anomaly_queue', False, 'RabbitMQ not available')
+                logger.error(f"Cannot connect to RabbitMQ. Retrying in {backoff.wait(stop):.1f} seconds...")
                 continue
 
             channel = connection.channel()
-            channel.queue_declare(queue=config.ANOMALY_QUEUE, durable=True)
+            # 'danger' anomalies have their own queue, bound for every region
+            routing.declare_exchange(channel, config.ANOMALY_EXCHANGE, config.ANOMALY_QUEUE)
+            routing.bind_lanes(channel, config.ANOMALY_EXCHANGE, routing.ANOMALIES, lane_queues, ['*'])
 
             def callback(ch, method, properties, body):
                 try:
-                    anomaly_data = json.loads(body)
+                    metrics.LANE_ANOMALIES.labels(lane=consumer_lanes.get(method.consumer_tag, routing.ROUTINE)).inc()
+                    metrics.observe_queue_lag(properties)
+                    anomaly_data = wire_format.decode_anomaly(body, properties.content_type)
                     logger.info(f"Received anomaly: {anomaly_data.get('anomaly_info', {}).get('type')}")
+                    trace = tracer.from_headers(properties.headers)
+                    tracer.record_since_hop('notification.queue_wait', trace)
+                    span = tracer.start_span('notification.anomaly', trace)
 
                     # Save anomaly to MongoDB
                     client = get_mongodb_client()
                     if client:
                         db = client[config.MONGODB_DB]
-                        db.anomalies.insert_one(anomaly_data)
+                        # Stored compact (reading reference, no message); the
+                        # WebSocket payload keeps the full anomaly
+                        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='anomaly_insert'), \
+                                tracer.start_span('notification.store', span.context):
+                            db.anomalies.insert_one(anomaly_store.compact(anomaly_data))
                         client.close()
 
                     # Broadcast via WebSocket
-                    broadcast_anomaly(anomaly_data)
+                    broadcast_anomaly(anomaly_data, span.context)
+                    span.end()
+                    # From the collector's publish to the broadcast
+                    tracer.record_since_hop('end_to_end', span.context, hop=0)
 
                     # Acknowledge message
                     ch.basic_ack(delivery_tag=method.delivery_tag)
+                    metrics.ANOMALIES_CONSUMED.labels(status='success').inc()
                 except Exception as e:
                     logger.error(f"Error processing anomaly: {e}")
                     ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                    metrics.ANOMALIES_CONSUMED.labels(status='error').inc()
 
-            channel.basic_qos(prefetch_count=1)
-            channel.basic_consume(queue=config.ANOMALY_QUEUE, on_message_callback=callback)
+            # Urgent lane first and with a larger prefetch window, so alerts are not queued behind warnings
+            consumer_lanes = routing.consume_lanes(channel, lane_queues, lane_prefetch, callback)
             logger.info("Listening for anomalies on RabbitMQ...")
+            backoff.reset()
+            readiness.report('anomaly_queue', True)
+            graceful_shutdown.consuming('anomaly_queue', connection, channel)
+            # Returns once shutdown stops the consumer, after the in-flight message is handled
             channel.start_consuming()
+            channel.close()
+            connection.close()
+            graceful_shutdown.stopped('anomaly_queue')
+            logger.info("Consumer anomaly_queue stopped")
 
         except Exception as e:
-            logger.error(f"Anomaly consumer error: {e}")
-            time.sleep(5)
+            graceful_shutdown.stopped('anomaly_queue')
+            if stop.is_set():
+                logger.error(f"Anomaly consumer error while stopping: {e}")
+                break
+            readiness.report('anomaly_queue', False, e)
+            logger.error(f"Anomaly consumer error: {e}. Retrying in {backoff.wait(stop):.1f} seconds...")
+
+# Consume processed readings for the live feed
+def consume_processed_readings():
+    backoff = startup.Backoff(config.RETRY_INITIAL_DELAY, config.RETRY_MAX_DELAY)
+    stop = graceful_shutdown.event
+    while not stop.is_set():
+        try:
+            connection = get_rabbitmq_connection()
+            if not connection:
+                readiness.report('live_feed', False, 'RabbitMQ not available')
+                logger.error(f"Cannot connect to RabbitMQ. Retrying in {backoff.wait(stop):.1f} seconds...")
+                continue
+
+            channel = connection.channel()
+            channel.exchange_declare(exchange=config.PROCESSED_READINGS_EXCHANGE, exchange_type='fanout', durable=True)
+            # Private queue per instance: a restarted instance resyncs clients anyway
+            result = channel.queue_declare(queue='', exclusive=True)
+            channel.queue_bind(exchange=config.PROCESSED_READINGS_EXCHANGE, queue=result.method.queue)
+
+            def callback(ch, method, properties, body):
+                try:
+                    readings = wire_format.decode_readings(body, properties.content_type)
+                    metrics.LIVE_FEED_READINGS.inc(len(readings))
+                    for reading in readings:
+                        live_feed.add(reading)
+                        latest_values.update(reading)
+                    metrics.LATEST_STATIONS.set(len(latest_values))
+                except Exception as e:
+                    logger.error(f"Error handling processed readings: {e}")
+
+            channel.basic_consume(queue=result.method.queue, on_message_callback=callback, auto_ack=True)
+            logger.info("Listening for processed readings on RabbitMQ...")
+            backoff.reset()
+            readiness.report('live_feed', True)
+            graceful_shutdown.consuming('live_feed', connection, channel)
+            # Returns once shutdown stops the consumer, after the in-flight message is handled
+            channel.start_consuming()
+            channel.close()
+            connection.close()
+            graceful_shutdown.stopped('live_feed')
+            logger.info("Consumer live_feed stopped")
+
+        except Exception as e:
+            graceful_shutdown.stopped('live_feed')
+            if stop.is_set():
+                logger.error(f"Processed readings consumer error while stopping: {e}")
+                break
+            readiness.report('live_feed', False, e)
+            logger.error(f"Processed readings consumer error: {e}. Retrying in {backoff.wait(stop):.1f} seconds...")
+
+# Fill the latest-value table from recent history after a restart
+def warm_latest_values():
+    backoff = startup.Backoff(config.RETRY_INITIAL_DELAY, config.RETRY_MAX_DELAY)
+    stop = graceful_shutdown.event
+    while not stop.is_set():
+        try:
+            client = get_mongodb_client()
+            with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='latest_warm_aggregate'):
+                loaded = latest_values.warm(client[config.MONGODB_DB].pollution_data, config.LATEST_WARM_HOURS)
+            client.close()
+            metrics.LATEST_STATIONS.set(len(latest_values))
+            logger.info(f"Latest values warmed: {loaded} values, {len(latest_values)} stations")
+            return
+        except Exception as e:
+            logger.error(f"Latest values warm-up error: {e}. Retrying in {backoff.wait(stop):.1f} seconds...")
 
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok", "service": "notification-service"}), 200
 
+# Readiness endpoint
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    ready, dependencies = readiness.check()
+    return jsonify({
+        "status": "ready" if ready else "not_ready",
+        "service": "notification-service",
+        "dependencies": dependencies,
+        "startup": {
+            "imports_seconds": round(imports_seconds, 3),
+            "ready_seconds": round(readiness.ready_after, 3) if readiness.ready_after is not None else None
+        }
+    }), 200 if ready else 503
+
+# Prometheus metrics endpoint
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    payload, content_type = metrics.render_metrics()
+    return Response(payload, mimetype=content_type)
+
+# Latest value per station, from memory
+@app.route('/api/v1/pollution/latest', methods=['GET'])
+def get_latest_values():
+    """
+    Query parameters: min_lat, min_lon, max_lat, max_lon (bounding box, all
+    four or none), parameter (one pollutant), since (ISO timestamp).
+    """
+    try:
+        bounds = [request.args.get(name) for name in ('min_lat', 'min_lon', 'max_lat', 'max_lon')]
+        bbox = None
+        if any(bounds):
+            if not all(bounds):
+                return jsonify({"status": "error", "message": "Bounding box needs min_lat, min_lon, max_lat and max_lon"}), 400
+            bbox = tuple(float(b) for b in bounds)
+            if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                return jsonify({"status": "error", "message": "Bounding box minimum exceeds maximum"}), 400
+    except ValueError:
+        return jsonify({"status": "error", "message": "Bounding box values must be numeric"}), 400
+
+    with metrics.timed(metrics.LATEST_QUERY_LATENCY):
+        data = latest_values.snapshot(
+            bbox=bbox,
+            parameter=request.args.get('parameter'),
+            since=request.args.get('since')
+        )
+    return jsonify({
+        "status": "success",
+        "data": data,
+        "count": len(data),
+        # False until recent history has been loaded after a restart
+        "warm": latest_values.warmed
+    }), 200
+
 # Retrieve pollution data with optional filters
 @app.route('/api/v1/pollution/data', methods=['GET'])
 def get_pollution_data():
+    import pymongo
+    from bson.json_util import dumps
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
@@ -157,11 +393,13 @@ def get_pollution_data():
         if parameter:
             query[f'parameters.{parameter}'] = {'$exists': True}
 
-        results = list(collection.find(query)
-                      .sort('timestamp', pymongo.DESCENDING)
-                      .skip(skip)
-                      .limit(limit))
-        total = collection.count_documents(query)
+        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='pollution_find'):
+            results = list(collection.find(query)
+                          .sort('timestamp', pymongo.DESCENDING)
+                          .skip(skip)
+                          .limit(limit))
+        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='pollution_count'):
+            total = collection.count_documents(query)
         json_data = json.loads(dumps(results))
         client.close()
 
@@ -178,6 +416,8 @@ def get_pollution_data():
 # Retrieve anomalies with optional filters
 @app.route('/api/v1/anomalies', methods=['GET'])
 def get_anomalies():
+    import pymongo
+    from bson.json_util import dumps
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
@@ -209,11 +449,16 @@ def get_anomalies():
         if parameter:
             query['anomaly_info.parameter'] = parameter
 
-        results = list(collection.find(query)
-                      .sort('timestamp', pymongo.DESCENDING)
-                      .skip(skip)
-                      .limit(limit))
-        total = collection.count_documents(query)
+        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='anomalies_find'):
+            results = list(collection.find(query)
+                          .sort('timestamp', pymongo.DESCENDING)
+                          .skip(skip)
+                          .limit(limit))
+        # Readings of the whole page in one $in query, messages rendered from the numeric fields
+        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='anomalies_readings_find'):
+            results = anomaly_store.expand(results, db.pollution_data)
+        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='anomalies_count'):
+            total = collection.count_documents(query)
         json_data = json.loads(dumps(results))
         client.close()
 
@@ -230,6 +475,7 @@ def get_anomalies():
 # Retrieve heatmap data for map visualization
 @app.route('/api/v1/heatmap', methods=['GET'])
 def get_heatmap_data():
+    from bson.json_util import dumps
     try:
         parameter = request.args.get('parameter', 'PM2.5')
         hours = int(request.args.get('hours', 24))
@@ -245,11 +491,12 @@ def get_heatmap_data():
 
         pipeline = [
             { '$match': { 'timestamp': { '$gte': start_time.isoformat(), '$lte': end_time.isoformat() }, f"parameters.{parameter}": {'$exists': True} } },
-            { '$group': { '_id': {'latitude': '$latitude', 'longitude': '$longitude'}, 'value': {'$avg': {'$toDouble': f"$parameters.{parameter}"}}, 'count': {'$sum': 1} } },
-            { '$project': { '_id': 0, 'latitude': '$_id.latitude', 'longitude': '$_id.longitude', 'value': 1, 'count': 1 } }
+            { '$group': { '_id': {'latitude': '$latitude', 'longitude': '$longitude'}, 'value': {'$avg': {'$toDouble': f"$parameters.{parameter}"}}, 'count': {'$sum': 1}, 'last': {'$max': '$timestamp'} } },
+            { '$project': { '_id': 0, 'latitude': '$_id.latitude', 'longitude': '$_id.longitude', 'value': 1, 'count': 1, 'last': 1 } }
         ]
 
-        results = list(collection.aggregate(pipeline))
+        with metrics.timed(metrics.MONGO_QUERY_LATENCY, operation='heatmap_aggregate'):
+            results = list(collection.aggregate(pipeline))
         json_data = json.loads(dumps(results))
         client.close()
 
@@ -267,19 +514,56 @@ def get_heatmap_data():
 # WebSocket event handlers
 @socketio.on('connect', namespace='/notifications')
 def handle_connect():
+    metrics.WEBSOCKET_CONNECTIONS.inc()
     logger.info(f"Client connected: {request.sid}")
+    # Position in the live feed, so a client that loads data over REST now can resume from here
+    emit('feed_status', {'token': live_feed.current_token()})
 
 @socketio.on('disconnect', namespace='/notifications')
 def handle_disconnect():
+    metrics.WEBSOCKET_CONNECTIONS.dec()
     logger.info(f"Client disconnected: {request.sid}")
 
+@socketio.on('resume', namespace='/notifications')
+def handle_resume(data):
+    """Replay live feed updates a reconnecting client missed."""
+    token = (data or {}).get('token')
+    if not live_feed.replay(token, lambda update: emit('pollution_update', update)):
+        metrics.LIVE_FEED_RESUMES.labels(outcome='resync').inc()
+        emit('resync_required', {'token': live_feed.current_token()})
+        return
+    metrics.LIVE_FEED_RESUMES.labels(outcome='replayed').inc()
+
+imports_seconds = startup.elapsed()
+metrics.STARTUP_SECONDS.labels(phase='imports').set(imports_seconds)
+
 # Main entry point
 if __name__ == '__main__':
+    logger.info(f"Modules loaded in {imports_seconds:.2f}s")
+
+    # Report time-to-ready once MongoDB and both consumers are up
+    readiness.start_waiting(config.RETRY_INITIAL_DELAY, config.RETRY_MAX_DELAY, graceful_shutdown.event)
+
+    # Drain the consumers on SIGTERM/SIGINT instead of dying mid-message
+    graceful_shutdown.install()
+
     # Start anomaly consumer thread
-    consumer_thread = threading.Thread(target=consume_anomaly_queue)
+    consumer_thread = threading.Thread(target=consume_anomaly_queue, name='anomaly-consumer')
     consumer_thread.daemon = True
     consumer_thread.start()
 
+    # Start live feed consumer and flusher
+    feed_thread = threading.Thread(target=consume_processed_readings, name='live-feed-consumer')
+    feed_thread.daemon = True
+    feed_thread.start()
+    live_feed.start()
+    tracer.start()
+
+    # Load recent latest values in the background; the stream keeps them current
+    warm_thread = threading.Thread(target=warm_latest_values, name='latest-values-warm')
+    warm_thread.daemon = True
+    warm_thread.start()
+
     # Run Flask-SocketIO server
     socketio.run(
         app,
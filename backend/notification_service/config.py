@@ -27,10 +27,48 @@ MONGODB_COLLECTION_ALERTS = 'alerts'
 ANOMALY_QUEUE = 'anomaly_notification_queue'
 USER_NOTIFICATION_QUEUE = 'user_notification_queue'
 
+# Anomalies arrive through ANOMALY_EXCHANGE in two lanes (see routing.py):
+# 'danger' ones in ANOMALY_PRIORITY_QUEUE, read with a larger prefetch window,
+# the rest in ANOMALY_QUEUE. Every instance binds both lanes for all regions, and
+# ANOMALY_QUEUE is also the exchange's fallback queue, drained as the routine lane.
+ANOMALY_EXCHANGE = os.environ.get('ANOMALY_EXCHANGE', 'anomaly_exchange')
+ANOMALY_PRIORITY_QUEUE = os.environ.get('ANOMALY_PRIORITY_QUEUE', 'anomaly_notification_priority_queue')
+LANE_PREFETCH_URGENT = int(os.environ.get('LANE_PREFETCH_URGENT', 10))
+LANE_PREFETCH_ROUTINE = int(os.environ.get('LANE_PREFETCH_ROUTINE', 1))
+# Fanout exchange the processor publishes stored readings to
+PROCESSED_READINGS_EXCHANGE = os.environ.get('PROCESSED_READINGS_EXCHANGE', 'processed_readings_exchange')
+
+# Live feed settings
+LIVE_FEED_FLUSH_INTERVAL = float(os.environ.get('LIVE_FEED_FLUSH_INTERVAL', 0.5))  # saniye
+LIVE_FEED_BUFFER_SIZE = int(os.environ.get('LIVE_FEED_BUFFER_SIZE', 1200))  # updates kept for resume
+
 # Notification settings
 NOTIFICATION_RETENTION_DAYS = 7
 ALERT_SEVERITY_LEVELS = ['INFO', 'WARNING', 'DANGER', 'CRITICAL']
 
 # WebSocket configuration
 WS_PING_INTERVAL = 30  # saniye
-WS_PING_TIMEOUT = 10   # saniye
\ No newline at end of file
+WS_PING_TIMEOUT = 10   # saniye
+
+# Latest value per station (see latest_values.py)
+LATEST_MAX_STATIONS = int(os.environ.get('LATEST_MAX_STATIONS', 100000))
+# Cell size (degrees) of the bounding-box index
+LATEST_GRID_DEGREES = float(os.environ.get('LATEST_GRID_DEGREES', 0.5))
+# History loaded into the table at startup
+LATEST_WARM_HOURS = float(os.environ.get('LATEST_WARM_HOURS', 24))
+
+# Reconnect backoff (seconds): jittered, doubling from the initial delay up to the maximum
+RETRY_INITIAL_DELAY = float(os.environ.get('RETRY_INITIAL_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 30))
+# Readiness probes: seconds a result is reused, and the connect timeout of a probe
+READY_PROBE_TTL = float(os.environ.get('READY_PROBE_TTL', 5))
+READY_PROBE_TIMEOUT = float(os.environ.get('READY_PROBE_TIMEOUT', 2))
+
+# Graceful shutdown: seconds to finish in-flight messages after SIGTERM;
+# keep below the container's stop_grace_period
+SHUTDOWN_TIMEOUT = float(os.environ.get('SHUTDOWN_TIMEOUT', 25))
+
+# Tracing (see tracing.py): spans of anomalies traced by the collector are
+# appended to TRACE_FILE (empty disables tracing)
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+TRACE_FLUSH_INTERVAL = float(os.environ.get('TRACE_FLUSH_INTERVAL', 1.0))
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Latest value of every pollutant at every station, kept in memory.
+
+"What is the current value at each station" is the map's most common
+question. Answering it from MongoDB means sorting pollution_data by
+timestamp; here the answer is maintained as readings arrive from the
+processor's fanout exchange (the same stream as the live feed):
+
+    station_id -> {latitude, longitude, parameters: {pollutant: {value, timestamp}}}
+
+Each pollutant keeps the value of its newest reading, so late or replayed
+readings do not overwrite fresher ones. Stations are kept in LRU order of
+their last update and the least recently updated are evicted past
+LATEST_MAX_STATIONS, which drops stations that stopped reporting.
+
+A grid index (cells of LATEST_GRID_DEGREES) maps cells to stations, so a
+bounding-box query only looks at the stations of the cells it overlaps.
+
+The table is empty after a restart; warm() fills it from the last
+LATEST_WARM_HOURS of pollution_data in one aggregation, while new readings
+keep arriving from the stream.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def station_key(reading):
+    """Station id of a reading; untagged readings get the id of their 0.01° box (as station_registry.station_id)."""
+    if reading.get('station_id'):
+        return reading['station_id']
+    return f"stn:{round(float(reading['latitude']), 2):.2f}:{round(float(reading['longitude']), 2):.2f}"
+
+
+class LatestValues:
+    """
+    Per-station latest values with LRU eviction and a grid index.
+
+    Args:
+        max_stations (int): Stations kept; least recently updated are evicted.
+        cell_degrees (float): Grid cell size of the bounding-box index.
+        on_evict (callable, optional): on_evict(count) after evictions.
+    """
+
+    def __init__(self, max_stations, cell_degrees, on_evict=None):
+        self.max_stations = max_stations
+        self.cell_degrees = cell_degrees
+        self.on_evict = on_evict
+        self.warmed = False
+        self._stations = OrderedDict()   # station_id -> entry
+        self._grid = {}                  # cell -> set of station_ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._stations)
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def update(self, reading):
+        """Record the pollutant values of a processed reading."""
+        try:
+            sid = station_key(reading)
+            latitude = float(reading['latitude'])
+            longitude = float(reading['longitude'])
+            timestamp = reading['timestamp']
+        except (KeyError, TypeError, ValueError):
+            return
+        values = {}
+        for pollutant, raw_value in (reading.get('parameters') or {}).items():
+            try:
+                values[pollutant] = float(raw_value)
+            except (TypeError, ValueError):
+                continue
+        if not values:
+            return
+
+        evicted = 0
+        with self._lock:
+            entry = self._stations.get(sid)
+            if entry is None:
+                entry = {'station_id': sid, 'latitude': latitude, 'longitude': longitude, 'parameters': {}}
+                self._stations[sid] = entry
+                self._grid.setdefault(self._cell(latitude, longitude), set()).add(sid)
+            else:
+                self._stations.move_to_end(sid)
+
+            parameters = entry['parameters']
+            for pollutant, value in values.items():
+                current = parameters.get(pollutant)
+                if current is None or timestamp >= current['timestamp']:
+                    parameters[pollutant] = {'value': value, 'timestamp': timestamp}
+
+            while len(self._stations) > self.max_stations:
+                old_sid, old = self._stations.popitem(last=False)
+                cell = self._cell(old['latitude'], old['longitude'])
+                members = self._grid.get(cell)
+                if members is not None:
+                    members.discard(old_sid)
+                    if not members:
+                        del self._grid[cell]
+                evicted += 1
+
+        if evicted and self.on_evict:
+            self.on_evict(evicted)
+
+    def _candidates(self, bbox):
+        """Station ids that may lie in bbox (min_lat, min_lon, max_lat, max_lon). Call with the lock held."""
+        if bbox is None:
+            return self._stations.keys()
+        min_lat, min_lon, max_lat, max_lon = bbox
+        (row0, col0), (row1, col1) = self._cell(min_lat, min_lon), self._cell(max_lat, max_lon)
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > len(self._grid):
+            # Box larger than the populated area: walking the cells costs more than filtering
+            return self._stations.keys()
+        ids = []
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                ids.extend(self._grid.get((row, col), ()))
+        return ids
+
+    def snapshot(self, bbox=None, parameter=None, since=None):
+        """
+        Latest values, optionally filtered.
+
+        Args:
+            bbox (tuple, optional): (min_lat, min_lon, max_lat, max_lon).
+            parameter (str, optional): Only this pollutant (stations without it are left out).
+            since (str, optional): ISO timestamp; values of older readings are left out.
+
+        Returns:
+            list of dict: {station_id, latitude, longitude, parameters: {pollutant: {value, timestamp}}}
+        """
+        result = []
+        with self._lock:
+            for sid in self._candidates(bbox):
+                entry = self._stations[sid]
+                if bbox is not None:
+                    min_lat, min_lon, max_lat, max_lon = bbox
+                    if not (min_lat <= entry['latitude'] <= max_lat and min_lon <= entry['longitude'] <= max_lon):
+                        continue
+                parameters = entry['parameters']
+                if parameter is not None:
+                    parameters = {parameter: parameters[parameter]} if parameter in parameters else {}
+                if since is not None:
+                    parameters = {p: v for p, v in parameters.items() if v['timestamp'] >= since}
+                if not parameters:
+                    continue
+                result.append({
+                    'station_id': sid,
+                    'latitude': entry['latitude'],
+                    'longitude': entry['longitude'],
+                    # Copies: the stream keeps updating the entries after the lock is released
+                    'parameters': {p: dict(v) for p, v in parameters.items()}
+                })
+        return result
+
+    def warm(self, collection, hours):
+        """
+        Load the latest value per station and pollutant of the last `hours` from pollution_data.
+
+        Returns:
+            int: Station/pollutant values loaded.
+        """
+        since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+        pipeline = [
+            {'$match': {'timestamp': {'$gte': since}}},
+            {'$sort': {'timestamp': -1}},
+            {'$project': {
+                '_id': 0, 'station_id': 1, 'latitude': 1, 'longitude': 1, 'timestamp': 1,
+                'parameter': {'$objectToArray': '$parameters'}
+            }},
+            {'$unwind': '$parameter'},
+            {'$group': {
+                '_id': {
+                    'station': {'$ifNull': ['$station_id', {'latitude': '$latitude', 'longitude': '$longitude'}]},
+                    'parameter': '$parameter.k'
+                },
+                'station_id': {'$first': '$station_id'},
+                'latitude': {'$first': '$latitude'},
+                'longitude': {'$first': '$longitude'},
+                'timestamp': {'$first': '$timestamp'},
+                'value': {'$first': '$parameter.v'}
+            }}
+        ]
+        loaded = 0
+        for row in collection.aggregate(pipeline, allowDiskUse=True):
+            self.update({
+                'station_id': row.get('station_id'),
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+                'timestamp': row['timestamp'],
+                'parameters': {row['_id']['parameter']: row['value']}
+            })
+            loaded += 1
+        self.warmed = True
+        return loaded
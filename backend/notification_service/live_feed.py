@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Incremental live data feed for dashboards.
+
+Processed readings arrive from the processor's fanout exchange and are
+pushed to Socket.IO clients on /notifications as 'pollution_update' events,
+instead of every dashboard polling /api/v1/pollution/data and /api/v1/heatmap.
+
+Readings are coalesced for LIVE_FEED_FLUSH_INTERVAL seconds into one update:
+
+    {
+      "token": "<epoch>:<seq>",          # resume token for this update
+      "readings": [ ... ],                # new readings since the last update
+      "heatmap_delta": [                  # per cell and parameter, to add to the heatmap
+        {"latitude": .., "longitude": .., "parameter": "PM2.5", "sum": .., "count": ..,
+         "last": "<ISO8601>"}             # newest reading of the cell, to age it out
+      ]
+    }
+
+Updates are emitted in sequence order: one flush (or resume replay) sends
+at a time, so a client never sees seq N+1 before seq N.
+
+The last LIVE_FEED_BUFFER_SIZE updates are kept in memory. A reconnecting
+client sends 'resume' with the last token it saw and gets only the updates
+it missed, or 'resync_required' if they are no longer buffered (or the
+service restarted), in which case it reloads once over REST.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class LiveFeed:
+    """Buffers processed readings and emits them in sequenced batches."""
+
+    def __init__(self, socketio, namespace, flush_interval, buffer_size):
+        self.socketio = socketio
+        self.namespace = namespace
+        self.flush_interval = flush_interval
+        # Changes on every start so tokens from a previous process are rejected
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self._pending = []
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        # Held while sending, so updates go out in seq order (flusher thread,
+        # shutdown hook and resume replays may send concurrently)
+        self._emit_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background flusher."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='live-feed-flusher', daemon=True)
+            self._thread.start()
+
+    def add(self, reading):
+        """Queue a processed reading for the next update."""
+        with self._lock:
+            self._pending.append(reading)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Live feed flush error: {e}")
+
+    def flush(self):
+        """Emit pending readings as one update, if there are any."""
+        with self._emit_lock:
+            # add() only waits for the swap, not for the emit
+            with self._lock:
+                if not self._pending:
+                    return None
+                readings, self._pending = self._pending, []
+                self.seq += 1
+                update = {
+                    'token': f"{self.epoch}:{self.seq}",
+                    'readings': readings,
+                    'heatmap_delta': heatmap_delta(readings)
+                }
+                self._buffer.append((self.seq, update))
+
+            self.socketio.emit('pollution_update', update, namespace=self.namespace)
+        return update
+
+    def current_token(self):
+        with self._lock:
+            return f"{self.epoch}:{self.seq}"
+
+    def replay(self, token, send):
+        """
+        Send the updates a client missed since `token`, one send(update) each,
+        before any newer update goes out.
+
+        Returns:
+            bool: False if the client must resync over REST.
+        """
+        with self._emit_lock:
+            missed = self.missed_since(token)
+            if missed is None:
+                return False
+            for update in missed:
+                send(update)
+            return True
+
+    def missed_since(self, token):
+        """
+        Updates a client missed since `token`.
+
+        Returns:
+            list of dict, or None if the client must resync over REST.
+        """
+        try:
+            epoch, seq = token.split(':', 1)
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            return None
+        if epoch != self.epoch:
+            return None
+
+        with self._lock:
+            if seq >= self.seq:
+                return []
+            # Oldest buffered update must directly follow what the client has
+            if not self._buffer or self._buffer[0][0] > seq + 1:
+                return None
+            return [update for s, update in self._buffer if s > seq]
+
+
+def heatmap_delta(readings):
+    """
+    Sum new observations per (latitude, longitude, parameter), matching the
+    cells returned by /api/v1/heatmap, with the newest timestamp of each.
+    """
+    cells = {}
+    for reading in readings:
+        try:
+            lat = float(reading['latitude'])
+            lon = float(reading['longitude'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        timestamp = reading.get('timestamp')
+        for parameter, raw_value in (reading.get('parameters') or {}).items():
+            try:
+                value = float(raw_value)
+            except (TypeError, ValueError):
+                continue
+            cell = cells.setdefault((lat, lon, parameter), [0.0, 0, None])
+            cell[0] += value
+            cell[1] += 1
+            if isinstance(timestamp, str) and (cell[2] is None or timestamp > cell[2]):
+                cell[2] = timestamp
+    return [
+        {'latitude': lat, 'longitude': lon, 'parameter': parameter, 'sum': total, 'count': count, 'last': last}
+        for (lat, lon, parameter), (total, count, last) in cells.items()
+    ]
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Latency buckets (seconds) for emits and DB calls
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Queue lag can reach minutes when the service falls behind
+LAG_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+    5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0
+)
+
+# Currently connected Socket.IO clients on /notifications
+WEBSOCKET_CONNECTIONS = Gauge(
+    'notification_websocket_connections',
+    'Open WebSocket connections on the /notifications namespace'
+)
+
+# Time spent in socketio.emit() for one anomaly
+EMIT_LATENCY = Histogram(
+    'notification_emit_latency_seconds',
+    'Time to broadcast an anomaly over WebSocket',
+    buckets=LATENCY_BUCKETS
+)
+
+# Anomaly messages consumed from RabbitMQ, by outcome
+ANOMALIES_CONSUMED = Counter(
+    'notification_anomalies_consumed_total',
+    'Anomaly messages consumed from the anomaly queue',
+    ['status']
+)
+
+# Anomalies consumed per priority lane (see routing.py)
+LANE_ANOMALIES = Counter(
+    'notification_lane_anomalies_total',
+    'Anomaly messages consumed per lane',
+    ['lane']
+)
+
+# Time between the processor publishing an anomaly and this service receiving it
+QUEUE_LAG = Histogram(
+    'notification_queue_lag_seconds',
+    'Delay between publish and consumption of an anomaly',
+    buckets=LAG_BUCKETS
+)
+
+# MongoDB operation durations
+MONGO_QUERY_LATENCY = Histogram(
+    'notification_mongo_query_latency_seconds',
+    'Duration of MongoDB operations',
+    ['operation'],
+    buckets=LATENCY_BUCKETS
+)
+
+@contextmanager
+def timed(histogram, **labels):
+    """
+    Observe the wall time of a block on a histogram.
+
+    Args:
+        histogram (Histogram): Target metric.
+        **labels: Label values, if the metric is labelled.
+    """
+    target = histogram.labels(**labels) if labels else histogram
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        target.observe(time.perf_counter() - started)
+
+def observe_queue_lag(properties):
+    """
+    Record queue lag from the 'published_at' header set by the producer
+    (epoch milliseconds: pika cannot encode float header values).
+
+    Args:
+        properties (pika.BasicProperties): Properties of the consumed message.
+    """
+    headers = getattr(properties, 'headers', None) or {}
+    published_at = headers.get('published_at')
+    if published_at is None:
+        return
+    try:
+        QUEUE_LAG.observe(max(0.0, time.time() - int(published_at) / 1000))
+    except (TypeError, ValueError):
+        pass
+
+# Processed readings received for the live feed
+LIVE_FEED_READINGS = Counter(
+    'notification_live_feed_readings_total',
+    'Processed readings received for the live feed'
+)
+
+# Client resume attempts, by outcome
+LIVE_FEED_RESUMES = Counter(
+    'notification_live_feed_resumes_total',
+    'Live feed resume requests',
+    ['outcome']
+)
+
+# Stations in the in-memory latest-value table
+LATEST_STATIONS = Gauge(
+    'notification_latest_stations',
+    'Stations held in the latest-value table'
+)
+
+# Stations evicted from the latest-value table (least recently updated)
+LATEST_EVICTIONS = Counter(
+    'notification_latest_evictions_total',
+    'Stations evicted from the latest-value table'
+)
+
+# Time to build a /api/v1/pollution/latest snapshot
+LATEST_QUERY_LATENCY = Histogram(
+    'notification_latest_query_latency_seconds',
+    'Time to select latest values from memory',
+    buckets=LATENCY_BUCKETS
+)
+
+# Startup phases ('imports', 'ready'), in seconds since the service started loading
+STARTUP_SECONDS = Gauge(
+    'notification_startup_seconds',
+    'Time from the start of loading to each startup phase',
+    ['phase']
+)
+
+# Dependency reachability as last seen by readiness checks (1 up, 0 down)
+DEPENDENCY_UP = Gauge(
+    'notification_dependency_up',
+    'Whether a dependency is reachable',
+    ['dependency']
+)
+
+def render_metrics():
+    """
+    Render all registered metrics in the Prometheus text exposition format.
+
+    Returns:
+        tuple: (payload bytes, content type header value)
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
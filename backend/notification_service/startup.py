@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Startup timing, readiness and reconnect backoff shared by the services.
+# This file is kept identical in data_collector, data_processor and
+# notification_service.
+#
+# app.py imports this module before anything else, so STARTED marks the
+# beginning of module loading. Heavy libraries (pika, pymongo, NumPy,
+# pandas) are imported by the code paths that use them rather than at load
+# time; the service records how long its imports took and how long it took
+# until every dependency was reachable.
+#
+# /health answers as soon as the HTTP server runs (liveness). /ready answers
+# 200 only once every dependency is up (readiness): dependencies are either
+# reported by the threads that hold their connections (queue consumers) or
+# probed on request, with probe results cached for a few seconds.
+
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STARTED = time.monotonic()
+
+
+def elapsed():
+    """Seconds since the service started loading."""
+    return time.monotonic() - STARTED
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter for reconnect loops.
+
+    The n-th delay is drawn uniformly from [d/2, d] with
+    d = min(maximum, initial * 2**n), so instances restarted together do
+    not reconnect in lockstep.
+    """
+
+    def __init__(self, initial, maximum):
+        self.initial = initial
+        self.maximum = maximum
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.maximum, self.initial * (2 ** self.attempts))
+        self.attempts += 1
+        return random.uniform(delay / 2, delay)
+
+    def wait(self, stop=None):
+        """Sleep for the next delay and return it; a set `stop` event ends the sleep early."""
+        delay = self.next_delay()
+        if stop is not None:
+            stop.wait(delay)
+        else:
+            time.sleep(delay)
+        return delay
+
+    def reset(self):
+        self.attempts = 0
+
+
+class Readiness:
+    """
+    Dependency status of a service.
+
+    Args:
+        probes (dict): Dependency name -> callable raising on failure, run
+            by check() at most every `probe_ttl` seconds.
+        reported (iterable): Names of dependencies whose status is set by
+            other threads with report().
+        probe_ttl (float): Seconds a probe result is reused.
+        on_change (callable, optional): on_change(name, up) when a
+            dependency goes up or down.
+        on_ready (callable, optional): on_ready(seconds) the first time all
+            dependencies are up, with the time since STARTED.
+    """
+
+    def __init__(self, probes=None, reported=(), probe_ttl=5.0, on_change=None, on_ready=None):
+        self.probes = dict(probes or {})
+        self.probe_ttl = probe_ttl
+        self.on_change = on_change
+        self.on_ready = on_ready
+        self.ready_after = None
+        self._status = {name: {'up': False, 'error': 'not checked', 'checked_at': None}
+                        for name in (*self.probes, *reported)}
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    def report(self, name, up, error=None):
+        message = None
+        if not up:
+            # Some connection errors have an empty message; fall back to the type
+            message = (str(error) or type(error).__name__)[:200] if error is not None else 'down'
+        with self._lock:
+            status = self._status[name]
+            changed = status['up'] != up or status['checked_at'] is None
+            status.update(up=up, error=message, checked_at=time.monotonic())
+        if changed and self.on_change:
+            self.on_change(name, up)
+        if up:
+            self._check_ready()
+
+    def _run_probes(self):
+        # One caller probes at a time; concurrent callers use the cached results
+        if not self._probe_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            for name, probe in self.probes.items():
+                checked_at = self._status[name]['checked_at']
+                if checked_at is not None and now - checked_at < self.probe_ttl:
+                    continue
+                try:
+                    probe()
+                    self.report(name, True)
+                except Exception as e:
+                    self.report(name, False, e)
+        finally:
+            self._probe_lock.release()
+
+    def _check_ready(self):
+        with self._lock:
+            if self.ready_after is not None or not all(s['up'] for s in self._status.values()):
+                return
+            self.ready_after = elapsed()
+        if self.on_ready:
+            self.on_ready(self.ready_after)
+
+    def check(self):
+        """
+        Probe stale dependencies and return the current status.
+
+        Returns:
+            tuple: (ready, {name: {'up': bool, 'error': str or None}})
+        """
+        self._run_probes()
+        with self._lock:
+            dependencies = {name: {'up': s['up'], 'error': s['error']} for name, s in self._status.items()}
+        return all(d['up'] for d in dependencies.values()), dependencies
+
+    def wait_until_ready(self, initial_delay, max_delay, stop=None):
+        """Probe with backoff until every dependency is up or `stop` is set (call from a daemon thread)."""
+        backoff = Backoff(initial_delay, max_delay)
+        while stop is None or not stop.is_set():
+            ready, dependencies = self.check()
+            if ready:
+                return
+            down = ', '.join(name for name, d in dependencies.items() if not d['up'])
+            logger.info(f"Waiting for dependencies: {down}")
+            backoff.wait(stop)
+
+    def start_waiting(self, initial_delay, max_delay, stop=None):
+        thread = threading.Thread(
+            target=self.wait_until_ready,
+            args=(initial_delay, max_delay, stop),
+            name='readiness',
+            daemon=True
+        )
+        thread.start()
+        return thread
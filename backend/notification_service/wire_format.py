@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Message encoding shared by all services. This file is kept identical in
+# data_collector, data_processor and notification_service.
+#
+# Two encodings are accepted on the queues, selected by the AMQP content_type:
+#
+#   application/json              legacy text format (also assumed when unset)
+#   application/x-msgpack; v=2    compact binary format
+#
+# In the binary format a reading is a MessagePack array:
+#
+#   [latitude, longitude, timestamp, pollutant_mask, values, extras]
+#
+# where bit i of pollutant_mask is set when POLLUTANTS[i] is present, values
+# holds the present pollutants as little-endian float64 in bit order, and
+# extras is a map of any other top-level fields (or nil). Anomaly messages
+# are a map {'p': packed reading, 'a': anomaly_info, 't': timestamp}.
+#
+# Precision contract: coordinates and pollutant values must be int or float
+# (ints within 2**53) and decode as the float equal to them, so a reading
+# stored from either format holds the same numbers. Anything else (strings,
+# booleans, None, larger ints) is sent as JSON. Version 1 carried float32
+# values, rounded to 7 significant digits; it is still decoded so messages
+# queued before an upgrade are not lost.
+#
+# Bulk imports and retries publish many readings per message: a MessagePack
+# array of packed readings with content_type 'application/x-msgpack; v=2;
+# batch=1' (v=1 batches still decode), or a JSON list of readings.
+
+import json
+import struct
+
+import msgpack
+
+try:
+    from bson.objectid import ObjectId
+except ImportError:  # bson ships with pymongo; encoding works without it
+    ObjectId = None
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPE = 'application/x-msgpack'
+WIRE_VERSION = 2
+# Struct format of the packed values by version
+_VALUE_FORMATS = {1: 'f', 2: 'd'}
+# Largest int a float64 holds exactly
+_MAX_EXACT_INT = 2 ** 53
+
+# Bit order of the pollutant mask. Append only: reordering breaks old messages.
+POLLUTANTS = ('PM2.5', 'PM10', 'NO2', 'SO2', 'O3')
+POLLUTANT_BITS = {p: i for i, p in enumerate(POLLUTANTS)}
+
+_READING_KEYS = ('latitude', 'longitude', 'timestamp', 'parameters')
+
+
+def _default(obj):
+    """Serialize values neither encoder handles natively (e.g. Mongo _id)."""
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def _parse_content_type(content_type):
+    """Split 'type/subtype; k=v' into the media type and a dict of parameters."""
+    if not content_type:
+        return JSON_CONTENT_TYPE, {}
+    parts = [p.strip() for p in content_type.split(';')]
+    params = {}
+    for part in parts[1:]:
+        if '=' in part:
+            key, value = part.split('=', 1)
+            params[key.strip().lower()] = value.strip()
+    return parts[0].lower(), params
+
+
+def _msgpack_content_type(batch=False):
+    content_type = f"{MSGPACK_CONTENT_TYPE}; v={WIRE_VERSION}"
+    return f"{content_type}; batch=1" if batch else content_type
+
+
+def _msgpack_version(content_type):
+    """
+    Decide which decoder a message needs.
+
+    Returns:
+        int: Binary format version, or None for JSON.
+
+    Raises:
+        ValueError: On an unknown media type or binary format version.
+    """
+    media_type, params = _parse_content_type(content_type)
+    if media_type == JSON_CONTENT_TYPE:
+        return None
+    if media_type == MSGPACK_CONTENT_TYPE:
+        version = int(params.get('v', WIRE_VERSION))
+        if version not in _VALUE_FORMATS:
+            raise ValueError(f"Unsupported wire format version: {version}")
+        return version
+    raise ValueError(f"Unsupported content type: {content_type}")
+
+
+def _number(value):
+    """
+    A coordinate or pollutant value as the float it is sent as.
+
+    Raises:
+        ValueError: If the value would not decode equal to itself.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Value not representable in wire format: {value!r}")
+    if isinstance(value, int) and abs(value) > _MAX_EXACT_INT:
+        raise ValueError(f"Integer too large for wire format: {value}")
+    return float(value)
+
+
+def _is_batch(content_type):
+    return _parse_content_type(content_type)[1].get('batch') == '1'
+
+
+def pack_reading(reading):
+    """
+    Convert a reading dict to the compact array form.
+
+    Raises:
+        ValueError: If the reading has fields the compact form cannot carry
+            (unknown pollutants, or values outside the precision contract).
+    """
+    params = reading.get('parameters') or {}
+    mask = 0
+    for pollutant in params:
+        if pollutant not in POLLUTANT_BITS:
+            raise ValueError(f"Pollutant not representable in wire format: {pollutant}")
+        mask |= 1 << POLLUTANT_BITS[pollutant]
+
+    values = [_number(params[p]) for p in POLLUTANTS if mask & (1 << POLLUTANT_BITS[p])]
+    extras = {k: v for k, v in reading.items() if k not in _READING_KEYS}
+    return [
+        _number(reading['latitude']),
+        _number(reading['longitude']),
+        reading['timestamp'],
+        mask,
+        struct.pack(f'<{len(values)}{_VALUE_FORMATS[WIRE_VERSION]}', *values),
+        extras or None
+    ]
+
+
+def unpack_reading(packed, version=WIRE_VERSION):
+    """Convert the compact array form back to a reading dict."""
+    lat, lon, timestamp, mask, raw_values, extras = packed
+    present = [p for p in POLLUTANTS if mask & (1 << POLLUTANT_BITS[p])]
+    values = struct.unpack(f'<{len(present)}{_VALUE_FORMATS[version]}', raw_values)
+
+    reading = dict(extras or {})
+    reading['latitude'] = lat
+    reading['longitude'] = lon
+    reading['timestamp'] = timestamp
+    if version == 1:
+        # float32 keeps ~7 significant digits; print at that precision so a
+        # value sent as 12.34 decodes to 12.34 instead of 12.340000152587891
+        values = [float(f'{v:.7g}') for v in values]
+    reading['parameters'] = dict(zip(present, values))
+    return reading
+
+
+def encode_reading(reading, wire_format='json'):
+    """
+    Encode a reading for publishing.
+
+    Falls back to JSON when the reading cannot be packed.
+
+    Returns:
+        tuple: (body bytes, content_type string)
+    """
+    if wire_format == 'msgpack':
+        try:
+            body = msgpack.packb(pack_reading(reading), default=_default, use_bin_type=True)
+            return body, _msgpack_content_type()
+        except (ValueError, TypeError, KeyError, struct.error):
+            pass
+    return json.dumps(reading, default=_default).encode('utf-8'), JSON_CONTENT_TYPE
+
+
+def decode_reading(body, content_type=None):
+    """
+    Decode a reading published in either format.
+
+    Raises:
+        ValueError: On an unsupported content type or version.
+    """
+    version = _msgpack_version(content_type)
+    if version is not None:
+        return unpack_reading(msgpack.unpackb(body, raw=False), version)
+    return json.loads(body)
+
+
+def encode_reading_batch(readings, wire_format='json'):
+    """
+    Encode many readings into a single message.
+
+    Returns:
+        tuple: (body bytes, content_type string)
+    """
+    if wire_format == 'msgpack':
+        try:
+            packed = [pack_reading(r) for r in readings]
+            body = msgpack.packb(packed, default=_default, use_bin_type=True)
+            return body, _msgpack_content_type(batch=True)
+        except (ValueError, TypeError, KeyError, struct.error):
+            pass
+    return json.dumps(list(readings), default=_default).encode('utf-8'), JSON_CONTENT_TYPE
+
+
+def decode_readings(body, content_type=None):
+    """
+    Decode a single-reading or batch message into a list of readings.
+
+    Raises:
+        ValueError: On an unsupported content type or version.
+    """
+    version = _msgpack_version(content_type)
+    if version is not None:
+        packed = msgpack.unpackb(body, raw=False)
+        if _is_batch(content_type):
+            return [unpack_reading(p, version) for p in packed]
+        return [unpack_reading(packed, version)]
+    decoded = json.loads(body)
+    return decoded if isinstance(decoded, list) else [decoded]
+
+
+def encode_anomaly(anomaly_data, wire_format='json'):
+    """
+    Encode an anomaly notification ({'pollution_data', 'anomaly_info', 'timestamp'}).
+
+    Returns:
+        tuple: (body bytes, content_type string)
+    """
+    if wire_format == 'msgpack':
+        try:
+            packed = {
+                'p': pack_reading(anomaly_data['pollution_data']),
+                'a': anomaly_data['anomaly_info'],
+                't': anomaly_data.get('timestamp')
+            }
+            body = msgpack.packb(packed, default=_default, use_bin_type=True)
+            return body, _msgpack_content_type()
+        except (ValueError, TypeError, KeyError, struct.error):
+            pass
+    return json.dumps(anomaly_data, default=_default).encode('utf-8'), JSON_CONTENT_TYPE
+
+
+def decode_anomaly(body, content_type=None):
+    """
+    Decode an anomaly notification published in either format.
+
+    Raises:
+        ValueError: On an unsupported content type or version.
+    """
+    version = _msgpack_version(content_type)
+    if version is not None:
+        packed = msgpack.unpackb(body, raw=False)
+        return {
+            'pollution_data': unpack_reading(packed['p'], version),
+            'anomaly_info': packed['a'],
+            'timestamp': packed['t']
+        }
+    return json.loads(body)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for data_collector/admission.py: token buckets, the per-sensor
+limiter and the admission checks, with the queue depth monitor stubbed out.
+
+    pip install prometheus_client pytest
+    pytest backend/tests
+"""
+
+import pytest
+
+from service_modules import load
+
+admission = load('data_collector', 'admission')
+config = load('data_collector', 'config')
+
+
+class Clock:
+    """Stands in for time.monotonic() in admission."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(config, 'ADMISSION_CONTROL_ENABLED', True)
+    monkeypatch.setattr(config, 'MAX_IN_FLIGHT_PUBLISHES', 2)
+    monkeypatch.setattr(config, 'QUEUE_DEPTH_LIMIT', 100)
+    monkeypatch.setattr(config, 'SENSOR_RATE_PER_SECOND', 1.0)
+    monkeypatch.setattr(config, 'SENSOR_BURST', 2)
+    controller = admission.AdmissionController()
+    # No broker: the monitor reports whatever the test sets
+    controller.monitor.ensure_started = lambda: None
+    controller.monitor.depth = 0
+    return controller
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = admission.TokenBucket(rate=2.0, capacity=3)
+    now = bucket.updated
+    assert [bucket.try_acquire(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire(now) == pytest.approx(0.5)
+    assert bucket.try_acquire(now + 0.5) == 0.0
+
+
+def test_token_bucket_caps_at_capacity_and_refund():
+    bucket = admission.TokenBucket(rate=1.0, capacity=2)
+    now = bucket.updated + 3600
+    assert bucket.try_acquire(now, tokens=2) == 0.0
+    assert bucket.try_acquire(now) > 0
+    bucket.refund()
+    assert bucket.try_acquire(now) == 0.0
+    bucket.refund(tokens=10)
+    assert bucket.tokens == 2
+
+
+def test_sensor_limiter_is_per_sensor(clock):
+    limiter = admission.SensorRateLimiter(rate=1.0, burst=1, max_sensors=10)
+    assert limiter.check('a') == 0
+    assert limiter.check('a') == pytest.approx(1.0)
+    assert limiter.check('b') == 0
+    clock.now += 1.0
+    assert limiter.check('a') == 0
+
+
+def test_sensor_limiter_evicts_least_recently_used(clock):
+    limiter = admission.SensorRateLimiter(rate=1.0, burst=1, max_sensors=2)
+    limiter.check('a')
+    limiter.check('b')
+    limiter.check('a')          # 'b' is now the least recently used
+    limiter.check('c')
+    assert list(limiter._buckets) == ['a', 'c']
+    # An evicted sensor starts over with a full bucket
+    assert limiter.check('b') == 0
+
+
+@pytest.mark.parametrize('data,key', [
+    ({'sensor_id': 'dev-7', 'latitude': 41.0, 'longitude': 29.0}, 'dev-7'),
+    ({'latitude': 41.0082, 'longitude': 28.9784}, '41.01:28.98'),
+    ({'latitude': 'x', 'longitude': 28.9}, 'unknown'),
+])
+def test_sensor_key(data, key):
+    assert admission.sensor_key(data) == key
+
+
+def test_rejection_rounds_retry_after_up():
+    assert admission.Rejection(503, 'r', 'm', 0.2).retry_after == 1
+    assert admission.Rejection(503, 'r', 'm', 2.1).retry_after == 3
+
+
+def test_queue_full_spares_urgent_readings(controller):
+    controller.monitor.depth = 100
+    rejection = controller.check_overload()
+    assert (rejection.status_code, rejection.reason) == (503, 'queue_full')
+    assert controller.check_overload(urgent=True) is None
+
+
+def test_broker_unavailable_and_blocked(controller, clock):
+    controller.monitor.available = False
+    assert controller.check_overload(urgent=True).reason == 'broker_unavailable'
+    controller.monitor.available = True
+    controller.broker_blocked(None, None)
+    assert controller.check_overload(urgent=True).reason == 'broker_blocked'
+    controller.broker_unblocked(None, None)
+    assert controller.check_overload() is None
+
+
+def test_in_flight_limit(controller):
+    assert controller.try_enter() is None
+    assert controller.try_enter() is None
+    assert controller.try_enter().reason == 'too_many_in_flight'
+    controller.leave()
+    assert controller.try_enter() is None
+
+
+def test_wait_enter_times_out_without_a_free_slot(controller):
+    controller.try_enter()
+    controller.try_enter()
+    assert controller.wait_enter(0.05).reason == 'too_many_in_flight'
+    controller.leave()
+    assert controller.wait_enter(0.05) is None
+
+
+def test_refund_sensor_gives_the_token_back(controller, clock):
+    data = {'sensor_id': 'dev-1'}
+    assert controller.check_sensor(data) is None
+    assert controller.check_sensor(data) is None
+    assert controller.check_sensor(data).status_code == 429
+    controller.refund_sensor(data)
+    assert controller.check_sensor(data) is None
+
+
+def test_disabled_controller_admits_everything(controller):
+    controller.enabled = False
+    controller.monitor.depth = 10 ** 6
+    assert controller.check_overload() is None
+    assert all(controller.try_enter() is None for _ in range(10))
+    assert all(controller.check_sensor({'sensor_id': 's'}) is None for _ in range(10))
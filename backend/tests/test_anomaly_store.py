@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for anomaly_store.py (kept identical in notification_service and
+data_processor): compacting anomalies, rendering them back and migrating
+old documents, against in-memory stand-ins for the collections.
+
+    pip install numpy pymongo pytest
+    pytest backend/tests
+"""
+
+import os
+
+from bson.objectid import ObjectId
+
+from service_modules import BACKEND_DIR, load
+
+anomaly_store = load('notification_service', 'anomaly_store')
+anomaly_detection = load('data_processor', 'anomaly_detection')
+baseline = load('data_processor', 'baseline')
+
+
+class Cursor(list):
+    def sort(self, key, direction):
+        return Cursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, n):
+        return Cursor(self[:n])
+
+
+class Collection:
+    """The part of a pymongo collection anomaly_store uses."""
+
+    def __init__(self, docs=()):
+        self.docs = {doc['_id']: dict(doc) for doc in docs}
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return Cursor(dict(doc) for doc in self.docs.values() if self._matches(doc, query))
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, condition in query.items():
+            if not isinstance(condition, dict):
+                if doc.get(field) != condition:
+                    return False
+            elif '$in' in condition and doc.get(field) not in condition['$in']:
+                return False
+            elif '$gt' in condition and not doc.get(field) > condition['$gt']:
+                return False
+            elif '$exists' in condition and (field in doc) != condition['$exists']:
+                return False
+        return True
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            doc = self.docs[request._filter['_id']]
+            doc.update(request._doc.get('$set', {}))
+            for field in request._doc.get('$unset', {}):
+                doc.pop(field, None)
+
+
+class Database:
+    def __init__(self, anomalies, pollution_data):
+        self.anomalies = anomalies
+        self.pollution_data = pollution_data
+
+
+def _reading(**extra):
+    return dict({'latitude': 41.0, 'longitude': 29.0, 'timestamp': '2025-06-01T12:00:00',
+                 'parameters': {'NO2': 80.0}}, **extra)
+
+
+def _threshold_anomaly(exposures=None):
+    [anomaly] = anomaly_detection.is_who_threshold_exceeded(_reading(), exposures)
+    return anomaly
+
+
+def test_copies_are_identical():
+    sources = set()
+    for service in ('notification_service', 'data_processor'):
+        with open(os.path.join(BACKEND_DIR, service, 'anomaly_store.py'), 'rb') as f:
+            sources.add(f.read())
+    assert len(sources) == 1, "anomaly_store.py differs between services"
+
+
+def test_rendered_messages_match_the_processor():
+    forecasts = {'NO2': baseline.Forecast(expected=20.0, std=5.0, samples=30)}
+    anomalies = [
+        _threshold_anomaly(),
+        _threshold_anomaly({'NO2': {'24h': 30.0}}),
+        *anomaly_detection.detect_forecast_anomalies(_reading(), forecasts),
+    ]
+    assert len(anomalies) == 3
+    for anomaly in anomalies:
+        assert anomaly_store.render_message(anomaly) == anomaly['message']
+        compacted = anomaly_store.compact_info(anomaly)
+        assert 'message' not in compacted
+        assert anomaly_store.render_info(compacted) == anomaly
+
+
+def test_custom_message_and_unknown_type_are_kept():
+    info = dict(_threshold_anomaly(), message='Custom text')
+    assert anomaly_store.compact_info(info)['message'] == 'Custom text'
+    assert anomaly_store.render_message({'type': 'something_new'}) is None
+    assert anomaly_store.render_message({'type': 'threshold_exceeded', 'parameter': 'NO2'}) is None
+
+
+def test_compact_references_the_reading():
+    rid = ObjectId()
+    doc = anomaly_store.compact({
+        'pollution_data': _reading(_id=str(rid)),
+        'anomaly_info': _threshold_anomaly(),
+        'timestamp': '2025-06-01T12:00:01'
+    })
+    assert doc['reading_id'] == rid
+    assert 'pollution_data' not in doc
+    assert 'message' not in doc['anomaly_info']
+
+
+def test_compact_embeds_a_reading_without_id():
+    reading = _reading(_id='not-an-object-id')
+    doc = anomaly_store.compact({'pollution_data': reading, 'anomaly_info': _threshold_anomaly()})
+    assert doc['pollution_data'] == reading
+    assert 'reading_id' not in doc
+
+
+def test_expand_fetches_readings_in_one_query():
+    present, missing = ObjectId(), ObjectId()
+    readings = Collection([_reading(_id=present)])
+    info = anomaly_store.compact_info(_threshold_anomaly())
+    docs = [
+        {'_id': 1, 'reading_id': present, 'anomaly_info': info},
+        {'_id': 2, 'reading_id': present, 'anomaly_info': info},
+        {'_id': 3, 'reading_id': missing, 'anomaly_info': info},
+        {'_id': 4, 'pollution_data': _reading(), 'anomaly_info': _threshold_anomaly()},
+    ]
+    expanded = anomaly_store.expand(docs, readings)
+    assert len(readings.queries) == 1
+    assert expanded[0]['pollution_data'] == _reading(_id=str(present))
+    assert 'reading_id' not in expanded[0]
+    assert expanded[2]['pollution_data'] is None
+    assert expanded[3]['pollution_data'] == _reading()
+    assert all(doc['anomaly_info'] == _threshold_anomaly() for doc in expanded)
+
+
+def test_expand_without_references_skips_the_query():
+    readings = Collection()
+    anomaly_store.expand([{'pollution_data': _reading(), 'anomaly_info': {}}], readings)
+    assert readings.queries == []
+
+
+def test_migrate_references_readings_that_still_exist():
+    present, deleted = ObjectId(), ObjectId()
+    anomalies = Collection([
+        {'_id': ObjectId(), 'pollution_data': _reading(_id=str(present)), 'anomaly_info': _threshold_anomaly()},
+        {'_id': ObjectId(), 'pollution_data': _reading(_id=str(deleted)), 'anomaly_info': _threshold_anomaly()},
+        {'_id': ObjectId(), 'pollution_data': _reading(), 'anomaly_info': _threshold_anomaly()},
+    ])
+    db = Database(anomalies, Collection([_reading(_id=present)]))
+    assert anomaly_store.migrate(db, batch_size=2) == (1, 2)
+
+    docs = list(anomalies.docs.values())
+    assert docs[0]['reading_id'] == present and 'pollution_data' not in docs[0]
+    assert all('pollution_data' in doc for doc in docs[1:])
+    assert all('message' not in doc['anomaly_info'] for doc in docs)
+    # A second run only looks at the documents left embedded
+    assert anomaly_store.migrate(db) == (0, 2)
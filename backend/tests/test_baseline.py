@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for data_processor/baseline.py: seasonal slots, the EWMA model
+and the checkpointed store, against an in-memory checkpoint collection.
+
+    pip install numpy pymongo pytest
+    pytest backend/tests
+"""
+
+import pytest
+
+from service_modules import load
+
+baseline = load('data_processor', 'baseline')
+
+
+class Checkpoints:
+    """The part of a pymongo collection CheckpointedStore uses."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            doc = request._doc
+            self.docs[doc.get('_id', request._filter['_id'])] = dict(doc, _id=request._filter['_id'])
+
+
+def _reading(timestamp='2025-06-02T18:00:00Z', **parameters):
+    return {'timestamp': timestamp, 'parameters': parameters}
+
+
+@pytest.mark.parametrize('timestamp,slot', [
+    ('2025-06-02T00:30:00', 0),        # Monday
+    ('2025-06-02T18:00:00Z', 18),
+    ('2025-06-07T18:00:00', 42),       # Saturday
+    ('2025-06-08T23:59:59', 47),       # Sunday
+])
+def test_seasonal_slot(timestamp, slot):
+    assert baseline.seasonal_slot(timestamp) == slot
+
+
+def test_running_mean_while_warming_up():
+    model = baseline.SeasonalModel()
+    for value in (10.0, 20.0, 30.0):
+        model.update(5, value, alpha=0.05)
+    assert float(model.mean[5]) == pytest.approx(20.0)
+    assert int(model.count[5]) == 3
+    # Other slots are untouched
+    assert int(model.count.sum()) == 3
+
+
+def test_ewma_after_warm_up():
+    model = baseline.SeasonalModel()
+    for _ in range(100):
+        model.update(0, 10.0, alpha=0.1)
+    model.update(0, 11.0, alpha=0.1)
+    assert float(model.mean[0]) == pytest.approx(10.1, rel=1e-5)
+
+
+def test_spike_is_clipped_before_the_update():
+    model = baseline.SeasonalModel()
+    for value in [9.0, 11.0] * 50:
+        model.update(0, value, alpha=0.1)
+    mean, std = float(model.mean[0]), float(model.var[0]) ** 0.5
+    model.update(0, 1000.0, alpha=0.1)
+    # At most alpha times the clipped residual (4 sigma)
+    assert float(model.mean[0]) <= mean + 0.1 * baseline.UPDATE_CLIP_SIGMA * std + 1e-4
+
+
+def test_forecast_needs_min_samples_and_floors_std():
+    model = baseline.SeasonalModel()
+    for _ in range(4):
+        model.update(3, 50.0, alpha=0.1)
+    assert model.forecast(3, min_samples=5, min_std=1.0) is None
+    model.update(3, 50.0, alpha=0.1)
+    forecast = model.forecast(3, min_samples=5, min_std=1.0)
+    assert forecast.expected == pytest.approx(50.0)
+    assert forecast.samples == 5
+    # Constant input has zero variance: 10% of the level is the floor here
+    assert forecast.std == pytest.approx(5.0)
+
+
+def test_document_round_trip():
+    model = baseline.SeasonalModel()
+    model.update(7, 12.5, alpha=0.1)
+    model.update(7, 14.5, alpha=0.1)
+    restored = baseline.SeasonalModel.from_document(model.to_document())
+    assert restored.mean.tolist() == model.mean.tolist()
+    assert restored.var.tolist() == model.var.tolist()
+    assert restored.count.tolist() == model.count.tolist()
+    # Restored arrays are writable copies
+    restored.update(7, 20.0, alpha=0.1)
+
+
+def test_store_forecasts_warmed_up_pollutants_only():
+    store = baseline.BaselineStore(None, alpha=0.1, min_samples=3, min_std=1.0, max_stations=10)
+    for _ in range(3):
+        store.update('stn:a', _reading(NO2=20.0, O3='bad'))
+    store.update('stn:a', _reading(PM10=30.0))
+    forecasts = store.forecast('stn:a', _reading(NO2=25.0, PM10=31.0, O3=60.0))
+    assert set(forecasts) == {'NO2'}
+    # Another slot has not seen any reading
+    assert store.forecast('stn:a', _reading('2025-06-02T06:00:00Z', NO2=25.0)) == {}
+
+
+def test_store_checkpoints_and_restores():
+    checkpoints = Checkpoints()
+    store = baseline.BaselineStore(checkpoints, alpha=0.1, min_samples=1, min_std=1.0, max_stations=10)
+    store.update('stn:a', _reading(NO2=20.0))
+    assert store.checkpoint() == 1
+    assert checkpoints.docs['stn:a']['version'] == baseline.MODEL_VERSION
+    assert store.checkpoint() == 0
+
+    restarted = baseline.BaselineStore(checkpoints, alpha=0.1, min_samples=1, min_std=1.0, max_stations=10)
+    assert restarted.forecast('stn:a', _reading(NO2=0.0))['NO2'].expected == pytest.approx(20.0)
+
+
+def test_store_writes_evicted_stations():
+    checkpoints = Checkpoints()
+    store = baseline.BaselineStore(checkpoints, alpha=0.1, min_samples=1, min_std=1.0, max_stations=1)
+    store.update('stn:a', _reading(NO2=20.0))
+    store.update('stn:b', _reading(NO2=30.0))
+    assert 'stn:a' in checkpoints.docs
+    assert list(store._stations) == ['stn:b']
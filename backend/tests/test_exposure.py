@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for data_processor/exposure.py: bucketed rolling means, window
+expiry, coverage and checkpoint documents, without MongoDB.
+
+    pip install numpy pymongo pytest
+    pytest backend/tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from service_modules import load
+
+exposure = load('data_processor', 'exposure')
+
+START = datetime(2025, 6, 2)
+
+
+def _at(minutes):
+    return (START + timedelta(minutes=minutes)).isoformat() + 'Z'
+
+
+def _series(bucket_seconds=300):
+    return exposure.ExposureSeries(bucket_seconds)
+
+
+def test_means_over_each_window():
+    series = _series()
+    series.add(_at(0), 10.0)
+    series.add(_at(120), 30.0)
+    series.add(_at(121), 50.0)
+    means = series.means(min_coverage=0)
+    assert means['1h'] == pytest.approx(40.0)
+    assert means['8h'] == pytest.approx(30.0)
+    assert means['24h'] == pytest.approx(30.0)
+
+
+def test_readings_leave_the_window_as_time_moves_on():
+    series = _series()
+    for minute in range(0, 60, 5):
+        series.add(_at(minute), 10.0)
+    series.add(_at(60 + 30), 40.0)
+    # 00:00-00:30 has left the last hour; 00:35-00:55 and 01:30 remain
+    assert series.means(0)['1h'] == pytest.approx((5 * 10.0 + 40.0) / 6)
+    assert series.means(0)['8h'] == pytest.approx((12 * 10.0 + 40.0) / 13)
+
+
+def test_late_reading_lands_in_its_own_bucket():
+    series = _series()
+    series.add(_at(180), 20.0)
+    # Two hours late: inside 8h and 24h, outside 1h
+    assert series.add(_at(60), 80.0) is True
+    means = series.means(0)
+    assert means['1h'] == pytest.approx(20.0)
+    assert means['8h'] == pytest.approx(50.0)
+
+
+def test_reading_older_than_a_day_is_ignored():
+    series = _series()
+    series.add(_at(24 * 60 + 10), 20.0)
+    assert series.add(_at(0), 1000.0) is False
+    assert series.means(0)['24h'] == pytest.approx(20.0)
+
+
+def test_gap_longer_than_a_day_starts_over():
+    series = _series()
+    series.add(_at(0), 1000.0)
+    series.add(_at(25 * 60), 10.0)
+    assert series.means(0) == {'1h': 10.0, '8h': 10.0, '24h': 10.0}
+    assert series.first == series.head
+
+
+def test_means_wait_for_coverage():
+    series = _series()
+    for minute in range(0, 35, 5):
+        series.add(_at(minute), 10.0)
+    # Seven 5-minute buckets: more than half an hour, far less than 8 hours
+    means = series.means(min_coverage=0.5)
+    assert means['1h'] == pytest.approx(10.0)
+    assert means['8h'] is None
+    assert means['24h'] is None
+
+
+def test_document_round_trip():
+    series = _series()
+    series.add(_at(0), 12.5)
+    series.add(_at(90), 17.5)
+    restored = exposure.ExposureSeries.from_document(series.to_document(), 300)
+    assert (restored.head, restored.first) == (series.head, series.first)
+    assert restored.means(0) == series.means(0)
+    # Restored arrays are writable
+    restored.add(_at(95), 20.0)
+
+
+def test_store_observes_numeric_parameters():
+    store = exposure.ExposureStore(None, bucket_seconds=300, min_coverage=0, max_stations=10)
+    result = store.observe('stn:a', {'timestamp': _at(0), 'parameters': {'NO2': '20', 'O3': 'n/a'}})
+    assert set(result) == {'NO2'}
+    result = store.observe('stn:a', {'timestamp': _at(10), 'parameters': {'NO2': 40.0}})
+    assert result['NO2']['1h'] == pytest.approx(30.0)
+    # Stations are independent
+    result = store.observe('stn:b', {'timestamp': _at(10), 'parameters': {'NO2': 5.0}})
+    assert result['NO2']['1h'] == pytest.approx(5.0)
+
+
+def test_store_rejects_bucket_width_that_does_not_divide_an_hour():
+    with pytest.raises(ValueError):
+        exposure.ExposureStore(None, bucket_seconds=7 * 60, min_coverage=0, max_stations=10)
+
+
+def test_checkpoint_from_another_bucket_width_is_discarded():
+    store = exposure.ExposureStore(None, bucket_seconds=300, min_coverage=0, max_stations=10)
+    store.observe('stn:a', {'timestamp': _at(0), 'parameters': {'NO2': 20.0}})
+    doc = store.encode(store._load('stn:a'))
+    assert set(store.decode(doc)) == {'NO2'}
+    other = exposure.ExposureStore(None, bucket_seconds=600, min_coverage=0, max_stations=10)
+    assert other.decode(doc) == {}
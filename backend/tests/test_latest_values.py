@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for notification_service/latest_values.py: newest-value
+bookkeeping, LRU eviction, bounding-box queries and warming from a stub
+pollution_data collection.
+
+    pip install pytest
+    pytest backend/tests
+"""
+
+import pytest
+
+from service_modules import load
+
+latest_values = load('notification_service', 'latest_values')
+
+
+class PollutionData:
+    """Returns canned aggregation rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.pipeline = None
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        self.pipeline = pipeline
+        return iter(self.rows)
+
+
+def _reading(lat, lon, timestamp, station_id=None, **parameters):
+    reading = {'latitude': lat, 'longitude': lon, 'timestamp': timestamp, 'parameters': parameters}
+    if station_id:
+        reading['station_id'] = station_id
+    return reading
+
+
+def _table(max_stations=100):
+    return latest_values.LatestValues(max_stations, cell_degrees=1.0)
+
+
+@pytest.mark.parametrize('reading,key', [
+    ({'station_id': 'stn:a', 'latitude': 1, 'longitude': 2}, 'stn:a'),
+    ({'latitude': 41.0082, 'longitude': '28.9784'}, 'stn:41.01:28.98'),
+])
+def test_station_key(reading, key):
+    assert latest_values.station_key(reading) == key
+
+
+def test_keeps_the_newest_value_per_pollutant():
+    table = _table()
+    table.update(_reading(41.0, 29.0, '2025-06-01T12:00:00', NO2=20.0, O3=50.0))
+    # Late reading: older NO2 is ignored, a pollutant seen for the first time is kept
+    table.update(_reading(41.0, 29.0, '2025-06-01T11:00:00', NO2=99.0, PM10='7'))
+    table.update(_reading(41.0, 29.0, '2025-06-01T12:30:00', O3=55.0, SO2='n/a'))
+    [station] = table.snapshot()
+    assert station['station_id'] == 'stn:41.00:29.00'
+    assert station['parameters'] == {
+        'NO2': {'value': 20.0, 'timestamp': '2025-06-01T12:00:00'},
+        'O3': {'value': 55.0, 'timestamp': '2025-06-01T12:30:00'},
+        'PM10': {'value': 7.0, 'timestamp': '2025-06-01T11:00:00'},
+    }
+
+
+def test_ignores_readings_without_location_or_values():
+    table = _table()
+    table.update({'timestamp': '2025-06-01T12:00:00', 'parameters': {'NO2': 1.0}})
+    table.update(_reading('x', 29.0, '2025-06-01T12:00:00', NO2=1.0))
+    table.update(_reading(41.0, 29.0, '2025-06-01T12:00:00', NO2='n/a'))
+    assert len(table) == 0
+
+
+def test_evicts_least_recently_updated_stations():
+    evictions = []
+    table = latest_values.LatestValues(2, cell_degrees=1.0, on_evict=evictions.append)
+    table.update(_reading(41.0, 29.0, '2025-06-01T12:00:00', NO2=1.0))
+    table.update(_reading(42.0, 29.0, '2025-06-01T12:00:00', NO2=2.0))
+    table.update(_reading(41.0, 29.0, '2025-06-01T12:05:00', NO2=3.0))
+    table.update(_reading(43.0, 29.0, '2025-06-01T12:05:00', NO2=4.0))
+    assert evictions == [1]
+    assert {s['latitude'] for s in table.snapshot()} == {41.0, 43.0}
+    # The evicted station left the grid index too
+    assert table.snapshot(bbox=(41.5, 28.0, 42.5, 30.0)) == []
+    assert len(table._grid) == 2
+
+
+def test_snapshot_filters():
+    table = _table()
+    table.update(_reading(41.2, 29.1, '2025-06-01T12:00:00', NO2=1.0, O3=2.0))
+    table.update(_reading(41.9, 29.9, '2025-06-01T10:00:00', NO2=3.0))
+    table.update(_reading(45.5, 10.5, '2025-06-01T12:00:00', NO2=4.0))
+
+    in_box = table.snapshot(bbox=(41.0, 29.0, 41.5, 29.5))
+    assert [s['latitude'] for s in in_box] == [41.2]
+    # A box larger than the populated area filters every station
+    assert len(table.snapshot(bbox=(-90, -180, 90, 180))) == 3
+    assert [s['latitude'] for s in table.snapshot(parameter='O3')] == [41.2]
+    recent = table.snapshot(since='2025-06-01T11:00:00')
+    assert sorted(s['latitude'] for s in recent) == [41.2, 45.5]
+
+
+def test_snapshot_returns_copies():
+    table = _table()
+    table.update(_reading(41.0, 29.0, '2025-06-01T12:00:00', NO2=1.0))
+    [station] = table.snapshot()
+    station['parameters']['NO2']['value'] = 100.0
+    assert table.snapshot()[0]['parameters']['NO2']['value'] == 1.0
+
+
+def test_warm_loads_one_row_per_station_and_pollutant():
+    rows = [
+        {'_id': {'station': 'stn:a', 'parameter': 'NO2'}, 'station_id': 'stn:a',
+         'latitude': 41.0, 'longitude': 29.0, 'timestamp': '2025-06-01T12:00:00', 'value': 20.0},
+        {'_id': {'station': 'stn:a', 'parameter': 'O3'}, 'station_id': 'stn:a',
+         'latitude': 41.0, 'longitude': 29.0, 'timestamp': '2025-06-01T11:00:00', 'value': 40.0},
+        # Untagged history is keyed by its location
+        {'_id': {'station': {'latitude': 40.0, 'longitude': 30.0}, 'parameter': 'NO2'},
+         'latitude': 40.0, 'longitude': 30.0, 'timestamp': '2025-06-01T12:00:00', 'value': 5.0},
+    ]
+    collection = PollutionData(rows)
+    table = _table()
+    assert table.warm(collection, hours=6) == 3
+    assert table.warmed
+    assert '$gte' in collection.pipeline[0]['$match']['timestamp']
+    stations = {s['station_id']: s for s in table.snapshot()}
+    assert set(stations) == {'stn:a', 'stn:40.00:30.00'}
+    assert set(stations['stn:a']['parameters']) == {'NO2', 'O3'}
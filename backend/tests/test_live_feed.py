@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for notification_service/live_feed.py: update sequencing, resume
+tokens and heatmap deltas, with Socket.IO replaced by a recorder.
+
+    pip install pytest
+    pytest backend/tests
+"""
+
+import random
+import threading
+import time
+
+from service_modules import load
+
+live_feed = load('notification_service', 'live_feed')
+
+
+class SocketIO:
+    """Records emitted updates; optionally slow, to widen race windows."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    def emit(self, event, update, namespace=None):
+        if self.delay:
+            time.sleep(random.random() * self.delay)
+        self.sent.append((event, update, namespace))
+
+
+def _reading(lat=41.0, lon=29.0, timestamp='2025-06-01T12:00:00', **parameters):
+    return {'latitude': lat, 'longitude': lon, 'timestamp': timestamp, 'parameters': parameters or {'NO2': 20.0}}
+
+
+def _seq(update):
+    return int(update['token'].split(':')[1])
+
+
+def test_flush_emits_one_sequenced_update():
+    socketio = SocketIO()
+    feed = live_feed.LiveFeed(socketio, '/notifications', 1, 10)
+    assert feed.flush() is None
+    feed.add(_reading())
+    feed.add(_reading(lat=40.0))
+    update = feed.flush()
+    assert update['token'] == f'{feed.epoch}:1'
+    assert len(update['readings']) == 2
+    assert socketio.sent == [('pollution_update', update, '/notifications')]
+    assert feed.flush() is None
+    assert feed.current_token() == f'{feed.epoch}:1'
+
+
+def test_concurrent_flushes_emit_in_seq_order():
+    socketio = SocketIO(delay=0.002)
+    feed = live_feed.LiveFeed(socketio, '/n', 1, 1000)
+
+    def produce():
+        for _ in range(40):
+            feed.add(_reading())
+            feed.flush()
+
+    threads = [threading.Thread(target=produce) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seqs = [_seq(update) for _, update, _ in socketio.sent]
+    assert seqs == list(range(1, len(seqs) + 1))
+
+
+def test_missed_since_returns_only_the_gap():
+    feed = live_feed.LiveFeed(SocketIO(), '/n', 1, 10)
+    for _ in range(5):
+        feed.add(_reading())
+        feed.flush()
+    missed = feed.missed_since(f'{feed.epoch}:3')
+    assert [_seq(u) for u in missed] == [4, 5]
+    assert feed.missed_since(f'{feed.epoch}:5') == []
+
+
+def test_resync_when_updates_are_gone_or_epoch_changed():
+    feed = live_feed.LiveFeed(SocketIO(), '/n', 1, 3)
+    for _ in range(6):
+        feed.add(_reading())
+        feed.flush()
+    # Updates 1-3 fell out of the 3-update buffer
+    assert feed.missed_since(f'{feed.epoch}:1') is None
+    assert [_seq(u) for u in feed.missed_since(f'{feed.epoch}:3')] == [4, 5, 6]
+    assert feed.missed_since('otherepoch:5') is None
+    assert feed.missed_since('garbage') is None
+    assert feed.missed_since(None) is None
+
+
+def test_replay_sends_missed_updates_in_order():
+    feed = live_feed.LiveFeed(SocketIO(), '/n', 1, 10)
+    for _ in range(3):
+        feed.add(_reading())
+        feed.flush()
+    sent = []
+    assert feed.replay(f'{feed.epoch}:1', sent.append) is True
+    assert [_seq(u) for u in sent] == [2, 3]
+    assert feed.replay('stale:1', sent.append) is False
+
+
+def test_heatmap_delta_sums_per_cell_and_parameter():
+    delta = live_feed.heatmap_delta([
+        _reading(timestamp='2025-06-01T12:00:00', NO2=10.0, O3=50.0),
+        _reading(timestamp='2025-06-01T12:05:00', NO2=30.0),
+        _reading(lat=40.0, timestamp='2025-06-01T11:00:00', NO2=5.0),
+        {'latitude': 'bad', 'longitude': 29.0, 'parameters': {'NO2': 1.0}},
+        _reading(NO2='n/a'),
+    ])
+    cells = {(d['latitude'], d['parameter']): d for d in delta}
+    assert set(cells) == {(41.0, 'NO2'), (41.0, 'O3'), (40.0, 'NO2')}
+    assert (cells[(41.0, 'NO2')]['sum'], cells[(41.0, 'NO2')]['count']) == (40.0, 2)
+    assert cells[(41.0, 'NO2')]['last'] == '2025-06-01T12:05:00'
+    assert cells[(40.0, 'NO2')]['last'] == '2025-06-01T11:00:00'
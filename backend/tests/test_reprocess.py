@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for data_processor/reprocess.py: longitude striping and the
+per-worker replay state. Nothing here talks to MongoDB.
+
+    pip install numpy pymongo pytest
+    pytest backend/tests
+"""
+
+import pytest
+
+from service_modules import load
+
+reprocess = load('data_processor', 'reprocess')
+
+
+def _reading(lat, lon, timestamp, **parameters):
+    return {'latitude': lat, 'longitude': lon, 'timestamp': timestamp, 'parameters': parameters}
+
+
+def test_stripes_hold_equal_numbers_of_stations():
+    # Crowded in the west, sparse in the east
+    longitudes = [float(lon) for lon in range(0, 30)] + [100.0, 120.0]
+    partitioner = reprocess.StripePartitioner(longitudes, workers=4)
+    owners = [partitioner.owner(lon) for lon in longitudes]
+    assert sorted(set(owners)) == [0, 1, 2, 3]
+    assert [owners.count(w) for w in range(4)] == [8, 8, 8, 8]
+
+
+def test_stripes_split_the_globe_without_stations():
+    partitioner = reprocess.StripePartitioner([], workers=4)
+    assert partitioner.bounds == [-90.0, 0.0, 90.0]
+    assert [partitioner.owner(lon) for lon in (-179.0, -45.0, 45.0, 179.0)] == [0, 1, 2, 3]
+
+
+def test_single_worker_owns_everything():
+    partitioner = reprocess.StripePartitioner([10.0, 20.0], workers=1)
+    assert partitioner.owner(-170.0) == partitioner.owner(170.0) == 0
+    assert partitioner.context_workers(0.0, 15.0) == []
+
+
+def test_context_goes_to_stripes_within_the_neighbour_radius():
+    partitioner = reprocess.StripePartitioner([], workers=4)
+    # 0.1 degrees from the 0.0 bound at the equator is ~11 km
+    assert partitioner.context_workers(0.0, -0.1) == [2]
+    assert partitioner.context_workers(0.0, 0.1) == [1]
+    assert partitioner.context_workers(0.0, 45.0) == []
+    # A degree of longitude shrinks towards the poles
+    assert partitioner.context_workers(80.0, -1.0) == [2]
+
+
+def test_replayer_history_is_a_sliding_day():
+    replayer = reprocess.StationReplayer({}, use_baseline=False)
+    replayer.add_context(_reading(41.0, 29.0, '2025-06-01T00:00:00', NO2=10.0))
+    replayer.add_context(_reading(41.0, 29.0, '2025-06-01T12:00:00', NO2=10.0))
+    replayer.score(_reading(41.0, 29.0, '2025-06-02T06:00:00', NO2=10.0))
+    timestamps = [r['timestamp'] for r in replayer.history['stn:41.00:29.00']]
+    assert timestamps == ['2025-06-01T12:00:00', '2025-06-02T06:00:00']
+
+
+def test_replayer_registers_stations_and_their_neighbours():
+    replayer = reprocess.StationReplayer({'stn:41.00:29.00': (41.0, 29.0)}, use_baseline=True)
+    replayer.add_context(_reading(41.05, 29.0, '2025-06-01T00:00:00', NO2=10.0))
+    assert replayer.registry.neighbours['stn:41.00:29.00'] == {'stn:41.05:29.00'}
+    assert replayer.score(_reading(41.0, 29.0, '2025-06-01T00:05:00', NO2=10.0)) == []
+
+
+def test_run_rejects_unsafe_version_before_touching_the_database():
+    with pytest.raises(ValueError):
+        reprocess.run('2025-06-01', '2025-06-02', 'v1; drop', workers=1, batch_size=10)
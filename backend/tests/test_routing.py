@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for routing.py (kept identical in every service): regions,
+lanes, routing keys and queue names, and the declarations and
+subscriptions made on a recording stand-in for a pika channel.
+
+    pip install pytest
+    pytest backend/tests
+"""
+
+import os
+
+import pytest
+
+from service_modules import BACKEND_DIR, load
+
+routing = load('data_processor', 'routing')
+
+DANGEROUS = {'NO2': 50.0, 'O3': 200.0}
+
+
+class Channel:
+    """Records the channel calls routing makes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, method):
+        def call(**kwargs):
+            self.calls.append((method, kwargs))
+            if method == 'basic_consume':
+                return f"ctag-{len(self.calls)}"
+        return call
+
+
+def test_copies_are_identical():
+    sources = set()
+    for service in ('data_collector', 'data_processor', 'notification_service'):
+        with open(os.path.join(BACKEND_DIR, service, 'routing.py'), 'rb') as f:
+            sources.add(f.read())
+    assert len(sources) == 1, "routing.py differs between services"
+
+
+@pytest.mark.parametrize('lat,lon,name', [
+    (41.0, 29.0, 'n40e20'),
+    (35.0, 35.0, 'n30e30'),
+    (0.0, 0.0, 'n0e0'),
+    (-33.9, 151.2, 's40e150'),
+    (-0.5, -78.5, 's10w80'),
+    ('40.7', '-74.0', 'n40w80'),
+])
+def test_region(lat, lon, name):
+    assert routing.region(lat, lon) == name
+
+
+@pytest.mark.parametrize('parameters,lane', [
+    ({'NO2': 20.0, 'O3': 90.0}, routing.ROUTINE),
+    ({'NO2': 50.0}, routing.ROUTINE),
+    ({'NO2': '50.1'}, routing.URGENT),
+    ({'CO': 10 ** 6, 'O3': 'n/a'}, routing.ROUTINE),
+    (None, routing.ROUTINE),
+])
+def test_reading_lane(parameters, lane):
+    assert routing.reading_lane({'parameters': parameters}, DANGEROUS) == lane
+
+
+def test_anomaly_lane():
+    assert routing.anomaly_lane({'severity': 'danger'}) == routing.URGENT
+    assert routing.anomaly_lane({'severity': 'warning'}) == routing.ROUTINE
+    assert routing.anomaly_lane({}) == routing.ROUTINE
+
+
+@pytest.mark.parametrize('data,key', [
+    ({'latitude': 41.0, 'longitude': 29.0}, 'readings.n40e20.urgent'),
+    ({'latitude': 'north', 'longitude': 29.0}, 'readings.unknown.urgent'),
+    ({'latitude': None, 'longitude': 29.0}, 'readings.unknown.urgent'),
+    ({'longitude': 29.0}, 'readings.unknown.urgent'),
+])
+def test_routing_key(data, key):
+    assert routing.routing_key(routing.READINGS, data, routing.URGENT) == key
+
+
+@pytest.mark.parametrize('value,regions', [
+    (None, ['*']),
+    ('', ['*']),
+    (' n40e20 , n30e30,, ', ['n40e20', 'n30e30']),
+])
+def test_parse_regions(value, regions):
+    assert routing.parse_regions(value) == regions
+
+
+@pytest.mark.parametrize('regions,group', [
+    (['*'], 'all'),
+    (['#'], 'all'),
+    (['n40e20', '*'], 'all'),
+    (['n40e30', 'n30e30', 'n40e30'], 'n30e30-n40e30'),
+    (['n*'], 'nany'),
+])
+def test_queue_group(regions, group):
+    assert routing.queue_group(regions) == group
+
+
+def test_lane_queues():
+    assert routing.lane_queues('urgent_q', 'routine_q', 'n30e30') == {
+        routing.URGENT: 'urgent_q.n30e30',
+        routing.ROUTINE: 'routine_q.n30e30',
+    }
+
+
+def test_declare_exchange_sends_unroutable_messages_to_the_fallback_queue():
+    channel = Channel()
+    routing.declare_exchange(channel, 'readings_exchange', 'readings_fallback')
+    assert ('queue_bind', {'queue': 'readings_fallback', 'exchange': 'readings_exchange.unrouted'}) in channel.calls
+    method, kwargs = channel.calls[-1]
+    assert method == 'exchange_declare'
+    assert kwargs['arguments'] == {'alternate-exchange': 'readings_exchange.unrouted'}
+
+
+def test_bind_lanes_binds_every_region_per_lane():
+    channel = Channel()
+    queues = routing.lane_queues('q', 'q', 'group')
+    routing.bind_lanes(channel, 'x', routing.READINGS, queues, ['n40e20', 'n30e30'])
+    keys = [kwargs['routing_key'] for method, kwargs in channel.calls if method == 'queue_bind']
+    assert keys == ['readings.n40e20.urgent', 'readings.n30e30.urgent',
+                    'readings.n40e20.routine', 'readings.n30e30.routine']
+    # A published key matches exactly one lane binding
+    key = routing.routing_key(routing.READINGS, {'latitude': 35.0, 'longitude': 35.0}, routing.ROUTINE)
+    assert keys.count(key) == 1
+
+
+def test_consume_lanes_sets_prefetch_per_lane():
+    channel = Channel()
+    queues = routing.lane_queues('urgent_q', 'routine_q', 'all')
+    prefetch = {routing.URGENT: 50, routing.ROUTINE: 10}
+    lanes = routing.consume_lanes(channel, queues, prefetch, callback=None, fallback_queue='fallback')
+    assert [(method, kwargs.get('prefetch_count', kwargs.get('queue'))) for method, kwargs in channel.calls] == [
+        ('basic_qos', 50), ('basic_consume', 'urgent_q.all'),
+        ('basic_qos', 10), ('basic_consume', 'routine_q.all'),
+        ('basic_qos', 10), ('basic_consume', 'fallback'),
+    ]
+    assert sorted(lanes.values()) == [routing.ROUTINE, routing.ROUTINE, routing.URGENT]
+
+
+def test_fallback_queue_used_as_a_lane_is_consumed_once():
+    channel = Channel()
+    queues = {routing.URGENT: 'urgent_q.all', routing.ROUTINE: 'fallback'}
+    lanes = routing.consume_lanes(channel, queues, {routing.URGENT: 5, routing.ROUTINE: 5},
+                                  callback=None, fallback_queue='fallback')
+    assert len(lanes) == 2
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for shutdown.py (kept identical in data_processor and
+notification_service): stopping consumers, drain hooks and the deadline,
+with pika connections replaced by stubs and the main-thread interrupt
+recorded instead of raised.
+
+    pip install pytest
+    pytest backend/tests
+"""
+
+import os
+import signal
+import threading
+
+import pytest
+
+from service_modules import BACKEND_DIR, load
+
+shutdown = load('data_processor', 'shutdown')
+
+
+class Channel:
+    """Stops consuming by reporting back to the coordinator, like a consumer thread."""
+
+    def __init__(self, coordinator, name, log, responsive=True):
+        self.coordinator = coordinator
+        self.name = name
+        self.log = log
+        self.responsive = responsive
+
+    def stop_consuming(self):
+        self.log.append(f'stop {self.name}')
+        if self.responsive:
+            self.coordinator.stopped(self.name)
+
+
+class Connection:
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+
+@pytest.fixture
+def interrupted(monkeypatch):
+    event = threading.Event()
+    monkeypatch.setattr(shutdown._thread, 'interrupt_main', event.set)
+    return event
+
+
+def _consume(coordinator, name, log, responsive=True):
+    coordinator.consuming(name, Connection(), Channel(coordinator, name, log, responsive))
+
+
+def test_copies_are_identical():
+    sources = set()
+    for service in ('data_processor', 'notification_service'):
+        with open(os.path.join(BACKEND_DIR, service, 'shutdown.py'), 'rb') as f:
+            sources.add(f.read())
+    assert len(sources) == 1, "shutdown.py differs between services"
+
+
+def test_drain_stops_consumers_before_the_hooks(interrupted):
+    log = []
+    coordinator = shutdown.GracefulShutdown(timeout=5)
+    coordinator.on_request(lambda: log.append('not ready'))
+    coordinator.add_hook('checkpoint', lambda: log.append('checkpoint'))
+    _consume(coordinator, 'readings', log)
+    _consume(coordinator, 'anomalies', log)
+    assert coordinator.remaining() == 5
+
+    coordinator.request('SIGTERM')
+    assert coordinator.requested
+    assert interrupted.wait(2)
+    assert log[0] == 'not ready'
+    assert sorted(log[1:3]) == ['stop anomalies', 'stop readings']
+    assert log[3:] == ['checkpoint']
+
+
+def test_request_is_idempotent(interrupted):
+    calls = []
+    coordinator = shutdown.GracefulShutdown(timeout=5)
+    coordinator.on_request(lambda: calls.append(1))
+    coordinator.request('SIGTERM')
+    deadline = coordinator.deadline
+    coordinator.request('SIGINT')
+    assert calls == [1]
+    assert coordinator.deadline == deadline
+    assert interrupted.wait(2)
+
+
+def test_consumer_registered_during_shutdown_is_stopped(interrupted):
+    log = []
+    coordinator = shutdown.GracefulShutdown(timeout=5)
+    coordinator.request('SIGTERM')
+    assert interrupted.wait(2)
+    _consume(coordinator, 'late', log)
+    assert log == ['stop late']
+
+
+def test_hooks_run_at_the_deadline_even_if_a_consumer_hangs(interrupted):
+    log = []
+    coordinator = shutdown.GracefulShutdown(timeout=0.1)
+    coordinator.add_hook('broken', lambda: 1 / 0)
+    coordinator.add_hook('flush', lambda: log.append('flush'))
+    _consume(coordinator, 'stuck', log, responsive=False)
+    coordinator.request('SIGTERM')
+    assert interrupted.wait(2)
+    assert log == ['stop stuck', 'flush']
+    assert coordinator.remaining() == 0.0
+
+
+def test_second_signal_exits_at_once(interrupted):
+    coordinator = shutdown.GracefulShutdown(timeout=5)
+    coordinator._handle_signal(signal.SIGTERM, None)
+    assert coordinator.requested
+    with pytest.raises(KeyboardInterrupt):
+        coordinator._handle_signal(signal.SIGINT, None)
+    assert interrupted.wait(2)
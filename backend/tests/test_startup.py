@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for startup.py (kept identical in every service): reconnect
+backoff and dependency readiness, with the clock and sleeps stubbed out.
+
+    pip install pytest
+    pytest backend/tests
+"""
+
+import os
+import threading
+
+import pytest
+
+from service_modules import BACKEND_DIR, load
+
+startup = load('data_processor', 'startup')
+
+
+class Stop:
+    """A threading.Event that records waits instead of sleeping."""
+
+    def __init__(self):
+        self.waits = []
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        return False
+
+    def is_set(self):
+        return False
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(startup.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_copies_are_identical():
+    sources = set()
+    for service in ('data_collector', 'data_processor', 'notification_service'):
+        with open(os.path.join(BACKEND_DIR, service, 'startup.py'), 'rb') as f:
+            sources.add(f.read())
+    assert len(sources) == 1, "startup.py differs between services"
+
+
+def test_backoff_doubles_up_to_the_maximum_with_jitter():
+    backoff = startup.Backoff(1.0, 10.0)
+    ceilings = [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+    for ceiling in ceilings:
+        delay = backoff.next_delay()
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_backoff_reset_starts_over():
+    backoff = startup.Backoff(1.0, 60.0)
+    for _ in range(5):
+        backoff.next_delay()
+    backoff.reset()
+    assert backoff.next_delay() <= 1.0
+
+
+def test_backoff_waits_on_the_stop_event():
+    stop = Stop()
+    backoff = startup.Backoff(0.5, 60.0)
+    delay = backoff.wait(stop)
+    assert stop.waits == [delay]
+    assert 0.25 <= delay <= 0.5
+
+
+def test_reported_dependencies_make_the_service_ready():
+    changes, ready_after = [], []
+    readiness = startup.Readiness(reported=('rabbitmq', 'mongodb'),
+                                  on_change=lambda name, up: changes.append((name, up)),
+                                  on_ready=ready_after.append)
+    assert readiness.check() == (False, {
+        'rabbitmq': {'up': False, 'error': 'not checked'},
+        'mongodb': {'up': False, 'error': 'not checked'},
+    })
+    readiness.report('rabbitmq', True)
+    readiness.report('rabbitmq', True)
+    assert readiness.check()[0] is False
+    readiness.report('mongodb', True)
+    assert readiness.check()[0] is True
+    assert changes == [('rabbitmq', True), ('mongodb', True)]
+    assert len(ready_after) == 1
+
+    # Going down again is reported, but ready_after is only set once
+    readiness.report('mongodb', False, ConnectionError())
+    ready, dependencies = readiness.check()
+    assert ready is False
+    assert dependencies['mongodb'] == {'up': False, 'error': 'ConnectionError'}
+    readiness.report('mongodb', True)
+    assert len(ready_after) == 1
+
+
+def test_probe_results_are_cached(clock):
+    calls = []
+
+    def probe():
+        calls.append(clock[0])
+        if len(calls) == 1:
+            raise OSError('connection refused')
+
+    readiness = startup.Readiness(probes={'mongodb': probe}, probe_ttl=5.0)
+    assert readiness.check()[1]['mongodb'] == {'up': False, 'error': 'connection refused'}
+    clock[0] += 4.9
+    assert readiness.check()[0] is False
+    clock[0] += 0.1
+    assert readiness.check()[0] is True
+    assert len(calls) == 2
+
+
+def test_wait_until_ready_backs_off_between_probes():
+    attempts = []
+
+    def probe():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError('down')
+
+    stop = Stop()
+    readiness = startup.Readiness(probes={'rabbitmq': probe}, probe_ttl=0)
+    readiness.wait_until_ready(1.0, 30.0, stop)
+    assert len(attempts) == 3
+    assert len(stop.waits) == 2
+    assert readiness.ready_after is not None
+
+
+def test_wait_until_ready_ends_when_stopped():
+    stop = threading.Event()
+    stop.set()
+    readiness = startup.Readiness(reported=('rabbitmq',))
+    readiness.wait_until_ready(1.0, 30.0, stop)
+    assert readiness.ready_after is None
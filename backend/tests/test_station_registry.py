@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for station_registry.py (kept identical in data_collector and
+data_processor): station ids, the neighbour graph and syncs, against an
+in-memory stand-in for the stations collection.
+
+    pip install pymongo pytest
+    pytest backend/tests
+"""
+
+import os
+
+import pytest
+
+from service_modules import BACKEND_DIR, load
+
+station_registry = load('data_processor', 'station_registry')
+
+
+class Stations:
+    """The part of a pymongo collection StationRegistry uses."""
+
+    def __init__(self, docs=()):
+        self.docs = {doc['_id']: doc for doc in docs}
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return [dict(doc) for doc in self.docs.values()]
+
+    def update_one(self, query, update, upsert=False):
+        sid = query['_id']
+        if sid not in self.docs:
+            self.docs[sid] = dict(update['$setOnInsert'], _id=sid)
+
+
+def _doc(lat, lon):
+    return {'_id': station_registry.station_id(lat, lon), 'latitude': lat, 'longitude': lon}
+
+
+def test_copies_are_identical():
+    sources = set()
+    for service in ('data_collector', 'data_processor'):
+        with open(os.path.join(BACKEND_DIR, service, 'station_registry.py'), 'rb') as f:
+            sources.add(f.read())
+    assert len(sources) == 1, "station_registry.py differs between services"
+
+
+@pytest.mark.parametrize('lat,lon,sid', [
+    (39.9255, 32.8663, 'stn:39.93:32.87'),
+    (41, 29, 'stn:41.00:29.00'),
+    ('-33.8688', '151.2093', 'stn:-33.87:151.21'),
+])
+def test_station_id(lat, lon, sid):
+    assert station_registry.station_id(lat, lon) == sid
+
+
+def test_neighbours_within_radius_both_ways():
+    # ~11 km and ~44 km north of the first station
+    stations = Stations([_doc(41.0, 29.0), _doc(41.1, 29.0), _doc(41.4, 29.0)])
+    registry = station_registry.StationRegistry(stations)
+    registry.sync()
+    a, b, c = (station_registry.station_id(lat, 29.0) for lat in (41.0, 41.1, 41.4))
+    assert registry.get_neighbours(a) == {b}
+    assert registry.get_neighbours(b) == {a}
+    assert registry.get_neighbours(c) == frozenset()
+
+
+def test_resolve_registers_and_links_new_station():
+    stations = Stations([_doc(41.0, 29.0)])
+    registry = station_registry.StationRegistry(stations)
+    registry.sync()
+    sid = registry.resolve(41.0512, 29.0)
+    assert sid == 'stn:41.05:29.00'
+    assert sid in stations.docs
+    assert registry.get_neighbours('stn:41.00:29.00') == {sid}
+
+
+def test_get_neighbours_returns_a_snapshot():
+    stations = Stations([_doc(41.0, 29.0)])
+    registry = station_registry.StationRegistry(stations)
+    registry.sync()
+    neighbours = registry.get_neighbours('stn:41.00:29.00')
+    assert isinstance(neighbours, frozenset)
+    registry.add_local(41.01, 29.0)
+    # The graph grew, the snapshot a caller may be iterating did not
+    assert neighbours == frozenset()
+    assert registry.get_neighbours('stn:41.00:29.00') == {'stn:41.01:29.00'}
+
+
+def test_unknown_station_syncs_at_most_once_per_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(station_registry.time, 'monotonic', lambda: now[0])
+    stations = Stations()
+    registry = station_registry.StationRegistry(stations, miss_sync_interval=30)
+    registry.sync()
+    assert stations.finds == 1
+
+    assert registry.get_neighbours('stn:1.00:1.00') is None
+    assert registry.get_neighbours('stn:2.00:2.00') is None
+    assert stations.finds == 2
+
+    # Registered by a collector meanwhile: found after the interval
+    stations.docs['stn:1.00:1.00'] = _doc(1.0, 1.0)
+    now[0] += 29
+    assert registry.get_neighbours('stn:1.00:1.00') is None
+    now[0] += 1
+    assert registry.get_neighbours('stn:1.00:1.00') == frozenset()
+    assert stations.finds == 3
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Round-trip tests for wire_format.py.
+
+The codec is kept identical in every service, and a copy that drifts breaks
+the pipeline between them, so the copies are compared byte for byte and
+messages encoded by one service's copy are decoded with every other's.
+
+    pip install msgpack pytest
+    pytest backend/tests
+"""
+
+import importlib.util
+import itertools
+import json
+import os
+import struct
+
+import msgpack
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = ('data_collector', 'data_processor', 'notification_service')
+
+
+def _load(service):
+    path = os.path.join(BACKEND_DIR, service, 'wire_format.py')
+    spec = importlib.util.spec_from_file_location(f'wire_format_{service}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+CODECS = {service: _load(service) for service in SERVICES}
+# (producer, consumer) pairs, including each service with itself
+PAIRS = list(itertools.product(SERVICES, repeat=2))
+
+READING = {
+    'latitude': 41.0082,
+    'longitude': 28.9784,
+    'timestamp': '2025-06-01T12:00:00Z',
+    'parameters': {'PM2.5': 12.34, 'PM10': 30.0, 'NO2': 18.5, 'SO2': 8.125, 'O3': 60.75},
+    'station_id': 'stn:41.00:28.97'
+}
+
+
+def _reading(**changes):
+    reading = json.loads(json.dumps(READING))
+    reading.update(changes)
+    return reading
+
+
+def test_copies_are_identical():
+    sources = {}
+    for service in SERVICES:
+        with open(os.path.join(BACKEND_DIR, service, 'wire_format.py'), 'rb') as f:
+            sources[service] = f.read()
+    assert len(set(sources.values())) == 1, "wire_format.py differs between services"
+
+
+@pytest.mark.parametrize('producer,consumer', PAIRS)
+@pytest.mark.parametrize('wire_format', ['json', 'msgpack'])
+def test_reading_round_trip(producer, consumer, wire_format):
+    body, content_type = CODECS[producer].encode_reading(READING, wire_format)
+    assert CODECS[consumer].decode_reading(body, content_type) == READING
+
+
+@pytest.mark.parametrize('value', [
+    1234567.891,            # more than 7 significant digits
+    50000.123456789,        # large CO-like value
+    1e-9,
+    0.1 + 0.2,
+    2 ** 53,
+    -3.5,
+    0,
+    float('inf'),
+])
+def test_msgpack_preserves_values(value):
+    codec = CODECS['data_processor']
+    reading = _reading(parameters={'NO2': value}, latitude=-33.868820123456, longitude=151.209295987654)
+    body, content_type = codec.encode_reading(reading, 'msgpack')
+    assert content_type.startswith(codec.MSGPACK_CONTENT_TYPE)
+    decoded = codec.decode_reading(body, content_type)
+    assert decoded['parameters']['NO2'] == value
+    assert decoded['latitude'] == reading['latitude']
+    assert decoded['longitude'] == reading['longitude']
+
+
+@pytest.mark.parametrize('parameters', [
+    {'PM2.5': '12.3'},          # numeric string
+    {'PM2.5': True},
+    {'PM2.5': None},
+    {'PM2.5': 2 ** 53 + 1},     # not exact as float64
+    {'CO': 0.4},                # pollutant without a mask bit
+])
+def test_msgpack_falls_back_to_json(parameters):
+    codec = CODECS['data_collector']
+    reading = _reading(parameters=parameters)
+    body, content_type = codec.encode_reading(reading, 'msgpack')
+    assert content_type == codec.JSON_CONTENT_TYPE
+    assert CODECS['data_processor'].decode_reading(body, content_type) == reading
+
+
+@pytest.mark.parametrize('producer,consumer', PAIRS)
+@pytest.mark.parametrize('wire_format', ['json', 'msgpack'])
+def test_batch_round_trip(producer, consumer, wire_format):
+    readings = [
+        _reading(timestamp=f'2025-06-01T12:{minute:02d}:00Z',
+                 parameters={'PM2.5': 10 + minute / 3, 'O3': 60.0 + minute})
+        for minute in range(20)
+    ]
+    body, content_type = CODECS[producer].encode_reading_batch(readings, wire_format)
+    assert CODECS[consumer].decode_readings(body, content_type) == readings
+
+
+def test_single_reading_decodes_as_list():
+    codec = CODECS['data_processor']
+    for wire_format in ('json', 'msgpack'):
+        body, content_type = codec.encode_reading(READING, wire_format)
+        assert codec.decode_readings(body, content_type) == [READING]
+
+
+@pytest.mark.parametrize('producer,consumer', PAIRS)
+@pytest.mark.parametrize('wire_format', ['json', 'msgpack'])
+def test_anomaly_round_trip(producer, consumer, wire_format):
+    anomaly = {
+        'pollution_data': _reading(_id='665b1f0e9d3c2a7f1e4b8c21'),
+        'anomaly_info': {
+            'type': 'threshold_exceeded', 'parameter': 'NO2', 'value': 70.0,
+            'threshold': 25.0, 'dangerous_threshold': 50.0, 'severity': 'danger',
+            'message': 'NO2 exceeded dangerous threshold (70.00 > 50.00)'
+        },
+        'timestamp': '2025-06-01T12:00:01Z'
+    }
+    body, content_type = CODECS[producer].encode_anomaly(anomaly, wire_format)
+    assert CODECS[consumer].decode_anomaly(body, content_type) == anomaly
+
+
+def test_content_type_carries_version():
+    codec = CODECS['data_collector']
+    _, content_type = codec.encode_reading(READING, 'msgpack')
+    assert content_type == f'{codec.MSGPACK_CONTENT_TYPE}; v={codec.WIRE_VERSION}'
+    _, content_type = codec.encode_reading_batch([READING], 'msgpack')
+    assert content_type == f'{codec.MSGPACK_CONTENT_TYPE}; v={codec.WIRE_VERSION}; batch=1'
+
+
+def test_version_1_messages_still_decode():
+    # float32 values, as published before the float64 format
+    codec = CODECS['notification_service']
+    packed = [41.0, 29.0, '2025-06-01T12:00:00Z', 0b00101, struct.pack('<2f', 12.34, 18.5), None]
+    body = msgpack.packb(packed, use_bin_type=True)
+    decoded = codec.decode_reading(body, f'{codec.MSGPACK_CONTENT_TYPE}; v=1')
+    assert decoded['parameters'] == {'PM2.5': 12.34, 'NO2': 18.5}
+
+
+@pytest.mark.parametrize('content_type', [
+    'application/x-msgpack; v=99',
+    'text/plain',
+])
+def test_unsupported_content_type(content_type):
+    body, _ = CODECS['data_processor'].encode_reading(READING, 'msgpack')
+    with pytest.raises(ValueError):
+        CODECS['data_processor'].decode_reading(body, content_type)
+
+
+@pytest.mark.parametrize('content_type', [None, '', 'application/json; charset=utf-8'])
+def test_json_is_the_default(content_type):
+    body = json.dumps(READING).encode('utf-8')
+    assert CODECS['data_processor'].decode_reading(body, content_type) == READING
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic sensor fleet used by the load test.
+
+Stations sit on a fixed grid around a city centre. Each pollutant follows a
+diurnal curve (rush-hour peaks for NO2/PM, an afternoon peak for O3) with
+Gaussian noise, and a configurable fraction of readings carries an injected
+spike large enough to trip the processor's anomaly checks.
+"""
+
+import math
+import random
+import uuid
+from datetime import timedelta
+
+# Typical urban background levels (µg/m³), kept below the WHO guideline values
+BASE_LEVELS = {
+    'PM2.5': 10.0,
+    'PM10': 30.0,
+    'NO2': 18.0,
+    'SO2': 8.0,
+    'O3': 60.0
+}
+
+# (amplitude as a fraction of the base level, peak hours) for each pollutant
+DIURNAL_PROFILES = {
+    'PM2.5': (0.4, (8, 19)),
+    'PM10': (0.4, (8, 19)),
+    'NO2': (0.6, (8, 18)),
+    'SO2': (0.2, (9,)),
+    'O3': (0.5, (15,))
+}
+
+# Width (hours) of each diurnal peak
+PEAK_WIDTH_HOURS = 2.5
+
+KM_PER_DEGREE = 111.0
+
+
+class Station:
+    """A fixed sensor location with its own noise generator."""
+
+    def __init__(self, station_id, latitude, longitude, seed):
+        self.station_id = station_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.rng = random.Random(seed)
+
+
+def build_station_grid(center_lat, center_lon, rows, cols, spacing_km, seed=42):
+    """
+    Lay out rows x cols stations on a regular grid centred on a point.
+
+    Args:
+        center_lat, center_lon (float): Grid centre in decimal degrees.
+        rows, cols (int): Grid dimensions.
+        spacing_km (float): Distance between neighbouring stations.
+        seed (int): Base seed so fleets are reproducible.
+
+    Returns:
+        list of Station: The generated stations.
+    """
+    lat_step = spacing_km / KM_PER_DEGREE
+    lon_step = spacing_km / (KM_PER_DEGREE * math.cos(math.radians(center_lat)))
+    stations = []
+    for r in range(rows):
+        for c in range(cols):
+            lat = center_lat + (r - (rows - 1) / 2) * lat_step
+            lon = center_lon + (c - (cols - 1) / 2) * lon_step
+            stations.append(Station(
+                station_id=f"st-{r:03d}-{c:03d}",
+                latitude=round(lat, 6),
+                longitude=round(lon, 6),
+                seed=seed + r * cols + c
+            ))
+    return stations
+
+
+def diurnal_level(pollutant, hour_of_day):
+    """
+    Expected concentration for a pollutant at a given (fractional) hour.
+
+    Args:
+        pollutant (str): Pollutant name.
+        hour_of_day (float): Hour in [0, 24).
+
+    Returns:
+        float: Expected value before noise.
+    """
+    base = BASE_LEVELS[pollutant]
+    amplitude, peaks = DIURNAL_PROFILES[pollutant]
+    bump = 0.0
+    for peak in peaks:
+        # Circular distance so a peak at 23h also raises 01h
+        delta = min(abs(hour_of_day - peak), 24 - abs(hour_of_day - peak))
+        bump += math.exp(-(delta ** 2) / (2 * PEAK_WIDTH_HOURS ** 2))
+    return base * (1 - amplitude / 2 + amplitude * bump)
+
+
+class FleetGenerator:
+    """
+    Produces readings round-robin across the fleet on a simulated clock.
+
+    The simulated clock starts at `start_time` and advances `time_scale` times
+    faster than the wall clock, so a short run still sweeps the diurnal curve.
+    """
+
+    def __init__(self, stations, start_time, time_scale=1.0,
+                 spike_rate=0.01, spike_factor=(3.0, 6.0), noise=0.1, seed=7):
+        self.stations = stations
+        self.start_time = start_time
+        self.time_scale = time_scale
+        self.spike_rate = spike_rate
+        self.spike_factor = spike_factor
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self._index = 0
+
+    def simulated_time(self, elapsed_seconds):
+        """Map wall-clock seconds since the run started to simulated time."""
+        return self.start_time + timedelta(seconds=elapsed_seconds * self.time_scale)
+
+    def next_reading(self, elapsed_seconds):
+        """
+        Build the next reading in the round-robin.
+
+        Args:
+            elapsed_seconds (float): Wall-clock seconds since the run started.
+
+        Returns:
+            tuple: (reading dict, bool whether a spike was injected)
+        """
+        station = self.stations[self._index % len(self.stations)]
+        self._index += 1
+
+        now = self.simulated_time(elapsed_seconds)
+        hour = now.hour + now.minute / 60 + now.second / 3600
+        spiked = self.rng.random() < self.spike_rate
+        spike_target = self.rng.choice(list(BASE_LEVELS)) if spiked else None
+
+        parameters = {}
+        for pollutant in BASE_LEVELS:
+            value = diurnal_level(pollutant, hour)
+            value *= max(0.0, station.rng.gauss(1.0, self.noise))
+            if pollutant == spike_target:
+                value *= self.rng.uniform(*self.spike_factor)
+            parameters[pollutant] = round(value, 2)
+
+        reading = {
+            'id': uuid.uuid4().hex,
+            'latitude': station.latitude,
+            'longitude': station.longitude,
+            'timestamp': now.isoformat(),
+            'parameters': parameters
+        }
+        return reading, spiked
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end load test for the air-pollution pipeline.
+
+Drives the Data Collector at a fixed request rate with an open-loop async
+client, listens for `anomaly_alert` events on the Notification Service's
+`/notifications` namespace, and reports ingest throughput plus HTTP and
+ingest-to-alert latency percentiles.
+
+The collector rate-limits each sensor location (SENSOR_RATE_PER_SECOND,
+1/s by default). Unless --rows/--cols are given, the station grid is sized
+so each station sends at most SENSOR_HEADROOM of --sensor-rate, which keeps
+the run measuring the pipeline rather than 429s.
+
+Example:
+    python load_test.py --rps 200 --duration 60 --spike-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import aiohttp
+import socketio
+
+from fleet import build_station_grid, FleetGenerator
+
+# Share of the collector's per-sensor rate an auto-sized grid uses per station
+SENSOR_HEADROOM = 0.8
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(values):
+    """Return count and p50/p95/p99/max (milliseconds) for latencies in seconds."""
+    ordered = sorted(values)
+    summary = {'count': len(ordered)}
+    for label, pct in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100)):
+        value = percentile(ordered, pct)
+        summary[label] = round(value * 1000, 2) if value is not None else None
+    return summary
+
+
+class LoadTestStats:
+    """Collects per-request and per-alert observations during a run."""
+
+    def __init__(self):
+        self.http_latencies = []
+        self.alert_latencies = []
+        self.status_codes = Counter()
+        self.readings_accepted = 0
+        self.readings_sent = 0
+        # Per-item failure messages of accepted (202/207) requests
+        self.reading_errors = Counter()
+        self.skipped = 0
+        self.errors = Counter()
+        self.alerts_received = 0
+        self.alerts_unmatched = 0
+        # reading id -> scheduled send time (perf_counter)
+        self.pending = {}
+
+
+async def send_request(session, url, payload, readings, scheduled_at, stats, semaphore):
+    """POST one payload and record latency measured from its scheduled time."""
+    try:
+        async with session.post(url, json=payload) as resp:
+            body = await resp.read()
+            stats.status_codes[resp.status] += 1
+            # Latency from the scheduled slot avoids coordinated omission
+            stats.http_latencies.append(time.perf_counter() - scheduled_at)
+            if resp.status == 202:
+                stats.readings_accepted += len(readings)
+            elif resp.status == 207:
+                count_batch_results(body, stats)
+    except Exception as e:
+        stats.errors[type(e).__name__] += 1
+    finally:
+        semaphore.release()
+
+
+def count_batch_results(body, stats):
+    """Count the per-reading statuses of a 207 batch response."""
+    try:
+        results = json.loads(body).get('results') or []
+    except (ValueError, AttributeError):
+        stats.errors['InvalidBatchResponse'] += 1
+        return
+    for result in results:
+        if result.get('status') == 'success':
+            stats.readings_accepted += 1
+        else:
+            stats.reading_errors[result.get('message') or 'unknown'] += 1
+
+
+def grid_size(args):
+    """
+    Rows and columns of the station grid.
+
+    Explicit --rows/--cols win; otherwise the grid is the smallest square
+    whose stations each send at most SENSOR_HEADROOM * --sensor-rate
+    readings per second.
+    """
+    if args.rows and args.cols:
+        return args.rows, args.cols
+    readings_per_s = args.rps * args.batch_size
+    stations = max(1, math.ceil(readings_per_s / (args.sensor_rate * SENSOR_HEADROOM)))
+    if args.rows or args.cols:
+        fixed = args.rows or args.cols
+        other = max(1, math.ceil(stations / fixed))
+        return (fixed, other) if args.rows else (other, fixed)
+    side = math.ceil(math.sqrt(stations))
+    return side, side
+
+
+async def generate_load(args, fleet, stats):
+    """Issue requests on a fixed schedule until the duration elapses."""
+    if args.batch_size > 1:
+        url = f"{args.collector_url}/api/v1/pollution/batch"
+    else:
+        url = f"{args.collector_url}/api/v1/pollution/data"
+
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=args.max_in_flight)
+    tasks = set()
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        started = time.perf_counter()
+        interval = 1.0 / args.rps
+        i = 0
+        while True:
+            scheduled_at = started + i * interval
+            if scheduled_at - started >= args.duration:
+                break
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            i += 1
+
+            # Client saturated: count the slot as skipped instead of queueing it
+            if semaphore.locked():
+                stats.skipped += 1
+                continue
+            await semaphore.acquire()
+
+            elapsed = scheduled_at - started
+            readings = [fleet.next_reading(elapsed)[0] for _ in range(args.batch_size)]
+            for reading in readings:
+                stats.pending[reading['id']] = scheduled_at
+            stats.readings_sent += len(readings)
+            payload = readings if args.batch_size > 1 else readings[0]
+
+            task = asyncio.create_task(
+                send_request(session, url, payload, readings, scheduled_at, stats, semaphore)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+
+async def listen_for_alerts(args, stats):
+    """Connect to /notifications and match anomaly_alert events back to readings."""
+    sio = socketio.AsyncClient(reconnection=True)
+
+    @sio.on('anomaly_alert', namespace='/notifications')
+    async def on_alert(data):
+        received_at = time.perf_counter()
+        stats.alerts_received += 1
+        reading = (data or {}).get('pollution_data') or {}
+        sent_at = stats.pending.pop(reading.get('id'), None)
+        if sent_at is None:
+            # Either a later alert for the same reading or traffic from elsewhere
+            stats.alerts_unmatched += 1
+            return
+        stats.alert_latencies.append(received_at - sent_at)
+
+    try:
+        await sio.connect(args.notification_url, namespaces=['/notifications'],
+                          transports=['websocket'])
+    except Exception as e:
+        print(f"Warning: could not connect to {args.notification_url}: {e}", file=sys.stderr)
+        return None
+    return sio
+
+
+async def run(args):
+    rows, cols = grid_size(args)
+    stations = build_station_grid(args.center_lat, args.center_lon,
+                                  rows, cols, args.spacing_km, seed=args.seed)
+    per_station = args.rps * args.batch_size / len(stations)
+    if per_station > args.sensor_rate:
+        print(f"Warning: each station sends {per_station:.2f} readings/s, above the "
+              f"collector's per-sensor limit of {args.sensor_rate}/s; expect 429s "
+              f"(use a larger grid or raise SENSOR_RATE_PER_SECOND)", file=sys.stderr)
+    start_time = datetime.utcnow() - timedelta(seconds=args.duration * args.time_scale)
+    fleet = FleetGenerator(stations, start_time, time_scale=args.time_scale,
+                           spike_rate=args.spike_rate, seed=args.seed)
+    stats = LoadTestStats()
+
+    sio = None
+    if not args.no_alerts:
+        sio = await listen_for_alerts(args, stats)
+    elapsed = await generate_load(args, fleet, stats)
+
+    if sio is not None:
+        # Give the pipeline time to deliver alerts for the tail of the run
+        await asyncio.sleep(args.drain)
+        await sio.disconnect()
+
+    return build_report(args, stats, elapsed, len(stations))
+
+
+def build_report(args, stats, elapsed, station_count):
+    return {
+        'config': {
+            'rps': args.rps,
+            'duration_s': args.duration,
+            'batch_size': args.batch_size,
+            'stations': station_count,
+            'readings_per_station_per_s': round(args.rps * args.batch_size / station_count, 3),
+            'sensor_rate_limit': args.sensor_rate,
+            'spike_rate': args.spike_rate
+        },
+        'elapsed_s': round(elapsed, 2),
+        'requests': {
+            'status_codes': dict(stats.status_codes),
+            'errors': dict(stats.errors),
+            'skipped_client_saturated': stats.skipped,
+            'reading_errors': dict(stats.reading_errors)
+        },
+        'throughput': {
+            'readings_sent_per_s': round(stats.readings_sent / elapsed, 2) if elapsed else 0,
+            'readings_accepted_per_s': round(stats.readings_accepted / elapsed, 2) if elapsed else 0
+        },
+        'http_latency_ms': summarize(stats.http_latencies),
+        'ingest_to_alert_latency_ms': summarize(stats.alert_latencies),
+        'alerts': {
+            'received': stats.alerts_received,
+            'unmatched': stats.alerts_unmatched
+        }
+    }
+
+
+def print_report(report):
+    cfg = report['config']
+    print(f"\nLoad test: {cfg['rps']} req/s for {cfg['duration_s']}s, "
+          f"batch={cfg['batch_size']}, stations={cfg['stations']} "
+          f"({cfg['readings_per_station_per_s']}/s each, limit {cfg['sensor_rate_limit']}/s)")
+    print(f"Elapsed:     {report['elapsed_s']}s")
+    print(f"Status:      {report['requests']['status_codes']}  "
+          f"errors={report['requests']['errors']}  "
+          f"skipped={report['requests']['skipped_client_saturated']}")
+    if report['requests']['reading_errors']:
+        print(f"Rejected:    {report['requests']['reading_errors']}")
+    tp = report['throughput']
+    print(f"Throughput:  sent={tp['readings_sent_per_s']}/s  accepted={tp['readings_accepted_per_s']}/s")
+    for key, label in (('http_latency_ms', 'HTTP'), ('ingest_to_alert_latency_ms', 'Alert')):
+        s = report[key]
+        print(f"{label:<12} n={s['count']}  p50={s['p50']}ms  p95={s['p95']}ms  "
+              f"p99={s['p99']}ms  max={s['max']}ms")
+    print(f"Alerts:      received={report['alerts']['received']}  unmatched={report['alerts']['unmatched']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the air-pollution pipeline")
+    parser.add_argument('--collector-url', default='http://localhost:5001')
+    parser.add_argument('--notification-url', default='http://localhost:5003')
+    parser.add_argument('--rps', type=float, default=50.0, help='Target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Run length in seconds')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Readings per request; >1 uses the /batch endpoint')
+    parser.add_argument('--max-in-flight', type=int, default=256)
+    parser.add_argument('--request-timeout', type=float, default=10.0)
+    parser.add_argument('--rows', type=int, help='Station grid rows (default: sized from --rps)')
+    parser.add_argument('--cols', type=int, help='Station grid columns (default: sized from --rps)')
+    parser.add_argument('--sensor-rate', type=float, default=1.0,
+                        help="The collector's SENSOR_RATE_PER_SECOND, used to size the grid")
+    parser.add_argument('--spacing-km', type=float, default=3.0)
+    parser.add_argument('--center-lat', type=float, default=41.01)
+    parser.add_argument('--center-lon', type=float, default=28.97)
+    parser.add_argument('--spike-rate', type=float, default=0.01,
+                        help='Fraction of readings with an injected spike')
+    parser.add_argument('--time-scale', type=float, default=60.0,
+                        help='Simulated seconds per wall-clock second')
+    parser.add_argument('--drain', type=float, default=5.0,
+                        help='Seconds to keep listening for alerts after the last request')
+    parser.add_argument('--no-alerts', action='store_true', help='Skip the Socket.IO listener')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', metavar='PATH', help='Also write the report as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()